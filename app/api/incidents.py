@@ -2,40 +2,136 @@
 API routes for incident-related operations
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+import hashlib
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
-from app.models.incident import IncidentRequest, IncidentResponse
+from app.models.incident import BatchIncidentResult, IncidentRequest, IncidentResponse
 from app.services.pagerduty_service import PagerDutyService
 from app.services.slack_service import SlackService
-from app.config.notification_template import get_template
+from app.services.incident_stream import format_sse
+from app.services.outbox import STATUS_PENDING as OUTBOX_PENDING, STATUS_SENDING as OUTBOX_SENDING, Outbox
+from app.services.template_engine import TemplateRegistry, UnknownTemplate
+from app.config.config import settings
 
 router = APIRouter()
 
-def get_pagerduty_service() -> PagerDutyService:
-    """Dependency to get PagerDuty service instance"""
-    return PagerDutyService()
+def ensure_template_registry(state) -> TemplateRegistry:
+    """Load the notification templates on first use, so rendering and /template share one compiled set"""
+    if getattr(state, "templates", None) is None:
+        state.templates = TemplateRegistry(
+            settings.NOTIFICATION_TEMPLATES_DIR,
+            default_name=settings.NOTIFICATION_TEMPLATE,
+            reload_interval=settings.NOTIFICATION_TEMPLATE_RELOAD_INTERVAL
+        )
+    return state.templates
+
+def ensure_pagerduty_service(state) -> PagerDutyService:
+    """Create the process-wide PagerDuty service on first use (must run on the event loop)"""
+    if getattr(state, "pagerduty_service", None) is None:
+        http_client = state.http_pool.get("pagerduty", http2=settings.PAGERDUTY_HTTP2)
+        state.pagerduty_service = PagerDutyService(
+            http_client=http_client,
+            outbox=getattr(state, "outbox", None),
+            templates=ensure_template_registry(state)
+        )
+        state.pagerduty_service.start_background_tasks()
+    return state.pagerduty_service
 
-def get_slack_service() -> SlackService:
-    """Dependency to get Slack service instance"""
-    return SlackService()
+def ensure_slack_service(state) -> SlackService:
+    """Create the process-wide Slack service on first use (must run on the event loop)"""
+    if getattr(state, "slack_service", None) is None:
+        http_client = state.http_pool.get("slack", http2=settings.SLACK_HTTP2)
+        state.slack_service = SlackService(http_client=http_client, outbox=getattr(state, "outbox", None))
+        state.slack_service.start_background_tasks()
+    return state.slack_service
+
+async def get_pagerduty_service(request: Request) -> PagerDutyService:
+    """Dependency to get the process-wide PagerDuty service instance
+    
+    Async so it runs on the event loop: a sync dependency runs in the threadpool,
+    where concurrent first requests could each create their own instance.
+    """
+    return ensure_pagerduty_service(request.app.state)
+
+async def get_slack_service(request: Request) -> SlackService:
+    """Dependency to get the process-wide Slack service instance"""
+    return ensure_slack_service(request.app.state)
+
+async def get_template_registry(request: Request) -> TemplateRegistry:
+    """Dependency to get the process-wide notification templates"""
+    return ensure_template_registry(request.app.state)
+
+async def get_outbox(request: Request) -> Outbox:
+    """Dependency to get the durable outbox"""
+    outbox = getattr(request.app.state, "outbox", None)
+    if outbox is None:
+        raise HTTPException(status_code=404, detail="The outbox is disabled (OUTBOX_ENABLED=false)")
+    return outbox
+
+def resume_outbox(state) -> None:
+    """Start the services with writes left in the outbox by a previous run, so they drain without waiting for a request"""
+    counts = state.outbox.counts()
+    if not counts.get(OUTBOX_PENDING) and not counts.get(OUTBOX_SENDING):
+        return
+    for ensure in (ensure_pagerduty_service, ensure_slack_service):
+        try:
+            ensure(state)
+        except ValueError as e:
+            # Not configured; its items wait until it is
+            print(f"Outbox items cannot be resumed: {e}")
 
 class SlackMessageRequest(BaseModel):
     """Request model for Slack message"""
     message: str
+    idempotency_key: Optional[str] = Field(None, description="Resubmitting the same key returns the original delivery")
 
 class StatusUpdateRequest(BaseModel):
     """Request model for PagerDuty status update"""
-    incident_id: str = Field(..., description="The PagerDuty incident ID")
+    incident_id: str = Field(..., description="The PagerDuty incident ID or incident number")
     status: str = Field(..., description="The status update type (investigating, identified, monitoring, resolved)")
     message: str = Field(..., description="The status update message")
 
 class AddNoteRequest(BaseModel):
     """Request model for PagerDuty add note"""
-    incident_id: str = Field(..., description="The PagerDuty incident ID")
+    incident_id: str = Field(..., description="The PagerDuty incident ID or incident number")
     message: str = Field(..., description="The note message")
 
 
+async def build_notification(request: IncidentRequest, service: PagerDutyService) -> IncidentResponse:
+    """Fetch an incident and render its notification message"""
+    incident_data = await service.get_incident_data(request.ticket_number)
+    
+    # Resolve responders once and share them between the team name in the
+    # message and the responders panel
+    try:
+        responders = await service.get_responders_data(incident_data)
+    except HTTPException:
+        if request.show_users:
+            raise
+        # The message falls back to the escalation policy name
+        responders = []
+    notification_message = await service.generate_notification_message(
+        incident_data, 
+        request.ticket_number, 
+        request.update_number, 
+        request.resolve, 
+        request.downgrade,
+        responders_data=responders,
+        template=request.template
+    )
+    
+    return IncidentResponse(
+        notification_message=notification_message,
+        incident_data=incident_data,
+        responders=responders if request.show_users else None
+    )
+
 @router.post("/generate", response_model=IncidentResponse)
 async def generate_notification(
     request: IncidentRequest,
@@ -43,27 +139,52 @@ async def generate_notification(
 ):
     """Generate a notification message for an incident"""
     try:
-        incident_data = service.get_incident_data(request.ticket_number)
-        notification_message = service.generate_notification_message(
-            incident_data, 
-            request.ticket_number, 
-            request.update_number, 
-            request.resolve, 
-            request.downgrade
-        )
-        
-        responders = None
-        if request.show_users:
-            responders = service.get_responders_data(incident_data)
-        
-        return IncidentResponse(
-            notification_message=notification_message,
-            incident_data=incident_data,
-            responders=responders
-        )
+        return await build_notification(request, service)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate/batch")
+async def generate_notifications_batch(
+    requests: List[IncidentRequest],
+    service: PagerDutyService = Depends(get_pagerduty_service)
+):
+    """Generate notification messages for several incidents at once
+    
+    Incidents are resolved concurrently and share the user teams cache, so
+    responders common to several incidents are looked up once. Results are
+    streamed as NDJSON, one line per incident in completion order, with the
+    position in the request as "index". A failed incident gets an "error"
+    line instead of failing the batch.
+    """
+    if len(requests) > settings.GENERATE_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can hold at most {settings.GENERATE_BATCH_MAX_SIZE} incidents"
+        )
+    
+    async def generate(index: int, request: IncidentRequest) -> BatchIncidentResult:
+        try:
+            response = await build_notification(request, service)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            return BatchIncidentResult(index=index, ticket_number=request.ticket_number, error=str(detail))
+        return BatchIncidentResult(index=index, ticket_number=request.ticket_number, **response.model_dump())
+    
+    async def results():
+        tasks = [asyncio.ensure_future(generate(index, request)) for index, request in enumerate(requests)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                yield result.model_dump_json(exclude_none=True) + "\n"
+        finally:
+            # The client went away: stop the incidents still being resolved
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @router.get("/incident/{ticket_number}")
 async def get_incident(
     ticket_number: str,
@@ -71,11 +192,63 @@ async def get_incident(
 ):
     """Get incident data including conference bridge and Slack channel information"""
     try:
-        incident_data = service.get_incident_data(ticket_number)
+        incident_data = await service.get_incident_data(ticket_number)
         return incident_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/incident/{ticket_number}/bundle")
+async def get_incident_bundle(
+    ticket_number: str,
+    service: PagerDutyService = Depends(get_pagerduty_service)
+):
+    """Get incident data, responders, notes, status updates and custom fields in one response
+    
+    Everything after the incident detail is fetched from PagerDuty concurrently.
+    Parts that fail are listed under "errors" and returned as null.
+    """
+    try:
+        return await service.get_incident_bundle(ticket_number)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/incident/{incident_id}/stream")
+async def stream_incident_changes(
+    incident_id: str,
+    service: PagerDutyService = Depends(get_pagerduty_service)
+):
+    """Stream incident changes as Server-Sent Events
+    
+    The first event is a "snapshot" of the incident, responders, notes and status
+    updates; after that only changes are sent ("incident", "notes", "status_updates",
+    "log_entries"). Every tab watching the same incident shares one server-side poll loop.
+    An incident number is accepted in place of the ID.
+    """
+    incident_id = await service.resolve_incident_id(incident_id)
+    subscription = service.subscribe_incident(incident_id)
+    
+    async def events():
+        try:
+            # Reconnect quickly if the connection drops
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await subscription.get(timeout=settings.INCIDENT_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield format_sse(*event)
+        finally:
+            service.unsubscribe_incident(incident_id, subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/incident/{ticket_number}/responders")
 async def get_incident_responders(
     ticket_number: str,
@@ -83,39 +256,134 @@ async def get_incident_responders(
 ):
     """Get incident responders by ticket number"""
     try:
-        incident_data = service.get_incident_data(ticket_number)
-        responders = service.get_responders_data(incident_data)
+        incident_data = await service.get_incident_data(ticket_number)
+        responders = await service.get_responders_data(incident_data)
         return {"responders": responders}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/slack/send")
+@router.get("/incident/{ticket_number}/render-context")
+async def get_render_context(
+    ticket_number: str,
+    template: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    service: PagerDutyService = Depends(get_pagerduty_service)
+):
+    """Get the notification messages of every resolve/downgrade/update toggle, rendered by the server
+    
+    Later updates are split around their number, so the browser only joins
+    strings and shows exactly what /generate would. The response carries an
+    ETag; a request with a matching If-None-Match gets 304. The ETag changes
+    when the incident, its responders or the template change, and once a
+    minute with the current time shown by later updates.
+    """
+    context = await service.get_render_context(ticket_number, template)
+    body = json.dumps(context, separators=(',', ':'), sort_keys=True).encode()
+    etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header names the ETag (weak comparison, as for GET)"""
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+@router.post("/slack/send", status_code=202)
 async def send_slack_notification(
     request: SlackMessageRequest,
-    slack_service: SlackService = Depends(get_slack_service)
+    slack_service: SlackService = Depends(get_slack_service),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    """Send a notification message to Slack"""
+    """Queue a notification message for Slack and return its delivery ID right away
+    
+    The idempotency key comes from the request body or the Idempotency-Key header.
+    A repeated key (or the same message while it is still queued) returns the
+    original delivery with "duplicate": true instead of posting twice. Follow the
+    delivery through /api/slack/deliveries/{delivery_id}.
+    """
     try:
-        result = await slack_service.send_notification(request.message)
-        return result
+        result = await slack_service.enqueue_notification(
+            request.message,
+            idempotency_key=request.idempotency_key or idempotency_key
+        )
+        return JSONResponse(status_code=200 if result["duplicate"] else 202, content={"success": True, **result})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/slack/deliveries/{delivery_id}")
+async def get_slack_delivery(
+    delivery_id: str,
+    slack_service: SlackService = Depends(get_slack_service)
+):
+    """Get the status of a queued Slack delivery (queued, sending, retrying, sent or failed)"""
+    status = await slack_service.get_delivery_status(delivery_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown Slack delivery {delivery_id}")
+    return status
+
+@router.get("/slack/deliveries/{delivery_id}/stream")
+async def stream_slack_delivery(
+    delivery_id: str,
+    slack_service: SlackService = Depends(get_slack_service)
+):
+    """Stream a Slack delivery's status changes as Server-Sent Events, ending once it is sent or failed"""
+    if await slack_service.get_delivery_status(delivery_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown Slack delivery {delivery_id}")
+    
+    async def events():
+        event_id = 0
+        last_state = None
+        while True:
+            # Compare before waiting: a change may have happened while the last event was sent
+            status = await slack_service.get_delivery_status(delivery_id)
+            if status is None:
+                break
+            state = (status["status"], status["attempts"])
+            if state != last_state:
+                last_state = state
+                event_id += 1
+                yield format_sse("status", event_id, status)
+                if status["status"] in ("sent", "failed"):
+                    break
+            elif not await slack_service.wait_for_delivery_change(delivery_id, timeout=settings.INCIDENT_STREAM_KEEPALIVE):
+                yield ": keepalive\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/slack/stats")
+async def get_slack_stats(
+    slack_service: SlackService = Depends(get_slack_service)
+):
+    """Get the Slack delivery queue depth and counters"""
+    return slack_service.get_delivery_stats()
+
 @router.get("/template")
-async def get_notification_template():
-    """Get the current notification template configuration"""
+async def get_notification_template(
+    name: Optional[str] = None,
+    templates: TemplateRegistry = Depends(get_template_registry)
+):
+    """Get a notification template's configuration (the default one if no name is given)"""
     try:
-        template = get_template()
-        return {
-            "header_template": template.header_template,
-            "update_template": template.update_template,
-            "bullet_templates": template.bullet_templates,
-            "footer_template": template.footer_template,
-            "status_prefixes": template.status_prefixes
-        }
+        template = templates.get(name)
+        return {"name": template.name, **template.to_dict()}
+    except UnknownTemplate as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/templates")
+async def list_notification_templates(
+    templates: TemplateRegistry = Depends(get_template_registry)
+):
+    """List the loaded notification templates and any template files that failed to load"""
+    return templates.stats()
+
 
 @router.post("/status-update")
 async def send_status_update(
@@ -124,7 +392,7 @@ async def send_status_update(
 ):
     """Send a status update to a PagerDuty incident"""
     try:
-        result = service.send_status_update(
+        result = await service.send_status_update(
             request.incident_id,
             request.status,
             request.message
@@ -133,6 +401,14 @@ async def send_status_update(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/note-writes/{write_id}")
+async def get_note_write(
+    write_id: str,
+    service: PagerDutyService = Depends(get_pagerduty_service)
+):
+    """Get whether the note written after a status update (outbox disabled) was added: pending, sent or failed"""
+    return service.get_note_write(write_id)
+
 @router.post("/add-note")
 async def add_note(
     request: AddNoteRequest,
@@ -140,7 +416,7 @@ async def add_note(
 ):
     """Add a note to a PagerDuty incident"""
     try:
-        result = service.add_note(
+        result = await service.add_note(
             request.incident_id,
             request.message
         )
@@ -151,41 +427,130 @@ async def add_note(
 @router.get("/incident/{incident_id}/status-updates")
 async def get_incident_status_updates(
     incident_id: str,
+    since: Optional[str] = None,
+    limit: Optional[int] = None,
     service: PagerDutyService = Depends(get_pagerduty_service)
 ):
-    """Get status updates for a PagerDuty incident"""
+    """Get status updates for a PagerDuty incident (by incident ID or number)
+    
+    Pass the returned "cursor" as since= to get only the status updates added
+    after it, at most limit= at a time ("more" says whether others follow).
+    "reset": true means the cursor is no longer known (e.g. after a restart) and
+    every status update is returned instead.
+    """
     try:
-        status_updates = service.get_status_updates(incident_id)
-        return {"status_updates": status_updates}
+        return await service.get_status_updates(incident_id, since=since, limit=clamp_limit(limit))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/incident/{incident_id}/notes")
 async def get_incident_notes(
     incident_id: str,
+    since: Optional[str] = None,
+    limit: Optional[int] = None,
     service: PagerDutyService = Depends(get_pagerduty_service)
 ):
-    """Get notes for a PagerDuty incident"""
+    """Get notes for a PagerDuty incident (by incident ID or number)
+    
+    Paged by cursor like /status-updates: since= returns only the notes added
+    after the cursor of an earlier response.
+    """
     try:
-        notes = service.get_incident_notes(incident_id)
-        return {"notes": notes}
+        return await service.get_incident_notes(incident_id, since=since, limit=clamp_limit(limit))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def clamp_limit(limit: Optional[int]) -> Optional[int]:
+    """Keep a page size between 1 and 1000 (None for no limit)"""
+    return None if limit is None else min(max(limit, 1), 1000)
+
 @router.get("/incident/{incident_id}/custom-fields")
 async def get_incident_custom_fields(
     incident_id: str,
     service: PagerDutyService = Depends(get_pagerduty_service)
 ):
-    """Get custom field values for a PagerDuty incident
+    """Get custom field values for a PagerDuty incident (by incident ID or number)
     
     Note: Custom fields may not be available for all incidents or account types.
     Returns empty array if custom fields are not configured.
     """
     try:
-        custom_fields = service.get_custom_field_values(incident_id)
+        custom_fields = await service.get_custom_field_values(incident_id)
         return custom_fields
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/scheduler/stats")
+async def get_scheduler_stats(
+    service: PagerDutyService = Depends(get_pagerduty_service)
+):
+    """Get PagerDuty request queue depth, throttle waits and retry counters"""
+    return service.get_scheduler_stats()
 
+@router.get("/cache/stats")
+async def get_cache_stats(
+    service: PagerDutyService = Depends(get_pagerduty_service)
+):
+    """Get size and hit/miss counters for the in-process caches"""
+    return service.get_cache_stats()
+
+@router.get("/webhooks/stats")
+async def get_webhook_stats(
+    service: PagerDutyService = Depends(get_pagerduty_service)
+):
+    """Get the PagerDuty webhook queue depth and event counters"""
+    return service.get_webhook_stats()
+
+@router.get("/stream/stats")
+async def get_stream_stats(
+    service: PagerDutyService = Depends(get_pagerduty_service)
+):
+    """Get subscriber and poll counters of the incident change stream watchers"""
+    return service.get_stream_stats()
+
+@router.get("/warmer/stats")
+async def get_warmer_stats(
+    service: PagerDutyService = Depends(get_pagerduty_service)
+):
+    """Get the background warmer's hot incidents, poll intervals and counters"""
+    return service.get_warmer_stats()
+
+@router.get("/outbox")
+async def list_outbox_items(
+    status: Optional[str] = None,
+    kind: Optional[str] = None,
+    limit: int = 100,
+    outbox: Outbox = Depends(get_outbox)
+):
+    """List queued writes (notes, status updates, Slack messages), newest first
+    
+    Filter with status=pending|sending|sent|failed and kind=pagerduty.note|
+    pagerduty.status_update|slack.message.
+    """
+    try:
+        items = await asyncio.to_thread(outbox.list_items, status, kind, min(max(limit, 1), 1000))
+        return {"items": items, "stats": await asyncio.to_thread(outbox.stats)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/outbox/{item_id}")
+async def get_outbox_item(
+    item_id: str,
+    outbox: Outbox = Depends(get_outbox)
+):
+    """Get one queued write with its attempts, last error and result"""
+    item = await asyncio.to_thread(outbox.get, item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Unknown outbox item {item_id}")
+    return item
+
+@router.post("/outbox/{item_id}/retry")
+async def retry_outbox_item(
+    item_id: str,
+    outbox: Outbox = Depends(get_outbox)
+):
+    """Queue a failed write again with a fresh set of attempts"""
+    item = await outbox.retry(item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Unknown outbox item {item_id}")
+    return item
@@ -0,0 +1,27 @@
+"""
+Webhook receivers for pushed upstream events
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Request
+
+from app.api.incidents import get_pagerduty_service
+from app.services.pagerduty_service import PagerDutyService
+
+router = APIRouter()
+
+@router.post("/pagerduty", status_code=202)
+async def receive_pagerduty_webhook(
+    request: Request,
+    x_pagerduty_signature: Optional[str] = Header(None),
+    service: PagerDutyService = Depends(get_pagerduty_service)
+):
+    """Receive a PagerDuty V3 webhook event
+    
+    The signature is checked against PAGERDUTY_WEBHOOK_SECRETS and the event is
+    queued; it updates the cached incident, change streams and warmer shortly
+    after the 202. A full queue answers 503 so PagerDuty delivers the event again.
+    """
+    body = await request.body()
+    return {"accepted": True, **service.receive_webhook(body, x_pagerduty_signature)}
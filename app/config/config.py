@@ -17,10 +17,90 @@ class Settings(BaseSettings):
     
     # PagerDuty API
     PAGER_DUTY_TOKEN: Optional[str] = None
+    PAGERDUTY_API_URL: str = "https://api.pagerduty.com"
     
     # Slack Integration
     SLACK_WEBHOOK_URL: Optional[str] = None
     
+    # Outbound HTTP connection pools (one per upstream)
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_TIMEOUT: float = 30.0
+    PAGERDUTY_HTTP2: bool = True
+    SLACK_HTTP2: bool = True
+    
+    # PagerDuty request scheduling (per process)
+    PAGERDUTY_MAX_CONCURRENCY: int = 10
+    PAGERDUTY_RATE_LIMIT_PER_MINUTE: float = 900
+    PAGERDUTY_RATE_LIMIT_BURST: float = 30
+    PAGERDUTY_MAX_RETRIES: int = 4
+    
+    # In-process caches
+    USER_TEAMS_CACHE_SIZE: int = 2048
+    USER_TEAMS_CACHE_TTL: float = 900.0
+    SLACK_CHANNEL_NEGATIVE_TTL: float = 60.0
+    INCIDENT_CACHE_TTL: float = 10.0
+    TIMELINE_SYNC_INTERVAL: float = 10.0
+    
+    # Incident change stream
+    INCIDENT_STREAM_POLL_INTERVAL: float = 10.0
+    INCIDENT_STREAM_IDLE_TIMEOUT: float = 60.0
+    INCIDENT_STREAM_KEEPALIVE: float = 15.0
+    
+    # Background incident warmer
+    WARMER_ENABLED: bool = True
+    WARMER_VIEW_TTL: float = 900.0
+    WARMER_HOT_PRIORITIES: str = "P1,P2"
+    WARMER_DISCOVERY_INTERVAL: float = 60.0
+    WARMER_MIN_INTERVAL: float = 5.0
+    WARMER_HOT_MAX_INTERVAL: float = 30.0
+    WARMER_MAX_INTERVAL: float = 120.0
+    WARMER_MAX_INCIDENTS: int = 50
+    WARMER_CONCURRENCY: int = 4
+    
+    # PagerDuty V3 webhooks at /webhooks/pagerduty (comma-separated signing secrets; empty
+    # disables the endpoint). While enabled, stream watchers and the warmer are woken by events
+    # and only poll every PAGERDUTY_WEBHOOK_FALLBACK_POLL_INTERVAL seconds as a safety net.
+    PAGERDUTY_WEBHOOK_SECRETS: str = ""
+    PAGERDUTY_WEBHOOK_QUEUE_SIZE: int = 1000
+    PAGERDUTY_WEBHOOK_FALLBACK_POLL_INTERVAL: float = 300.0
+    PAGERDUTY_WEBHOOK_RECORD_PATH: str = ""
+    
+    # Slack delivery queue (per webhook)
+    SLACK_RATE_LIMIT_PER_SECOND: float = 1.0
+    SLACK_MAX_ATTEMPTS: int = 5
+    SLACK_IDEMPOTENCY_TTL: float = 600.0
+    SLACK_DELIVERY_HISTORY: int = 500
+    
+    # Durable outbox for notes, status updates and Slack messages
+    OUTBOX_ENABLED: bool = True
+    OUTBOX_PATH: str = "data/outbox.sqlite3"
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    
+    # Incident number <-> ID index, shared with the CLI (empty keeps it in memory only)
+    INCIDENT_INDEX_PATH: str = "data/incident_index.sqlite3"
+    
+    # User teams, Slack channels and the token's user, kept across restarts and shared with the
+    # CLI (empty keeps them in memory only)
+    DISK_CACHE_PATH: str = "data/cache.sqlite3"
+    
+    # Alert titles: brand/region prefixes dropped from incident titles
+    # Rules are "brand=sections" pairs, e.g. "HBO Max=2,Discovery+=1"; other titles drop up to
+    # TITLE_MAX_PREFIX_SECTIONS leading sections of at most TITLE_MAX_PREFIX_WORDS words each
+    TITLE_PREFIX_RULES: str = ""
+    TITLE_MAX_PREFIX_WORDS: int = 2
+    TITLE_MAX_PREFIX_SECTIONS: int = 2
+    TITLE_CACHE_SIZE: int = 4096
+    
+    # Notification templates (*.json, *.yaml files; the file name is the template name)
+    NOTIFICATION_TEMPLATES_DIR: str = "app/config/templates"
+    NOTIFICATION_TEMPLATE: str = "default"
+    NOTIFICATION_TEMPLATE_RELOAD_INTERVAL: float = 2.0
+    
+    # Batch notification generation
+    GENERATE_BATCH_MAX_SIZE: int = 50
+    
     # App Settings
     APP_NAME: str = "PagerDuty Notification Generator"
     APP_VERSION: str = "1.0.0"
@@ -14,6 +14,7 @@ Update Template Variables:
 - {update_prefix}   - Status prefixes (e.g., "Resolved |", "Downgraded |")
 - {update_number}   - Update number (1, 2, 3, etc.)
 - {created_at}      - Formatted creation/update timestamp. (set to incident creation date for update 1, and current date for subsequent updates)
+                      shown in the template's timezone
 
 Bullet Template Variables:
 - {alert_title}     - Alert title minus info before pipes (removes brand and region)
@@ -23,6 +24,13 @@ Bullet Template Variables:
 Footer Template Variables:
 - {status_dashboard_url} - URL to the status dashboard
 
+Timezone:
+- timezone          - IANA time zone of {created_at} for the template's audience (default: "US/Eastern",
+                      e.g. "UTC" or "Europe/London")
+
+Placeholders are substituted as plain text: conversions and format specs such as
+{new_severity!r} or {update_number:02d} are rejected when the template is loaded.
+
 Status Prefix Variables:
 - resolved          - Text for resolved incidents (default: "Resolved")
 - downgraded        - Text for downgraded incidents (default: "Downgraded")
@@ -42,6 +50,15 @@ CUSTOM_TEMPLATE = NotificationTemplate(
 
 # Change the active template
 ACTIVE_TEMPLATE = CUSTOM_TEMPLATE
+
+Template Files:
+==============
+
+ACTIVE_TEMPLATE is the built-in "default" template. More named templates (e.g. per
+region or brand) are loaded from *.json / *.yaml files in app/config/templates
+(NOTIFICATION_TEMPLATES_DIR), named after the file and selected per request with the
+"template" field. A file only lists the parts it changes; edits are picked up without
+a restart. See app/services/template_engine.py.
 """
 
 from typing import Dict
@@ -67,6 +84,9 @@ class NotificationTemplate:
     # Status prefix templates
     status_prefixes: Dict[str, str] = None
     
+    # Time zone update timestamps are shown in
+    timezone: str = "US/Eastern"
+    
     def __post_init__(self):
         """Initialize default values if not provided"""
         if self.bullet_templates is None:
@@ -121,38 +141,3 @@ def get_template() -> NotificationTemplate:
     """Get the active notification template"""
     return ACTIVE_TEMPLATE
 
-
-def get_bullet_template(key: str) -> str:
-    """Get a specific bullet template by key"""
-    return ACTIVE_TEMPLATE.bullet_templates.get(key, "")
-
-
-def get_status_prefix(key: str) -> str:
-    """Get a status prefix by key"""
-    return ACTIVE_TEMPLATE.status_prefixes.get(key, "")
-
-
-def format_header(severity: str, title: str, incident_number: str) -> str:
-    """Format the notification header"""
-    incident_url = f"https://discoveryinc.pagerduty.com/incidents/{incident_number}"
-    return ACTIVE_TEMPLATE.header_template.format(
-        severity=severity,
-        title=title,
-        incident_url=incident_url
-    )
-
-
-def format_update_line(update_prefix: str, update_number: int, created_at: str) -> str:
-    """Format the update line"""
-    return ACTIVE_TEMPLATE.update_template.format(
-        update_prefix=update_prefix,
-        update_number=update_number,
-        created_at=created_at
-    )
-
-
-def format_footer() -> str:
-    """Format the notification footer"""
-    return ACTIVE_TEMPLATE.footer_template.format(
-        status_dashboard_url="https://discoveryinc.pagerduty.com/status-dashboard"
-    )
@@ -4,14 +4,61 @@ PagerDuty Notification Generator - Web UI
 FastAPI application for generating PagerDuty incident notifications
 """
 
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+from fastapi import FastAPI, Request
+from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 import uvicorn
 
-from app.api import incidents
+from app.api import incidents, webhooks
 from app.config.config import settings
+from app.services.http_pool import HTTPClientPool
+from app.services.instrumentation import detach_trace, end_trace, metrics, server_timing_header, start_trace
+from app.services.outbox import Outbox
+
+
+# Responses whose body is produced while it is sent
+STREAMED_MEDIA_TYPES = ("application/x-ndjson", "text/event-stream")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared upstream connection pools on startup and close them on shutdown"""
+    app.state.http_pool = HTTPClientPool(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        timeout=settings.HTTP_TIMEOUT
+    )
+    # Notification templates, compiled once and shared by message rendering and /api/template
+    incidents.ensure_template_registry(app.state)
+    # Services are created on first use by the API dependencies and share the pool
+    app.state.pagerduty_service = None
+    app.state.slack_service = None
+    # Outgoing writes are recorded here before they are dispatched
+    app.state.outbox = Outbox(
+        settings.OUTBOX_PATH,
+        max_attempts=settings.OUTBOX_MAX_ATTEMPTS
+    ) if settings.OUTBOX_ENABLED else None
+    if app.state.outbox is not None:
+        incidents.resume_outbox(app.state)
+    try:
+        yield
+    finally:
+        # Stop dispatching first: in-flight writes still need the services
+        if app.state.outbox is not None:
+            await app.state.outbox.aclose()
+        if app.state.pagerduty_service is not None:
+            await app.state.pagerduty_service.aclose()
+        if app.state.slack_service is not None:
+            await app.state.slack_service.aclose()
+        await app.state.http_pool.aclose()
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -28,11 +75,64 @@ app = FastAPI(
     """,
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+def _route_template(request: Request) -> str:
+    """Full path template of the matched API route, e.g. /api/incident/{ticket_number}"""
+    route = request.scope.get("route")
+    if not isinstance(route, APIRoute):
+        return getattr(route, "path", None) or "unmatched"
+    params = {str(value): name for name, value in request.path_params.items()}
+    return "/".join(
+        f"{{{params[segment]}}}" if segment in params else segment
+        for segment in request.url.path.split("/")
+    )
+
+async def _finish_after(body: AsyncIterator, finish: Callable[[], float]) -> AsyncIterator:
+    """Pass a streamed response body through and call `finish` once it ends, fails or is cut off"""
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        finish()
+
+@app.middleware("http")
+async def upstream_timing(request: Request, call_next):
+    """
+    Record request metrics and break the response time down by upstream call in Server-Timing.
+    
+    A streamed response (NDJSON, server-sent events) is still being produced after
+    its headers are sent, so its trace and metrics are finished when the body ends,
+    and it carries no Server-Timing header: the breakdown is not known in time.
+    """
+    trace, token = start_trace()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        end_trace(trace, token)
+        raise
+    # The route's task keeps recording into the trace until it is closed
+    detach_trace(token)
+    route = _route_template(request)
+    
+    def finish() -> float:
+        trace.close()
+        duration = time.perf_counter() - started
+        metrics.record_request(request.method, route, response.status_code, duration, len(trace))
+        return duration
+    
+    if response.headers.get("content-type", "").startswith(STREAMED_MEDIA_TYPES):
+        response.body_iterator = _finish_after(response.body_iterator, finish)
+        return response
+    response.headers["Server-Timing"] = server_timing_header(trace, finish())
+    return response
+
 # Include API routes
 app.include_router(incidents.router, prefix="/api", tags=["incidents"])
+app.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -50,6 +150,11 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "pagerduty-notification-generator"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Upstream call and request metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
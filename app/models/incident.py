@@ -13,6 +13,7 @@ class IncidentRequest(BaseModel):
     resolve: bool = False
     downgrade: bool = False
     show_users: bool = False
+    template: Optional[str] = None
 
 
 class TeamInfo(BaseModel):
@@ -36,6 +37,16 @@ class IncidentResponse(BaseModel):
     responders: Optional[List[dict]] = None
 
 
+class BatchIncidentResult(BaseModel):
+    """One NDJSON line of a batch notification response"""
+    index: int
+    ticket_number: str
+    notification_message: Optional[str] = None
+    incident_data: Optional[dict] = None
+    responders: Optional[List[dict]] = None
+    error: Optional[str] = None
+
+
 class IncidentData(BaseModel):
     """Incident data model"""
     ticket_number: str
@@ -0,0 +1,1091 @@
+"""
+Asynchronous PagerDuty API client
+Non-blocking counterpart of PagerDutyClient for use inside the FastAPI event loop
+"""
+
+import asyncio
+import secrets
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+import httpx
+
+from .cache import SingleFlight, TTLCache
+from .disk_cache import DiskCache
+from .incident_index import IncidentIndex, is_incident_number
+from .incident_timeline import Timeline
+from .instrumentation import UpstreamCall, endpoint_template, metrics, start_background_task
+from .pagerduty_client import PAGERDUTY_API_URL, PagerDutyClient
+from .request_scheduler import PRIORITY_BACKGROUND, PRIORITY_READ, PRIORITY_WRITE, RequestScheduler
+from .template_engine import TemplateRegistry
+from .title_normalizer import TitleNormalizer
+
+
+# Maximum page size accepted by the PagerDuty list endpoints
+LIST_PAGE_SIZE = 100
+USERS_BATCH_SIZE = LIST_PAGE_SIZE
+
+# Attempts at a note written in the background before giving up
+NOTE_WRITE_ATTEMPTS = 3
+
+# Seconds the outcome of a background note write can be looked up
+NOTE_WRITE_RETENTION = 3600
+
+
+class AsyncPagerDutyClient(PagerDutyClient):
+    """
+    PagerDuty API client built on httpx.AsyncClient.
+    
+    Shares all of the formatting and responder logic with PagerDutyClient and only
+    replaces the methods that talk to the PagerDuty API with awaitable versions.
+    """
+    
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        api_url: str = PAGERDUTY_API_URL,
+        user_teams_cache: Optional[TTLCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        slack_channel_negative_ttl: float = 60.0,
+        incident_cache_ttl: float = 10.0,
+        templates: Optional[TemplateRegistry] = None,
+        title_normalizer: Optional[TitleNormalizer] = None,
+        incident_index: Optional[IncidentIndex] = None,
+        disk_cache: Optional[DiskCache] = None,
+        timeline_sync_interval: float = 10.0
+    ):
+        """
+        Initialize the asynchronous PagerDuty API client.
+        
+        Args:
+            token: PagerDuty API token. If None, will try to get from PAGER_DUTY_TOKEN env var.
+            http_client: Optional httpx.AsyncClient to send requests with. If None, the client
+                creates its own and closes it in aclose().
+            api_url: Base URL of the PagerDuty REST API
+            user_teams_cache: Cache of user ID -> team names shared across clients
+            scheduler: Rate-limit aware scheduler every request goes through. If None, one
+                with default limits is created.
+            slack_channel_negative_ttl: Seconds to remember that an incident has no Slack channel yet
+            incident_cache_ttl: Seconds an incident snapshot is served from memory
+            templates: Notification templates to render with; only the built-in one if None
+            title_normalizer: Turns incident titles into alert titles; default rules if None
+            incident_index: Incident number <-> ID map filled from every incident seen
+            disk_cache: Persistent cache the Slack channels and the token's user are kept in
+            timeline_sync_interval: Seconds notes and status updates are served from the local
+                timelines before a read checks PagerDuty for new ones
+        """
+        super().__init__(
+            token=token,
+            user_teams_cache=user_teams_cache,
+            slack_channel_negative_ttl=slack_channel_negative_ttl,
+            api_url=api_url,
+            templates=templates,
+            title_normalizer=title_normalizer,
+            incident_index=incident_index,
+            disk_cache=disk_cache
+        )
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or httpx.AsyncClient(timeout=30.0)
+        self.scheduler = scheduler or RequestScheduler()
+        
+        # Short-lived incident snapshots, stored under both the incident ID and number
+        self.incident_cache = TTLCache(maxsize=512, ttl=incident_cache_ttl)
+        
+        # Notes and status updates held per incident ID; reads only fetch what is newer
+        self.timeline_sync_interval = timeline_sync_interval
+        self.note_timelines = TTLCache(maxsize=512, ttl=86400)
+        self.status_update_timelines = TTLCache(maxsize=512, ttl=86400)
+        
+        # Concurrent identical reads (incident fetches, log entry scans) share one upstream call
+        self.in_flight = SingleFlight()
+        
+        # User ID -> pending bulk team lookup, so concurrent renders never fetch the same user twice
+        self.user_teams_in_flight: Dict[str, asyncio.Future] = {}
+        
+        # Writes the caller does not wait for (notes following a status update), and
+        # their outcome by write ID so the UI can follow them
+        self.pending_writes: Set[asyncio.Task] = set()
+        self.note_writes = TTLCache(maxsize=1024, ttl=NOTE_WRITE_RETENTION)
+    
+    async def aclose(self, drain_timeout: float = 10.0) -> None:
+        """Finish background writes, stop the request scheduler and close the HTTP client if this instance created it"""
+        if self.pending_writes:
+            _, pending = await asyncio.wait(set(self.pending_writes), timeout=drain_timeout)
+            for task in pending:
+                print("Dropping a background PagerDuty write still pending at shutdown")
+                task.cancel()
+        await self.scheduler.aclose()
+        if self._owns_http_client:
+            await self.http_client.aclose()
+    
+    async def _request(self, method: str, path: str, priority: int = PRIORITY_READ, **kwargs) -> httpx.Response:
+        """Send a request to the PagerDuty API through the rate-limit aware scheduler"""
+        url = f"{self.api_url}{path}"
+        attempts = 0
+        
+        async def send() -> httpx.Response:
+            nonlocal attempts
+            attempts += 1
+            return await self.http_client.request(method, url, headers=self.headers, **kwargs)
+        
+        started = time.perf_counter()
+        response = None
+        status = "error"
+        try:
+            response = await self.scheduler.submit(send, priority=priority, idempotent=method == "GET")
+            status = str(response.status_code)
+            return response
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            metrics.record_upstream(UpstreamCall(
+                upstream="pagerduty",
+                method=method,
+                endpoint=endpoint_template(path),
+                status=status,
+                duration=time.perf_counter() - started,
+                retries=max(0, attempts - 1),
+                bytes=len(response.content) if response is not None else 0
+            ))
+    
+    async def _get(
+        self,
+        path: str,
+        params: Optional[Union[Dict, List]] = None,
+        priority: int = PRIORITY_READ
+    ) -> httpx.Response:
+        """Send a GET request to the PagerDuty API"""
+        return await self._request("GET", path, priority=priority, params=params)
+    
+    async def _post(self, path: str, payload: Dict, priority: int = PRIORITY_WRITE) -> httpx.Response:
+        """Send a POST request to the PagerDuty API (writes are served before reads)"""
+        return await self._request("POST", path, priority=priority, json=payload)
+    
+    async def _get_incident(self, ticket_number: str) -> Dict:
+        """
+        Get the incident detail (with conference bridge) without the Slack channel lookup.
+        
+        Served from the incident snapshot cache while fresh; otherwise concurrent callers
+        for the same incident share one upstream request.
+        
+        Args:
+            ticket_number: PagerDuty incident number or incident ID
+        
+        Returns:
+            Shallow copy of the incident payload, safe for the caller to add keys to
+        """
+        incident_data = self.incident_cache.get(ticket_number)
+        if incident_data is None:
+            incident_data = await self.in_flight.do(
+                ("incident", ticket_number), lambda: self._fetch_incident(ticket_number)
+            )
+        return dict(incident_data)
+    
+    async def _fetch_incident(
+        self,
+        ticket_number: str,
+        priority: int = PRIORITY_READ,
+        cache_ttl: Optional[float] = None
+    ) -> Dict:
+        """Fetch the incident detail from PagerDuty and store it in the snapshot cache"""
+        response = await self._get(
+            f"/incidents/{ticket_number}", params={"include[]": "conference_bridge"}, priority=priority
+        )
+        
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch incident {ticket_number}: {response.status_code} - {response.text}")
+        
+        incident_data = response.json()
+        incident = incident_data.get('incident', {})
+        await self.incident_index.arecord(incident)
+        for key in {ticket_number, incident.get('id'), str(incident.get('incident_number', ''))}:
+            if key:
+                self.incident_cache.set(key, incident_data, ttl=cache_ttl)
+        return incident_data
+    
+    async def refresh_incident(
+        self,
+        ticket_number: str,
+        priority: int = PRIORITY_READ,
+        cache_ttl: Optional[float] = None
+    ) -> Dict:
+        """
+        Fetch a fresh incident snapshot, bypassing (and then updating) the snapshot cache.
+        
+        Args:
+            ticket_number: PagerDuty incident number or incident ID
+            priority: Scheduler lane for the request
+            cache_ttl: Seconds to keep the new snapshot cached; the cache default if None
+        
+        Returns:
+            Shallow copy of the incident payload, safe for the caller to add keys to
+        """
+        incident_data = await self.in_flight.do(
+            ("incident", ticket_number),
+            lambda: self._fetch_incident(ticket_number, priority=priority, cache_ttl=cache_ttl)
+        )
+        return dict(incident_data)
+    
+    async def list_open_incidents(self, priority: int = PRIORITY_BACKGROUND) -> List[Dict]:
+        """
+        List every triggered or acknowledged incident in the account.
+        
+        Args:
+            priority: Scheduler lane for the requests
+        
+        Returns:
+            List of incident objects (without conference bridge details)
+        
+        Raises:
+            Exception: If a page cannot be fetched
+        """
+        more = True
+        params = [("statuses[]", "triggered"), ("statuses[]", "acknowledged"), ("limit", LIST_PAGE_SIZE)]
+        offset = 0
+        incidents = []
+        
+        while more:
+            response = await self._get("/incidents", params=params + [("offset", offset)], priority=priority)
+            
+            if response.status_code != 200:
+                raise Exception(f"Failed to list open incidents: {response.status_code} - {response.text}")
+            
+            data = response.json()
+            more = data.get('more', False)
+            offset = data.get('offset', offset) + data.get('limit', LIST_PAGE_SIZE)
+            incidents.extend(data.get('incidents', []))
+        
+        await self.incident_index.arecord_many(incidents)
+        return incidents
+    
+    def invalidate_incident(self, incident_id: str) -> None:
+        """
+        Drop the cached snapshot of an incident, under both its ID and its number.
+        
+        Args:
+            incident_id: PagerDuty incident ID or incident number
+        """
+        # Memory only: a snapshot cached here was fetched here, so the index learnt both keys
+        if is_incident_number(incident_id):
+            other_key = self.incident_index.id_for(incident_id, from_file=False)
+        else:
+            other_key = self.incident_index.number_for(incident_id, from_file=False)
+        self.incident_cache.invalidate(incident_id)
+        if other_key is not None:
+            self.incident_cache.invalidate(other_key)
+    
+    async def get_incident_data(self, ticket_number: str) -> Dict:
+        """
+        Get incident data including conference bridge and Slack channel information.
+        
+        Args:
+            ticket_number: PagerDuty incident/ticket number
+        
+        Returns:
+            Dict containing incident data with communication channel information
+        
+        Raises:
+            Exception: If API request fails
+        """
+        incident_data = await self._get_incident(ticket_number)
+        
+        # Get Slack channel information from log entries using incident ID
+        incident_id = incident_data['incident']['id']
+        slack_channel_info = await self.get_slack_channel_from_log_entries(incident_id)
+        
+        if slack_channel_info:
+            incident_data['slack_channel'] = slack_channel_info
+        
+        return incident_data
+    
+    async def get_incident_bundle(self, ticket_number: str) -> Dict:
+        """
+        Get everything the web UI needs to render an incident in one call.
+        
+        The incident detail is fetched first (its ID keys every other lookup); the
+        Slack channel, notes, status updates, custom fields and responder teams are
+        then fetched concurrently. A failing part is reported under "errors" instead
+        of failing the whole bundle.
+        
+        Args:
+            ticket_number: PagerDuty incident/ticket number
+        
+        Returns:
+            Dict with incident_data, responders, notes, status_updates, custom_fields and
+            errors, plus the cursors to fetch newer notes and status updates from
+        
+        Raises:
+            Exception: If the incident itself cannot be fetched
+        """
+        incident_data = await self._get_incident(ticket_number)
+        incident_id = incident_data['incident']['id']
+        
+        parts = {
+            "slack_channel": self.get_slack_channel_from_log_entries(incident_id),
+            "responders": self.get_responders_data(incident_data),
+            "notes": self.get_notes_timeline(incident_id),
+            "status_updates": self.get_status_updates_timeline(incident_id),
+            "custom_fields": self.get_custom_field_values(incident_id)
+        }
+        results = await asyncio.gather(*parts.values(), return_exceptions=True)
+        
+        bundle = {"incident_data": incident_data, "errors": {}, "cursors": {}}
+        for name, result in zip(parts, results):
+            if isinstance(result, Exception):
+                bundle["errors"][name] = str(result)
+                result = None
+            elif isinstance(result, Timeline):
+                bundle["cursors"][name] = result.cursor
+                result = result.items()
+            bundle[name] = result
+        
+        slack_channel_info = bundle.pop("slack_channel")
+        if slack_channel_info:
+            incident_data['slack_channel'] = slack_channel_info
+        
+        return bundle
+    
+    async def get_incident_data_by_id(self, incident_id: str) -> Dict:
+        """Get incident data by incident ID"""
+        try:
+            return await self._get_incident(incident_id)
+        except Exception as e:
+            raise Exception(f"Error getting incident data: {str(e)}")
+    
+    async def resolve_incident_id(self, key: str) -> str:
+        """
+        Get the incident ID of an incident number or ID.
+        
+        Answered from the incident index when the number has been seen before;
+        otherwise the incident is fetched once (through the snapshot cache) and
+        the index learns it.
+        
+        Args:
+            key: Incident number or incident ID
+        
+        Returns:
+            Incident ID
+        
+        Raises:
+            Exception: If the incident cannot be fetched
+        """
+        if not is_incident_number(key):
+            return key
+        incident_id = await self.incident_index.aid_for(key)
+        if incident_id is None:
+            incident_data = await self.get_incident_data_by_id(key)
+            incident_id = incident_data['incident']['id']
+        return incident_id
+    
+    async def get_slack_channel_from_log_entries(self, incident_id: str) -> Optional[Dict]:
+        """
+        Get Slack channel information from incident log entries.
+        
+        Args:
+            incident_id: PagerDuty incident ID (not ticket number)
+        
+        Returns:
+            Dict containing Slack channel information or None if not found
+        """
+        # An empty dict marks a recent scan that found no channel
+        cached_channel = await self.slack_channel_cache.aget(incident_id)
+        if cached_channel is not None:
+            return cached_channel or None
+        
+        return await self.in_flight.do(
+            ("log_entries", incident_id), lambda: self._scan_log_entries_for_slack_channel(incident_id)
+        )
+    
+    async def _scan_log_entries_for_slack_channel(self, incident_id: str) -> Optional[Dict]:
+        """Page through the log entries not scanned yet, looking for the chat channel event"""
+        try:
+            more = True
+            # Only scan log entries newer than the ones a previous scan already checked
+            newest_entry_at = self.log_entries_scan_cursor.get(incident_id)
+            params = {"since": newest_entry_at} if newest_entry_at else {}
+            
+            while more:
+                response = await self._get(f"/incidents/{incident_id}/log_entries", params=params)
+                
+                if response.status_code != 200:
+                    return None
+                
+                data = response.json()
+                more = data.get('more', False)
+                if more:
+                    params["offset"] = data['offset'] + data['limit']
+                
+                # Look for chat channel integration events
+                for entry in data.get('log_entries', []):
+                    slack_channel_info = self._get_chat_channel(entry)
+                    if slack_channel_info:
+                        await self.slack_channel_cache.aset(incident_id, slack_channel_info)
+                        return slack_channel_info
+                    newest_entry_at = max(newest_entry_at or '', entry.get('created_at', ''))
+            
+            await self.slack_channel_cache.aset(incident_id, {}, ttl=self.slack_channel_negative_ttl)
+            if newest_entry_at:
+                self.log_entries_scan_cursor.set(incident_id, newest_entry_at)
+            return None
+        
+        except Exception as e:
+            print(f"Error fetching Slack channel info: {e}")
+            return None
+    
+    async def get_log_entries(
+        self,
+        incident_id: str,
+        since: Optional[str] = None,
+        priority: int = PRIORITY_READ
+    ) -> List[Dict]:
+        """
+        Get an incident's log entries, optionally only those created after a point in time.
+        
+        Args:
+            incident_id: PagerDuty incident ID (not ticket number)
+            since: Only return log entries created at or after this ISO 8601 timestamp
+            priority: Scheduler lane for the requests
+        
+        Returns:
+            List of log entries, ordered by creation time (oldest first)
+        
+        Raises:
+            Exception: If a page cannot be fetched
+        """
+        more = True
+        params = {"since": since} if since else {}
+        log_entries = []
+        
+        while more:
+            response = await self._get(f"/incidents/{incident_id}/log_entries", params=params, priority=priority)
+            
+            if response.status_code != 200:
+                raise Exception(f"Failed to fetch log entries: {response.status_code} - {response.text}")
+            
+            data = response.json()
+            more = data.get('more', False)
+            if more:
+                params["offset"] = data['offset'] + data['limit']
+            
+            log_entries.extend(data.get('log_entries', []))
+        
+        log_entries.sort(key=lambda x: x.get('created_at', ''))
+        return log_entries
+    
+    def _timeline(self, timelines: TTLCache, incident_id: str) -> Timeline:
+        """Get the timeline held for an incident, starting an empty one if there is none"""
+        timeline = timelines.get(incident_id)
+        if timeline is None:
+            timeline = Timeline()
+            timelines.set(incident_id, timeline)
+        return timeline
+    
+    def record_timeline_items(self, kind: str, incident_id: str, items: List[Dict]) -> List[Dict]:
+        """
+        Append notes or status updates learned without a fetch (a write's response, a webhook event).
+        
+        Only a timeline already held is appended to: the first read of an incident
+        fetches everything anyway.
+        
+        Args:
+            kind: "notes" or "status_updates"
+            incident_id: PagerDuty incident ID (not ticket number)
+            items: Items shaped like the API returns them
+        
+        Returns:
+            The items that were not held yet
+        """
+        timelines = self.note_timelines if kind == "notes" else self.status_update_timelines
+        timeline = timelines.get(incident_id)
+        if timeline is None:
+            return []
+        return timeline.append(items)
+    
+    def mark_timeline_stale(self, kind: str, incident_id: str) -> None:
+        """Have the next read of an incident's notes or status updates fetch from PagerDuty"""
+        timelines = self.note_timelines if kind == "notes" else self.status_update_timelines
+        timeline = timelines.get(incident_id)
+        if timeline is not None:
+            timeline.mark_stale()
+    
+    async def get_status_updates_timeline(
+        self,
+        incident_id: str,
+        priority: int = PRIORITY_READ,
+        max_age: Optional[float] = None
+    ) -> Timeline:
+        """
+        Get the status updates timeline of an incident, checking PagerDuty for new ones first if it is stale.
+        
+        PagerDuty lists status updates in one unpaginated response that cannot be
+        limited to newer ones, so a sync fetches the list; only the status updates
+        not held yet are appended, and readers holding a cursor only get those.
+        
+        Args:
+            incident_id: PagerDuty incident ID (not ticket number)
+            priority: Scheduler lane for the request
+            max_age: Seconds since the last sync the timeline is served as is
+                (timeline_sync_interval if None, 0 to always sync)
+        """
+        timeline = self._timeline(self.status_update_timelines, incident_id)
+        if not timeline.is_fresh(self.timeline_sync_interval if max_age is None else max_age):
+            await self.in_flight.do(
+                f"status_updates/{incident_id}",
+                lambda: self._sync_status_updates(timeline, incident_id, priority)
+            )
+        return timeline
+    
+    async def _sync_status_updates(self, timeline: Timeline, incident_id: str, priority: int) -> None:
+        try:
+            response = await self._get(f"/incidents/{incident_id}/status_updates", priority=priority)
+            
+            if response.status_code != 200:
+                print(f"Error fetching status updates: {response.status_code} - {response.text}")
+                return
+            
+            timeline.append(response.json().get('status_updates', []))
+            timeline.mark_synced()
+        
+        except Exception as e:
+            print(f"Error fetching status updates: {e}")
+    
+    async def get_status_updates(
+        self,
+        incident_id: str,
+        priority: int = PRIORITY_READ,
+        max_age: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Get status updates for a PagerDuty incident.
+        
+        Args:
+            incident_id: PagerDuty incident ID (not ticket number)
+            priority: Scheduler lane for the request
+            max_age: Seconds the local timeline is served without checking PagerDuty
+        
+        Returns:
+            List of status update entries, ordered by creation time (oldest first)
+        """
+        timeline = await self.get_status_updates_timeline(incident_id, priority, max_age)
+        return timeline.items()
+    
+    async def get_notes_timeline(
+        self,
+        incident_id: str,
+        priority: int = PRIORITY_READ,
+        max_age: Optional[float] = None
+    ) -> Timeline:
+        """
+        Get the notes timeline of an incident, fetching the notes added upstream first if it is stale.
+        
+        Args:
+            incident_id: PagerDuty incident ID (not ticket number)
+            priority: Scheduler lane for the requests
+            max_age: Seconds since the last sync the timeline is served as is
+                (timeline_sync_interval if None, 0 to always sync)
+        """
+        timeline = self._timeline(self.note_timelines, incident_id)
+        if not timeline.is_fresh(self.timeline_sync_interval if max_age is None else max_age):
+            await self.in_flight.do(
+                f"notes/{incident_id}",
+                lambda: self._sync_notes(timeline, incident_id, priority)
+            )
+        return timeline
+    
+    async def _sync_notes(self, timeline: Timeline, incident_id: str, priority: int) -> None:
+        """
+        Fetch the notes added upstream since the last sync.
+        
+        The fetch starts at the last note held rather than after it, so the first
+        note returned shows whether the list still lines up with the timeline. If it
+        does not (notes were removed upstream), every note is fetched again; the
+        ones already held are skipped either way.
+        """
+        try:
+            start, notes = await self._list_notes(incident_id, max(timeline.upstream_count - 1, 0), priority)
+            
+            if timeline.upstream_count:
+                anchor = timeline.upstream_count - 1 - start
+                lined_up = 0 <= anchor < len(notes) and notes[anchor].get('id') == timeline.upstream_last_id
+                if not lined_up and start:
+                    start, notes = await self._list_notes(incident_id, 0, priority)
+            
+            timeline.append(notes)
+            timeline.upstream_count = start + len(notes)
+            if notes:
+                timeline.upstream_last_id = notes[-1].get('id')
+            timeline.mark_synced()
+        
+        except Exception as e:
+            print(f"Error fetching incident notes: {e}")
+    
+    async def _list_notes(self, incident_id: str, offset: int, priority: int) -> Tuple[int, List[Dict]]:
+        """
+        List the notes of an incident from an offset on.
+        
+        Returns:
+            The offset the list starts at (0 if PagerDuty ignored the offset) and
+            the notes in the order PagerDuty lists them
+        
+        Raises:
+            Exception: If a page cannot be fetched
+        """
+        params = {"offset": offset} if offset else {}
+        start = None
+        notes = []
+        more = True
+        
+        while more:
+            response = await self._get(f"/incidents/{incident_id}/notes", params=params, priority=priority)
+            
+            if response.status_code != 200:
+                raise Exception(f"{response.status_code} - {response.text}")
+            
+            data = response.json()
+            if start is None:
+                start = data.get('offset') or 0
+            more = data.get('more', False)
+            if more:
+                params = {"offset": data['offset'] + data['limit']}
+            
+            notes.extend(data.get('notes', []))
+        
+        return start, notes
+    
+    async def get_incident_notes(
+        self,
+        incident_id: str,
+        priority: int = PRIORITY_READ,
+        max_age: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Get notes for a PagerDuty incident.
+        
+        Args:
+            incident_id: PagerDuty incident ID (not ticket number)
+            priority: Scheduler lane for the requests
+            max_age: Seconds the local timeline is served without checking PagerDuty
+        
+        Returns:
+            List of note entries, ordered by creation time (oldest first)
+        """
+        timeline = await self.get_notes_timeline(incident_id, priority, max_age)
+        return timeline.items()
+    
+    async def get_user_teams(self, user_id: str) -> List[str]:
+        """
+        Get teams for a specific user from PagerDuty API.
+        
+        Args:
+            user_id: The user ID
+        
+        Returns:
+            List of team names the user belongs to
+        """
+        cached_teams = await self.user_teams_cache.aget(user_id)
+        if cached_teams is not None:
+            return cached_teams
+        
+        try:
+            response = await self._get(f"/users/{user_id}")
+            
+            if response.status_code != 200:
+                return []
+            
+            teams = self._get_team_names(response.json().get('user', {}))
+            await self.user_teams_cache.aset(user_id, teams)
+            return teams
+        except Exception:
+            return []
+    
+    async def get_users_teams(self, user_ids: List[str]) -> Dict[str, List[str]]:
+        """
+        Get teams for several users, fetching cache misses in bulk.
+        
+        Users missing from the cache are requested through GET /users?ids[]=... in
+        batches; any user the list endpoint does not return is fetched individually.
+        Users already being looked up by a concurrent call (e.g. another incident of
+        a batch sharing responders) are awaited instead of requested again.
+        
+        Args:
+            user_ids: The user IDs
+            
+        Returns:
+            Dict mapping each user ID to the list of team names the user belongs to
+        """
+        user_teams = {}
+        missing_ids = []
+        pending = {}
+        user_ids = list(dict.fromkeys(user_ids))
+        cached = await asyncio.gather(*(self.user_teams_cache.aget(user_id) for user_id in user_ids))
+        for user_id, cached_teams in zip(user_ids, cached):
+            if cached_teams is not None:
+                user_teams[user_id] = cached_teams
+            elif user_id in self.user_teams_in_flight:
+                pending[user_id] = self.user_teams_in_flight[user_id]
+            else:
+                missing_ids.append(user_id)
+        
+        if missing_ids:
+            lookup = asyncio.get_running_loop().create_future()
+            for user_id in missing_ids:
+                self.user_teams_in_flight[user_id] = lookup
+            fetched = None
+            try:
+                fetched = await self._fetch_users_teams(missing_ids)
+                user_teams.update(fetched)
+            finally:
+                # Waiters fall back to their own lookup if this one was cancelled
+                lookup.set_result(fetched)
+                for user_id in missing_ids:
+                    if self.user_teams_in_flight.get(user_id) is lookup:
+                        del self.user_teams_in_flight[user_id]
+        
+        for user_id, lookup in pending.items():
+            fetched = await asyncio.shield(lookup)
+            if fetched is not None and user_id in fetched:
+                user_teams[user_id] = fetched[user_id]
+            else:
+                user_teams[user_id] = await self.get_user_teams(user_id)
+        
+        return user_teams
+    
+    async def _fetch_users_teams(self, missing_ids: List[str]) -> Dict[str, List[str]]:
+        """Fetch teams of users missing from the cache, in bulk with single-lookup fallback"""
+        user_teams = {}
+        wanted_ids = set(missing_ids)
+        batches = [missing_ids[i:i + USERS_BATCH_SIZE] for i in range(0, len(missing_ids), USERS_BATCH_SIZE)]
+        for users in await asyncio.gather(*(self._list_users(batch) for batch in batches)):
+            for user in users:
+                if user.get('id') in wanted_ids:
+                    teams = self._get_team_names(user)
+                    await self.user_teams_cache.aset(user['id'], teams)
+                    user_teams[user['id']] = teams
+        
+        # Fall back to single lookups for anything the bulk request did not cover
+        leftover_ids = [user_id for user_id in missing_ids if user_id not in user_teams]
+        teams = await asyncio.gather(*(self.get_user_teams(user_id) for user_id in leftover_ids))
+        user_teams.update(zip(leftover_ids, teams))
+        
+        return user_teams
+    
+    async def _list_users(self, user_ids: List[str]) -> List[Dict]:
+        """List user objects (with teams) for a batch of user IDs"""
+        params = [("ids[]", user_id) for user_id in user_ids]
+        params += [("include[]", "teams"), ("limit", len(user_ids))]
+        try:
+            response = await self._get("/users", params=params)
+            if response.status_code != 200:
+                return []
+            return response.json().get('users', [])
+        except Exception:
+            return []
+    
+    async def get_responders_data(self, incident_data: Dict) -> List[Dict]:
+        """
+        Get responders data in a structured format, ordered by request time.
+        
+        Teams for every responder are resolved up front in a single bulk lookup
+        (served from the user teams cache where possible) before the responder
+        list is built. The result is cached per incident snapshot, so repeat
+        renders of the same incident version do no work at all.
+        
+        Args:
+            incident_data: Incident data from PagerDuty API
+        
+        Returns:
+            List of dictionaries containing responder information, ordered by request time
+        """
+        snapshot_key = self._get_snapshot_key(incident_data)
+        if snapshot_key is not None:
+            cached_responders = self.responders_cache.get(snapshot_key)
+            if cached_responders is not None:
+                return cached_responders
+        
+        user_teams = await self.get_users_teams(self._get_responder_user_ids(incident_data))
+        
+        responders_data = self._build_responders_data(incident_data, lambda user_id: user_teams.get(user_id, []))
+        if snapshot_key is not None:
+            self.responders_cache.set(snapshot_key, responders_data)
+        return responders_data
+    
+    async def generate_notification_message(
+        self,
+        incident_data: Dict,
+        ticket_number: str,
+        update_number: int = 1,
+        resolve: bool = False,
+        downgrade: bool = False,
+        responders_data: Optional[List[Dict]] = None,
+        template: Optional[str] = None
+    ) -> str:
+        """
+        Generate notification message for incident.
+        
+        Args:
+            incident_data: Incident data from PagerDuty API
+            ticket_number: The incident ticket number
+            update_number: The update number (defaults to 1)
+            resolve: Whether to add "Resolved |" prefix to update line
+            downgrade: Whether to add "Downgraded |" prefix to update line
+            responders_data: Already resolved responders; looked up from the API if None
+            template: Name of the notification template; the default one if None
+        
+        Returns:
+            Formatted notification message string
+        """
+        if responders_data is None:
+            try:
+                responders_data = await self.get_responders_data(incident_data)
+            except Exception:
+                # Fall back to the escalation policy name, same as the sync client
+                responders_data = []
+        
+        return super().generate_notification_message(
+            incident_data, ticket_number, update_number, resolve, downgrade,
+            responders_data=responders_data,
+            template=template
+        )
+    
+    async def add_note(self, incident_id: str, message: str) -> Dict:
+        """
+        Add a note to a PagerDuty incident.
+        
+        Args:
+            incident_id: The PagerDuty incident ID
+            message: The note message
+        
+        Returns:
+            Dict containing success status and response data
+        """
+        try:
+            response = await self._post(f"/incidents/{incident_id}/notes", {"note": {"content": message}})
+            
+            if response.status_code == 201:
+                self.invalidate_incident(incident_id)
+                data = response.json()
+                # Readers see the note right away; the next sync skips it
+                if data.get('note'):
+                    self.record_timeline_items("notes", incident_id, [data['note']])
+                return {
+                    "success": True,
+                    "message": "Note added successfully",
+                    "data": data
+                }
+            else:
+                return {
+                    "success": False,
+                    "message": f"Failed to add note: {response.status_code}",
+                    "error": response.text,
+                    "status_code": response.status_code
+                }
+        
+        except httpx.RequestError as e:
+            raise Exception(f"Network error adding note: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Error adding note: {str(e)}")
+    
+    async def _get_current_user(self) -> str:
+        """Get current user information from PagerDuty API (cached after the first successful lookup)"""
+        if self.current_user is not None:
+            return self.current_user
+        return await self.in_flight.do("users/me", self._fetch_current_user)
+    
+    async def _fetch_current_user(self) -> str:
+        try:
+            response = await self._get("/users/me")
+            
+            if response.status_code != 200:
+                return "System"
+            
+            display_name = self._get_user_display_name(response.json().get('user', {}))
+            # Stored in the disk cache, which may wait on a lock
+            return await asyncio.to_thread(self._remember_current_user, display_name)
+        except Exception:
+            return "System"
+    
+    async def _format_status_update_template(
+        self,
+        incident_data: Dict,
+        message: str,
+        status: str,
+        incident_id: str,
+        current_user: Optional[str] = None
+    ) -> str:
+        """Format the status update using PagerDuty communication template"""
+        if current_user is None:
+            current_user = await self._get_current_user()
+        
+        return super()._format_status_update_template(
+            incident_data, message, status, incident_id, current_user=current_user
+        )
+    
+    async def get_custom_field_values(self, incident_id: str) -> Dict:
+        """
+        Get custom field values for a PagerDuty incident.
+        
+        Args:
+            incident_id: The PagerDuty incident ID
+        
+        Returns:
+            Dict containing custom field values for the incident, or empty dict if not available
+        """
+        try:
+            response = await self._get(f"/incidents/{incident_id}/custom_fields/values")
+            
+            if response.status_code == 200:
+                return response.json()
+            elif response.status_code == 404:
+                # Custom fields not available for this incident
+                return {
+                    "custom_field_values": [],
+                    "message": "No custom fields configured for this incident",
+                    "available": False
+                }
+            else:
+                raise Exception(f"Failed to get custom field values: {response.status_code} - {response.text}")
+        
+        except httpx.RequestError as e:
+            raise Exception(f"Network error getting custom field values: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Error getting custom field values: {str(e)}")
+    
+    async def send_status_update(
+        self,
+        incident_id: str,
+        status: str,
+        message: str,
+        add_note: bool = True,
+        on_note_added: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Send a status update to a PagerDuty incident.
+        
+        Returns as soon as the status update lands. Only then is the matching note
+        written, in the background; its outcome can be looked up by the write ID
+        returned under "note_result" (see get_note_write).
+        
+        Args:
+            incident_id: The PagerDuty incident ID
+            status: The status update type (e.g., 'investigating', 'identified', 'monitoring', 'resolved')
+            message: The status update message
+            add_note: Whether to add the matching note (False when the caller writes it itself)
+            on_note_added: Called with the note result once the note has been added
+        
+        Returns:
+            Dict containing success status and response data
+        """
+        try:
+            # Get incident data (from the snapshot cache while fresh) and the author to
+            # populate template variables
+            incident_data, current_user = await asyncio.gather(
+                self.get_incident_data_by_id(incident_id),
+                self._get_current_user()
+            )
+            
+            incident = incident_data.get('incident', {})
+            incident_title = incident.get('title', '')
+            current_status = incident.get('status', '').upper()
+            
+            html_message = await self._format_status_update_template(
+                incident_data,
+                message,
+                status,
+                incident_id,
+                current_user=current_user
+            )
+            
+            payload = {
+                "message": message,
+                "subject": f"[PagerDuty Status]: {current_status.title()}: {incident_title}",
+                "html_message": html_message
+            }
+            
+            response = await self._post(f"/incidents/{incident_id}/status_updates", payload)
+            
+            if response.status_code == 200:
+                self.invalidate_incident(incident_id)
+                data = response.json()
+                if data.get('status_update'):
+                    self.record_timeline_items("status_updates", incident_id, [data['status_update']])
+                
+                result = {
+                    "success": True,
+                    "message": "Status update sent successfully",
+                    "data": data
+                }
+                # Also add a note with the same message, behind the status update
+                if add_note:
+                    result["message"] += ", note queued"
+                    result["note_result"] = self._add_note_behind(incident_id, message, on_note_added)
+                return result
+            else:
+                return {
+                    "success": False,
+                    "message": f"Failed to send status update: {response.status_code}",
+                    "error": response.text,
+                    "status_code": response.status_code
+                }
+        
+        except httpx.RequestError as e:
+            raise Exception(f"Network error sending status update: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Error sending status update: {str(e)}")
+    
+    def _add_note_behind(
+        self,
+        incident_id: str,
+        message: str,
+        on_note_added: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Add a note in the background, tracked so aclose() can wait for it.
+        
+        Returns:
+            The pending note result, with the ID get_note_write looks it up by
+        """
+        write = {
+            "id": secrets.token_hex(8),
+            "incident_id": incident_id,
+            "status": "pending",
+            "last_error": None,
+            "result": None
+        }
+        self.note_writes.set(write["id"], write)
+        task = start_background_task(self._write_note(write, message, on_note_added))
+        self.pending_writes.add(task)
+        task.add_done_callback(self.pending_writes.discard)
+        return {"success": None, "queued": True, "write_id": write["id"], "message": "Note queued"}
+    
+    def get_note_write(self, write_id: str) -> Optional[Dict]:
+        """Get the state of a background note write ("pending", "sent" or "failed"), or None if unknown"""
+        return self.note_writes.get(write_id)
+    
+    async def _write_note(
+        self,
+        write: Dict,
+        message: str,
+        on_note_added: Optional[Callable[[Dict], None]]
+    ) -> None:
+        """Add a note, retrying network errors a few times (throttling is retried by the scheduler)"""
+        incident_id = write["incident_id"]
+        for attempt in range(NOTE_WRITE_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(2 ** attempt)
+            try:
+                result = await self.add_note(incident_id, message)
+            except Exception as e:
+                error = str(e)
+                continue
+            if result.get("success"):
+                write.update(status="sent", result=result)
+                if on_note_added is not None:
+                    on_note_added(result)
+                return
+            # PagerDuty answered; retrying a rejected note would not help
+            error = f"{result.get('message')} - {result.get('error')}"
+            break
+        write.update(status="failed", last_error=error)
+        print(f"Error adding status update note to incident {incident_id}: {error}")
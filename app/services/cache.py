@@ -0,0 +1,221 @@
+"""
+In-process caches shared by the PagerDuty clients
+Pure Python module with no external framework dependencies
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from .disk_cache import DiskCache
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded cache with per-entry expiry and least-recently-used eviction.
+    
+    Safe to share between threads and between the sync and async clients.
+    Hit, miss and eviction counters are kept for monitoring.
+    
+    With a `store`, the cache is also kept in a namespace of a DiskCache: it starts
+    with the entries stored there (by this or an earlier process), a miss is looked
+    up there before counting as one, and every change is written through. Keys
+    must then be strings and values JSON-serializable. Async code uses aget and
+    aset, which do the store I/O in a thread: the file may be locked by another
+    process for a while.
+    """
+    
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 300.0,
+        store: Optional[DiskCache] = None,
+        namespace: Optional[str] = None
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            maxsize: Maximum number of entries before the least recently used is evicted
+            ttl: Default time-to-live of an entry in seconds
+            store: Persistent cache backing this one; memory only if None
+            namespace: Namespace of this cache's entries in the store
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        
+        self.store = store if store is not None and store.enabled else None
+        self.namespace = namespace
+        if self.store is not None:
+            if not namespace:
+                raise ValueError("A TTLCache backed by a store needs a namespace")
+            self.store.register(namespace, maxsize)
+            now = time.monotonic()
+            for key, value, remaining in self.store.load(namespace, maxsize):
+                self._data[key] = (value, now + remaining)
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a live entry, counting the lookup as a hit or a miss"""
+        value = self._get_memory(key)
+        if value is not _MISSING:
+            return value
+        if self.store is None:
+            return default
+        # Another process may have stored it since this cache was loaded
+        return self._take_stored(key, self.store.get(self.namespace, key), default)
+    
+    async def aget(self, key: Hashable, default: Any = None) -> Any:
+        """Like get, but a store read runs in a thread so a locked cache file cannot stall the event loop"""
+        value = self._get_memory(key)
+        if value is not _MISSING:
+            return value
+        if self.store is None:
+            return default
+        stored = await asyncio.to_thread(self.store.get, self.namespace, key)
+        return self._take_stored(key, stored, default)
+    
+    def _get_memory(self, key: Hashable) -> Any:
+        """Get a live entry from memory, or _MISSING (counted as a miss unless the store is still to be asked)"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            if self.store is None:
+                self.misses += 1
+            return _MISSING
+    
+    def _take_stored(self, key: Hashable, stored: Optional[tuple], default: Any) -> Any:
+        """Keep an entry read from the store in memory and count the lookup"""
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return default
+            value, remaining = stored
+            self._put(key, value, time.monotonic() + remaining)
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store an entry, evicting the least recently used ones if the cache is full"""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._put(key, value, time.monotonic() + ttl)
+        if self.store is not None:
+            self.store.set(self.namespace, key, value, ttl)
+    
+    async def aset(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Like set, but the store write (which may commit) runs in a thread"""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._put(key, value, time.monotonic() + ttl)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.set, self.namespace, key, value, ttl)
+    
+    def _put(self, key: Hashable, value: Any, expires_at: float) -> None:
+        """Store an entry in memory (caller holds the lock)"""
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, key: Hashable) -> None:
+        """Drop an entry if present"""
+        with self._lock:
+            self._data.pop(key, None)
+        if self.store is not None:
+            self.store.delete(self.namespace, key)
+    
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._data.clear()
+        if self.store is not None:
+            self.store.clear(self.namespace)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            return entry is not _MISSING and entry[1] > time.monotonic()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+        if self.store is not None:
+            # Hits answered from the store after a memory miss
+            stats["disk_hits"] = self.disk_hits
+        return stats
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent async calls for the same key into one in-flight call.
+    
+    The first caller for a key starts the work; callers arriving while it is still
+    running await the same result instead of starting their own.
+    """
+    
+    def __init__(self):
+        """Initialize the in-flight call registry"""
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn for key, or join the call already in flight for it.
+        
+        Args:
+            key: Identifies calls that are interchangeable
+            fn: Zero-argument coroutine function doing the work
+            
+        Returns:
+            The result of the (possibly shared) call
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        # Shield so one cancelled caller does not cancel the call for everyone else
+        return await asyncio.shield(task)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get in-flight and coalescing counters"""
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced
+        }
@@ -0,0 +1,305 @@
+"""
+Persistent cache of slowly changing PagerDuty entities
+SQLite file shared by the app and the CLI, so a restart starts with warm caches
+Pure Python module with no external framework dependencies
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Bump when the shape of a cached value changes: entries stored by another version are ignored
+CACHE_VERSION = 1
+
+# Namespaces of the cached entities
+NS_USER_TEAMS = "user_teams"          # user ID -> team names
+NS_SLACK_CHANNELS = "slack_channels"  # incident ID -> Slack channel info ({} while there is none)
+NS_CURRENT_USER = "current_user"      # token fingerprint -> display name of the token's user
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_entries_expiry ON cache_entries (expires_at);
+"""
+
+# Marks a pending delete in the write buffer
+_DELETED = object()
+
+
+class DiskCache:
+    """
+    Key-value store of JSON values with per-entry expiry, grouped in namespaces.
+    
+    It backs the in-process TTLCaches (see TTLCache's `store`), which load its live
+    entries when created, read through to it on a miss and write through to it.
+    Entries other processes store are seen on the next miss.
+    
+    Writes are buffered and committed together once `flush_interval` has passed or
+    `flush_size` writes are pending, so a bulk team lookup costs one commit rather
+    than one per user; reads see buffered writes. Expiry is wall-clock time, since
+    entries outlive the process. Namespaces registered with a size limit are pruned
+    to their most recently stored entries every `prune_interval` and on close.
+    
+    Like the incident index, the file is only an accelerator: commits are not
+    fsynced, a missing path disables it and every error is reported and ignored.
+    """
+    
+    def __init__(
+        self,
+        path: Optional[str],
+        version: int = CACHE_VERSION,
+        flush_interval: float = 1.0,
+        flush_size: int = 256,
+        prune_interval: float = 300.0
+    ):
+        """
+        Open (or create) the cache file.
+        
+        Args:
+            path: SQLite database file; disabled if None (or if the file cannot be opened)
+            version: Version stamp of stored entries; entries of other versions are ignored
+            flush_interval: Most seconds a write stays buffered while others follow
+            flush_size: Buffered writes that trigger a commit
+            prune_interval: Seconds between removals of expired and surplus entries
+        """
+        self.path = path
+        self.version = version
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.prune_interval = prune_interval
+        self.limits: Dict[str, int] = {}
+        self._pending: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._flushed_at = time.monotonic()
+        self._pruned_at = time.monotonic()
+        
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute("PRAGMA busy_timeout=5000")
+                self._db.executescript(_SCHEMA)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Disk cache {path} cannot be opened, caching in memory only: {e}")
+                self._db = None
+        
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.loaded = 0
+        self.written = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self._db is not None
+    
+    def register(self, namespace: str, maxsize: int) -> None:
+        """Limit a namespace to its `maxsize` most recently stored entries"""
+        self.limits[namespace] = maxsize
+    
+    def load(self, namespace: str, limit: int) -> List[Tuple[str, Any, float]]:
+        """
+        Get the live entries of a namespace, most recently stored last.
+        
+        Args:
+            namespace: Namespace to load
+            limit: Most entries returned (the most recently stored ones)
+        
+        Returns:
+            (key, value, seconds to live) of every entry
+        """
+        if self._db is None:
+            return []
+        now = time.time()
+        with self._lock:
+            self._flush()
+            try:
+                rows = self._db.execute(
+                    "SELECT key, value, expires_at FROM cache_entries"
+                    " WHERE namespace = ? AND version = ? AND expires_at > ?"
+                    " ORDER BY rowid DESC LIMIT ?",
+                    (namespace, self.version, now, limit)
+                ).fetchall()
+            except sqlite3.Error as e:
+                print(f"Error loading {namespace} from the disk cache: {e}")
+                return []
+        
+        entries = []
+        for key, value, expires_at in reversed(rows):
+            try:
+                entries.append((key, json.loads(value), expires_at - now))
+            except ValueError:
+                continue
+        self.loaded += len(entries)
+        return entries
+    
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Get a live entry.
+        
+        Returns:
+            The value and its seconds to live, or None if there is no live entry
+        """
+        if self._db is None:
+            return None
+        now = time.time()
+        with self._lock:
+            pending = self._pending.get((namespace, key))
+            if pending is not None:
+                row = None if pending is _DELETED else pending
+            else:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM cache_entries"
+                        " WHERE namespace = ? AND key = ? AND version = ?",
+                        (namespace, key, self.version)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"Error reading {namespace} from the disk cache: {e}")
+                    row = None
+            self._maybe_flush()
+        
+        if row is not None and row[1] > now:
+            try:
+                value = json.loads(row[0])
+            except ValueError:
+                value = None
+            if value is not None:
+                self.hits += 1
+                return value, row[1] - now
+        self.misses += 1
+        return None
+    
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        """Store a JSON-serializable value for `ttl` seconds"""
+        if self._db is None:
+            return
+        try:
+            encoded = json.dumps(value, separators=(',', ':'))
+        except (TypeError, ValueError) as e:
+            print(f"Cannot store {namespace} entry {key} in the disk cache: {e}")
+            return
+        with self._lock:
+            # Re-added last, so entries are committed (and numbered) in the order they were stored
+            self._pending.pop((namespace, key), None)
+            self._pending[(namespace, key)] = (encoded, time.time() + ttl)
+            self._maybe_flush()
+    
+    def delete(self, namespace: str, key: str) -> None:
+        """Drop an entry if present"""
+        if self._db is None:
+            return
+        with self._lock:
+            self._pending.pop((namespace, key), None)
+            self._pending[(namespace, key)] = _DELETED
+            self._maybe_flush()
+    
+    def clear(self, namespace: str) -> None:
+        """Drop every entry of a namespace"""
+        if self._db is None:
+            return
+        with self._lock:
+            self._flush()
+            try:
+                self._db.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+            except sqlite3.Error as e:
+                print(f"Error clearing {namespace} in the disk cache: {e}")
+    
+    def flush(self) -> None:
+        """Commit the buffered writes"""
+        with self._lock:
+            self._flush()
+    
+    def _maybe_flush(self) -> None:
+        if self._pending and (
+            len(self._pending) >= self.flush_size
+            or time.monotonic() - self._flushed_at >= self.flush_interval
+        ):
+            self._flush()
+        if time.monotonic() - self._pruned_at >= self.prune_interval:
+            self._prune()
+    
+    def _flush(self) -> None:
+        """Commit the buffered writes in one transaction (caller holds the lock)"""
+        self._flushed_at = time.monotonic()
+        if not self._pending or self._db is None:
+            return
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        try:
+            self._db.execute("BEGIN")
+            for (namespace, key), entry in pending.items():
+                if entry is _DELETED:
+                    self._db.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+                    )
+                else:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO cache_entries"
+                        " (namespace, key, value, version, stored_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        (namespace, key, entry[0], self.version, now, entry[1])
+                    )
+            self._db.execute("COMMIT")
+            self.written += len(pending)
+        except sqlite3.Error as e:
+            # Still cached in memory; the next process just fetches them again
+            print(f"Error saving {len(pending)} entries to the disk cache: {e}")
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+    
+    def _prune(self) -> None:
+        """Remove expired entries, entries of other versions and entries beyond the namespace limits (caller holds the lock)"""
+        self._pruned_at = time.monotonic()
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "DELETE FROM cache_entries WHERE expires_at <= ? OR version != ?", (time.time(), self.version)
+            )
+            for namespace, maxsize in self.limits.items():
+                self._db.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key NOT IN"
+                    " (SELECT key FROM cache_entries WHERE namespace = ? ORDER BY rowid DESC LIMIT ?)",
+                    (namespace, namespace, maxsize)
+                )
+        except sqlite3.Error as e:
+            print(f"Error pruning the disk cache: {e}")
+    
+    def close(self) -> None:
+        """Commit the buffered writes, prune and close the cache file"""
+        with self._lock:
+            if self._db is not None:
+                self._flush()
+                self._prune()
+                self._db.close()
+                self._db = None
+    
+    def stats(self) -> Dict:
+        """Get buffered writes and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "persistent": self._db is not None,
+            "version": self.version,
+            "pending_writes": len(self._pending),
+            "loaded": self.loaded,
+            "written": self.written,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
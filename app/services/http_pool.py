@@ -0,0 +1,76 @@
+"""
+Shared HTTP connection pools for upstream services
+One long-lived httpx.AsyncClient per upstream, reused across requests
+"""
+
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+
+
+# HTTP/2 support in httpx needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class HTTPClientPool:
+    """
+    Process-wide registry of pooled HTTP clients, keyed by upstream name.
+    
+    Each upstream gets its own httpx.AsyncClient so connection limits and keep-alive
+    are tracked per host. Clients are created on first use and closed by aclose().
+    """
+    
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 30.0
+    ):
+        """
+        Initialize the pool settings shared by all upstream clients.
+        
+        Args:
+            max_connections: Maximum concurrent connections per upstream
+            max_keepalive_connections: Maximum idle connections kept open per upstream
+            keepalive_expiry: Seconds an idle connection is kept before being closed
+            timeout: Default request timeout in seconds
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout)
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+    
+    def get(self, name: str, http2: bool = False, transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+        """
+        Get the pooled client for an upstream, creating it on first use.
+        
+        Args:
+            name: Upstream name (e.g. "pagerduty", "slack")
+            http2: Negotiate HTTP/2 when the h2 package is installed
+            transport: Optional custom transport, mainly for tests and benchmarks
+        
+        Returns:
+            The shared httpx.AsyncClient for the upstream
+        """
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=http2 and HTTP2_AVAILABLE,
+                transport=transport
+            )
+            self._clients[name] = client
+        return client
+    
+    async def aclose(self) -> None:
+        """Close every upstream client and drop its pooled connections"""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
@@ -0,0 +1,198 @@
+"""
+Incident number <-> incident ID index
+Persistent two-way map filled from every incident payload seen, shared by the app and the CLI
+Pure Python module with no external framework dependencies
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incident_index (
+    incident_number TEXT PRIMARY KEY,
+    incident_id TEXT NOT NULL UNIQUE,
+    seen_at REAL NOT NULL
+);
+"""
+
+
+def is_incident_number(key: str) -> bool:
+    """Whether an identifier is an incident number ("123456") rather than an incident ID ("Q1ABC2DEF3GH")"""
+    return key.isdigit()
+
+
+class IncidentIndex:
+    """
+    Two-way map of incident numbers and incident IDs.
+    
+    PagerDuty never reassigns either identifier, so an entry is recorded once
+    from the first payload that carries both and is never refreshed. Lookups are
+    answered from memory; a miss checks the SQLite file, which other processes
+    (the CLI, other workers) add to as well.
+    
+    The file is only an accelerator: everything in it can be rebuilt from
+    PagerDuty, so commits are not fsynced and a missing path keeps the index in
+    memory only. The file is shared with the CLI and may be locked for a while,
+    so async code uses arecord/arecord_many/aid_for, which touch it in a thread.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open (or create) the index file.
+        
+        Args:
+            path: SQLite database file; memory only if None (or if the file cannot be opened)
+        """
+        self.path = path
+        self._ids: Dict[str, str] = {}
+        self._numbers: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute("PRAGMA busy_timeout=5000")
+                self._db.executescript(_SCHEMA)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Incident index {path} cannot be opened, keeping it in memory: {e}")
+                self._db = None
+        
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+    
+    def record(self, incident: Dict) -> None:
+        """
+        Remember the number and ID of an incident object (as found under "incident"
+        or in a list response); objects missing either are ignored.
+        """
+        self.record_many([incident])
+    
+    def record_many(self, incidents: Iterable[Dict]) -> None:
+        """Remember the numbers and IDs of several incident objects, saving the new ones in one transaction"""
+        entries = self._learn(incidents)
+        if entries:
+            self._save(entries)
+    
+    async def arecord(self, incident: Dict) -> None:
+        """Like record, but the file is written in a thread so a lock held by another process cannot stall the event loop"""
+        await self.arecord_many([incident])
+    
+    async def arecord_many(self, incidents: Iterable[Dict]) -> None:
+        """Like record_many, with the file written in a thread (lookups see the entries right away)"""
+        entries = self._learn(incidents)
+        if entries and self._db is not None:
+            await asyncio.to_thread(self._save, entries)
+    
+    def _learn(self, incidents: Iterable[Dict]) -> List[Tuple[str, str]]:
+        """Remember new entries in memory and return them as (number, ID) pairs to save"""
+        entries = []
+        for incident in incidents:
+            incident_id = incident.get('id')
+            incident_number = incident.get('incident_number')
+            if not incident_id or incident_number is None:
+                continue
+            incident_number = str(incident_number)
+            if self._ids.get(incident_number) == incident_id:
+                continue
+            with self._lock:
+                self._remember(incident_number, incident_id)
+                self.recorded += 1
+            entries.append((incident_number, incident_id))
+        return entries
+    
+    def _save(self, entries: List[Tuple[str, str]]) -> None:
+        with self._lock:
+            if self._db is None:
+                return
+            now = time.time()
+            try:
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO incident_index (incident_number, incident_id, seen_at) VALUES (?, ?, ?)",
+                    [(incident_number, incident_id, now) for incident_number, incident_id in entries]
+                )
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                # Still answered from memory; the next process just learns them again
+                print(f"Error saving {len(entries)} incidents to the index: {e}")
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+    
+    def id_for(self, incident_number: str, from_file: bool = True) -> Optional[str]:
+        """
+        Get the ID of an incident number, or None if it has not been seen.
+        
+        Args:
+            incident_number: Incident number
+            from_file: Whether a memory miss checks the file; False answers from memory only
+        """
+        return self._lookup(self._ids, "incident_number", str(incident_number), from_file)
+    
+    def number_for(self, incident_id: str, from_file: bool = True) -> Optional[str]:
+        """Get the number of an incident ID, or None if it has not been seen (see id_for)"""
+        return self._lookup(self._numbers, "incident_id", incident_id, from_file)
+    
+    async def aid_for(self, incident_number: str) -> Optional[str]:
+        """Like id_for, but a memory miss reads the file in a thread"""
+        incident_number = str(incident_number)
+        incident_id = self._ids.get(incident_number)
+        if incident_id is not None or self._db is None:
+            return self._lookup(self._ids, "incident_number", incident_number, from_file=False)
+        return await asyncio.to_thread(self._lookup, self._ids, "incident_number", incident_number)
+    
+    def _lookup(self, memory: Dict[str, str], key_column: str, key: str, from_file: bool = True) -> Optional[str]:
+        """Look a key up in memory, then in the file (which other processes may have added it to)"""
+        value = memory.get(key)
+        if value is None and from_file and self._db is not None:
+            with self._lock:
+                try:
+                    row = self._db.execute(
+                        f"SELECT incident_number, incident_id FROM incident_index WHERE {key_column} = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"Error reading the incident index: {e}")
+                    row = None
+                if row is not None:
+                    self._remember(*row)
+                    value = memory.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+    
+    def _remember(self, incident_number: str, incident_id: str) -> None:
+        self._ids[incident_number] = incident_id
+        self._numbers[incident_id] = incident_number
+    
+    def close(self) -> None:
+        """Close the index file (lookups keep working from memory)"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+    
+    def stats(self) -> Dict:
+        """Get entry count and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._ids),
+            "persistent": self._db is not None,
+            "recorded": self.recorded,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,369 @@
+"""
+Server-push incident change stream
+One poll loop per watched incident, fanned out to every subscribed browser tab
+"""
+
+import asyncio
+import itertools
+import json
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .async_pagerduty_client import AsyncPagerDutyClient
+from .instrumentation import start_background_task
+from .request_scheduler import PRIORITY_BACKGROUND
+
+
+# Log entry IDs remembered per incident to drop duplicates at the `since` boundary
+SEEN_LOG_ENTRIES_LIMIT = 1000
+
+
+class Subscription:
+    """One subscriber's queue of events, closed when the subscriber falls too far behind"""
+    
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.closed = False
+    
+    def push(self, event: Tuple[str, int, Dict]) -> bool:
+        """
+        Queue an event without blocking the watcher.
+        
+        Returns:
+            False if the subscriber was too slow and has been closed instead
+        """
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            # Drop the backlog and let the client reconnect for a fresh snapshot
+            self.close()
+            return False
+    
+    def close(self) -> None:
+        """Discard queued events and wake the reader with the end-of-stream marker"""
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+    
+    async def get(self, timeout: float) -> Optional[Tuple[str, int, Dict]]:
+        """
+        Wait for the next event.
+        
+        Returns:
+            The event, or None once the subscription is closed
+        
+        Raises:
+            asyncio.TimeoutError: If no event arrived within the timeout
+        """
+        return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+
+
+class IncidentWatcher:
+    """
+    Polls one incident and pushes what changed to its subscribers.
+    
+    The incident detail, notes, status updates and new log entries are polled in
+    the background lane; only additions are pushed, so a subscriber that has the
+    snapshot can keep its view current from the deltas alone.
+    """
+    
+    def __init__(
+        self,
+        client: AsyncPagerDutyClient,
+        incident_id: str,
+        poll_interval: float,
+        idle_timeout: float,
+        on_stopped: Optional[Callable[["IncidentWatcher"], None]] = None
+    ):
+        self.client = client
+        self.incident_id = incident_id
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.on_stopped = on_stopped
+        self.subscribers: Set[Subscription] = set()
+        
+        # Last known state
+        self.ready = False
+        self.incident_data: Optional[Dict] = None
+        self.responders: Optional[List[Dict]] = None
+        self.notes: Dict[str, Dict] = {}
+        self.status_updates: Dict[str, Dict] = {}
+        self.log_entries_since = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.seen_log_entries: Dict[str, None] = {}
+        
+        self.polls = 0
+        self.events = 0
+        self._sequence = itertools.count(1)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            # Started from the subscribing request, whose trace must not collect the polls
+            self._task = start_background_task(self._run())
+            if self.on_stopped is not None:
+                self._task.add_done_callback(lambda _: self.on_stopped(self))
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def poke(self) -> None:
+        """Poll now instead of waiting for the next interval (e.g. right after a write)"""
+        self._wake.set()
+    
+    def snapshot(self) -> Dict:
+        """Full current state, sent to a subscriber when it joins"""
+        return {
+            "incident_data": self.incident_data,
+            "responders": self.responders,
+            "notes": list(self.notes.values()),
+            "status_updates": list(self.status_updates.values())
+        }
+    
+    def add_subscriber(self, subscription: Subscription) -> None:
+        self.subscribers.add(subscription)
+        if self.ready:
+            subscription.push(("snapshot", next(self._sequence), self.snapshot()))
+    
+    def add_pushed(self, kind: str, items: List[Dict]) -> None:
+        """
+        Merge notes or status updates pushed by a webhook and send the new ones right away.
+        
+        Args:
+            kind: "notes" or "status_updates"
+            items: Items shaped like the API returns them; ones already known are ignored
+        """
+        if not self.ready:
+            # The first poll fetches them along with the snapshot
+            return
+        known = self.notes if kind == "notes" else self.status_updates
+        added = self._merge(known, items)
+        if added:
+            self._broadcast(kind, {"added": added})
+    
+    def _broadcast(self, event: str, data: Dict) -> None:
+        sequence = next(self._sequence)
+        self.events += 1
+        for subscription in list(self.subscribers):
+            if not subscription.push((event, sequence, data)):
+                self.subscribers.discard(subscription)
+    
+    async def _run(self) -> None:
+        """Poll until nobody has been subscribed for idle_timeout seconds"""
+        idle_since = None
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.subscribers:
+                idle_since = None
+            elif idle_since is None:
+                idle_since = loop.time()
+            elif loop.time() - idle_since >= self.idle_timeout:
+                return
+            
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error polling incident {self.incident_id}: {e}")
+                self._broadcast("error", {"message": str(e)})
+            
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def poll(self) -> None:
+        """Fetch the incident's current state and push what changed since the last poll"""
+        self.polls += 1
+        if self.ready:
+            incident_data = await self.client.refresh_incident(self.incident_id, priority=PRIORITY_BACKGROUND)
+        else:
+            # The page that opened the stream has usually just loaded this snapshot
+            incident_data = await self.client._get_incident(self.incident_id)
+        
+        notes, status_updates, log_entries = await asyncio.gather(
+            # Synced every poll; only notes added since the last one are fetched
+            self.client.get_incident_notes(self.incident_id, priority=PRIORITY_BACKGROUND, max_age=0),
+            self.client.get_status_updates(self.incident_id, priority=PRIORITY_BACKGROUND, max_age=0),
+            self.client.get_log_entries(self.incident_id, since=self.log_entries_since, priority=PRIORITY_BACKGROUND)
+        )
+        
+        new_log_entries = self._merge_log_entries(log_entries)
+        slack_channel_info = await self._get_slack_channel(new_log_entries)
+        if slack_channel_info:
+            incident_data['slack_channel'] = slack_channel_info
+        
+        incident_changed = incident_data != self.incident_data
+        if incident_changed:
+            self.incident_data = incident_data
+            self.responders = await self.client.get_responders_data(incident_data)
+        new_notes = self._merge(self.notes, notes)
+        new_status_updates = self._merge(self.status_updates, status_updates)
+        
+        if not self.ready:
+            self.ready = True
+            self._broadcast("snapshot", self.snapshot())
+            return
+        
+        if incident_changed:
+            self._broadcast("incident", {"incident_data": self.incident_data, "responders": self.responders})
+        if new_notes:
+            self._broadcast("notes", {"added": new_notes})
+        if new_status_updates:
+            self._broadcast("status_updates", {"added": new_status_updates})
+        if new_log_entries:
+            self._broadcast("log_entries", {"added": new_log_entries})
+    
+    def _merge(self, known: Dict[str, Dict], items: List[Dict]) -> List[Dict]:
+        """Add items not seen before to `known` and return them (a failed fetch returns nothing new)"""
+        added = [item for item in items if item.get('id') not in known]
+        for item in added:
+            known[item.get('id')] = item
+        return added
+    
+    def _merge_log_entries(self, log_entries: List[Dict]) -> List[Dict]:
+        """Return the log entries not pushed before and move the `since` cursor forward"""
+        added = [entry for entry in log_entries if entry.get('id') not in self.seen_log_entries]
+        for entry in added:
+            self.seen_log_entries[entry.get('id')] = None
+            self.log_entries_since = max(self.log_entries_since, entry.get('created_at', ''))
+        while len(self.seen_log_entries) > SEEN_LOG_ENTRIES_LIMIT:
+            self.seen_log_entries.pop(next(iter(self.seen_log_entries)))
+        return added
+    
+    async def _get_slack_channel(self, new_log_entries: List[Dict]) -> Optional[Dict]:
+        """Slack channel of the incident, picked up from new log entries once it is created"""
+        for entry in new_log_entries:
+            slack_channel_info = self.client._get_chat_channel(entry)
+            if slack_channel_info:
+                await self.client.slack_channel_cache.aset(self.incident_id, slack_channel_info)
+                return slack_channel_info
+        if not self.ready:
+            return await self.client.get_slack_channel_from_log_entries(self.incident_id)
+        return (self.incident_data or {}).get('slack_channel')
+    
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for subscription in list(self.subscribers):
+            subscription.close()
+        self.subscribers.clear()
+
+
+class IncidentStreamHub:
+    """
+    Registry of incident watchers shared by every stream subscriber in the process.
+    
+    Fifty browser tabs watching the same incident share one watcher and therefore
+    one upstream poll loop. A watcher stops on its own once it has had no
+    subscribers for `idle_timeout` seconds.
+    """
+    
+    def __init__(
+        self,
+        client: AsyncPagerDutyClient,
+        poll_interval: float = 10.0,
+        idle_timeout: float = 60.0,
+        queue_size: int = 100
+    ):
+        """
+        Initialize the hub.
+        
+        Args:
+            client: PagerDuty client the watchers poll through
+            poll_interval: Seconds between polls of a watched incident
+            idle_timeout: Seconds a watcher keeps polling after its last subscriber left
+            queue_size: Events buffered per subscriber before it is disconnected as too slow
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.queue_size = queue_size
+        self.watchers: Dict[str, IncidentWatcher] = {}
+    
+    def subscribe(self, incident_id: str) -> Subscription:
+        """
+        Subscribe to an incident's changes, starting its watcher if needed.
+        
+        Args:
+            incident_id: PagerDuty incident ID (not ticket number)
+        
+        Returns:
+            Subscription receiving a snapshot followed by deltas
+        """
+        watcher = self.watchers.get(incident_id)
+        if watcher is None or not watcher.running:
+            watcher = IncidentWatcher(
+                self.client, incident_id, self.poll_interval, self.idle_timeout,
+                on_stopped=self._forget
+            )
+            self.watchers[incident_id] = watcher
+            watcher.start()
+        subscription = Subscription(self.queue_size)
+        watcher.add_subscriber(subscription)
+        return subscription
+    
+    def _forget(self, watcher: IncidentWatcher) -> None:
+        """Drop a watcher whose poll loop has ended, unless it was already replaced"""
+        if self.watchers.get(watcher.incident_id) is watcher:
+            del self.watchers[watcher.incident_id]
+        # Anyone still subscribed (the loop failed) reconnects and gets a new watcher
+        for subscription in list(watcher.subscribers):
+            subscription.close()
+        watcher.subscribers.clear()
+    
+    def is_watching(self, incident_id: str) -> bool:
+        """Whether a watcher is currently polling the incident"""
+        watcher = self.watchers.get(incident_id)
+        return watcher is not None and watcher.running
+    
+    def unsubscribe(self, incident_id: str, subscription: Subscription) -> None:
+        watcher = self.watchers.get(incident_id)
+        if watcher is not None:
+            watcher.subscribers.discard(subscription)
+    
+    def poke(self, incident_id: str) -> None:
+        """Make the incident's watcher (if any) poll right away"""
+        watcher = self.watchers.get(incident_id)
+        if watcher is not None and watcher.running:
+            watcher.poke()
+    
+    def push(self, incident_id: str, kind: str, items: List[Dict]) -> None:
+        """Hand notes or status updates pushed by a webhook to the incident's watcher (if any)"""
+        watcher = self.watchers.get(incident_id)
+        if watcher is not None and watcher.running:
+            watcher.add_pushed(kind, items)
+    
+    async def aclose(self) -> None:
+        """Stop every watcher and close its subscriptions"""
+        watchers = list(self.watchers.values())
+        self.watchers.clear()
+        await asyncio.gather(*(watcher.aclose() for watcher in watchers))
+    
+    def stats(self) -> Dict:
+        """Get per-incident subscriber and poll counters"""
+        return {
+            incident_id: {
+                "running": watcher.running,
+                "subscribers": len(watcher.subscribers),
+                "polls": watcher.polls,
+                "events": watcher.events
+            }
+            for incident_id, watcher in self.watchers.items()
+        }
+
+
+def format_sse(event: str, event_id: int, data: Dict) -> str:
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\nid: {event_id}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
@@ -0,0 +1,114 @@
+"""
+Incident timelines
+Append-only local copies of an incident's notes and status updates, read by cursor
+Pure Python module with no external framework dependencies
+"""
+
+import secrets
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.time_format import STYLE_TIMELINE, format_timestamp
+
+
+def with_display_time(item: Dict) -> Dict:
+    """Add "created_at_display", the creation time as the UI shows it (e.g. "12-Sep-25 | 3:28 PM EDT")"""
+    if 'created_at_display' not in item:
+        try:
+            item['created_at_display'] = format_timestamp(item['created_at'], STYLE_TIMELINE)
+        except (KeyError, TypeError, ValueError):
+            item['created_at_display'] = item.get('created_at') or ''
+    return item
+
+
+class Timeline:
+    """
+    Notes or status updates of one incident, in the order they became known.
+    
+    Entries are only ever appended (an ID already held is ignored), so a reader
+    can pass back the cursor of its last read and get just what was added since.
+    Each entry is given its display time as it is appended.
+    A cursor is "<epoch>:<position>": the epoch is picked when the timeline is
+    created, so a cursor from a timeline that has since been evicted (or from
+    before a restart) is recognised and answered with everything, flagged as a
+    reset.
+    
+    For tail fetches the timeline also tracks how many entries upstream holds and
+    the ID of the last one, which lines the next fetch up with what is held.
+    """
+    
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self._entries: List[Dict] = []
+        self._ids: Dict[str, None] = {}
+        
+        # Upstream position of the next tail fetch
+        self.upstream_count = 0
+        self.upstream_last_id: Optional[str] = None
+        self.synced_at: Optional[float] = None
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @property
+    def cursor(self) -> str:
+        """Cursor of everything held"""
+        return f"{self.epoch}:{len(self._entries)}"
+    
+    def is_fresh(self, max_age: float) -> bool:
+        """Whether the timeline was synced with upstream less than `max_age` seconds ago"""
+        return self.synced_at is not None and time.monotonic() - self.synced_at < max_age
+    
+    def mark_synced(self) -> None:
+        self.synced_at = time.monotonic()
+    
+    def mark_stale(self) -> None:
+        """Have the next read sync with upstream (e.g. after learning of an entry that was not complete)"""
+        self.synced_at = None
+    
+    def append(self, items: Iterable[Dict]) -> List[Dict]:
+        """
+        Append the items not held yet, oldest first.
+        
+        Args:
+            items: Notes or status updates as the API returns them
+        
+        Returns:
+            The items appended
+        """
+        added = []
+        for item in sorted(items, key=lambda x: x.get('created_at') or ''):
+            item_id = item.get('id')
+            if not item_id or item_id in self._ids:
+                continue
+            self._ids[item_id] = None
+            self._entries.append(with_display_time(item))
+            added.append(item)
+        return added
+    
+    def items(self) -> List[Dict]:
+        """Every entry, ordered by creation time (oldest first)"""
+        return sorted(self._entries, key=lambda x: x.get('created_at') or '')
+    
+    def since(self, cursor: Optional[str] = None, limit: Optional[int] = None) -> Tuple[List[Dict], str, bool, bool]:
+        """
+        Read the entries appended after a cursor.
+        
+        Args:
+            cursor: Cursor returned by an earlier read; None to read from the start
+            limit: Most entries returned; None for all of them
+        
+        Returns:
+            (entries, cursor to read the rest from, whether more entries follow,
+            whether the cursor was not recognised and the read started over)
+        """
+        position, reset = 0, False
+        if cursor:
+            epoch, _, offset = cursor.partition(':')
+            if epoch == self.epoch and offset.isdigit() and int(offset) <= len(self._entries):
+                position = int(offset)
+            else:
+                reset = True
+        
+        end = len(self._entries) if limit is None else min(position + limit, len(self._entries))
+        return self._entries[position:end], f"{self.epoch}:{end}", end < len(self._entries), reset
@@ -0,0 +1,305 @@
+"""
+Background incident warmer
+Keeps the hot set of open incidents fresh in the shared caches with adaptive polling
+"""
+
+import asyncio
+import random
+import time
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from .async_pagerduty_client import AsyncPagerDutyClient
+from .instrumentation import start_background_task
+from .request_scheduler import PRIORITY_BACKGROUND
+
+
+class WarmIncident:
+    """Polling state of one incident in the hot set"""
+    
+    def __init__(self, incident_id: str, min_interval: float):
+        self.incident_id = incident_id
+        self.interval = min_interval
+        self.next_poll_at = 0.0
+        self.updated_at: Optional[str] = None
+        self.priority: Optional[str] = None
+        self.status: Optional[str] = None
+        self.polls = 0
+        self.failures = 0
+        self.last_polled_at: Optional[float] = None
+
+
+class IncidentWarmer:
+    """
+    Supervised pool of background polls keeping hot incidents warm.
+    
+    The hot set is every incident viewed in the last `view_ttl` seconds plus every
+    triggered or acknowledged incident with a priority in `hot_priorities`. Each
+    hot incident is re-fetched (incident snapshot, Slack channel and responders)
+    in the background scheduler lane, so requests for it are served from memory.
+    A warmed snapshot is cached for the client's incident cache TTL like any
+    other, so between slow polls requests may still fetch the incident again.
+    
+    Polling is adaptive: an incident that changed is polled again after
+    `min_interval`; each quiet poll doubles the interval, up to `hot_max_interval`
+    for high-priority open incidents and `max_interval` for the rest.
+    """
+    
+    def __init__(
+        self,
+        client: AsyncPagerDutyClient,
+        view_ttl: float = 900.0,
+        hot_priorities: Iterable[str] = ("P1", "P2"),
+        discovery_interval: float = 60.0,
+        min_interval: float = 5.0,
+        hot_max_interval: float = 30.0,
+        max_interval: float = 120.0,
+        max_incidents: int = 50,
+        concurrency: int = 4,
+        skip: Optional[Callable[[str], bool]] = None
+    ):
+        """
+        Initialize the warmer (the pool starts on the first view).
+        
+        Args:
+            client: PagerDuty client whose caches are kept warm
+            view_ttl: Seconds an incident stays hot after it was last viewed
+            hot_priorities: Priority names of open incidents kept warm without being viewed
+            discovery_interval: Seconds between listings of open incidents
+            min_interval: Poll interval of an incident that just changed
+            hot_max_interval: Longest poll interval of a high-priority open incident
+            max_interval: Longest poll interval of any other hot incident
+            max_incidents: Maximum incidents kept warm; the most recently viewed win
+            concurrency: Maximum polls running at once
+            skip: Returns True for incidents polled elsewhere (e.g. by the change stream)
+        """
+        self.client = client
+        self.view_ttl = view_ttl
+        self.hot_priorities = set(hot_priorities)
+        self.discovery_interval = discovery_interval
+        self.min_interval = min_interval
+        self.hot_max_interval = hot_max_interval
+        self.max_interval = max_interval
+        self.max_incidents = max_incidents
+        self.concurrency = concurrency
+        self.skip = skip or (lambda incident_id: False)
+        
+        self.viewed: Dict[str, float] = {}
+        self.discovered: Set[str] = set()
+        self.incidents: Dict[str, WarmIncident] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._supervisor: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._next_discovery_at = 0.0
+        
+        # Metrics
+        self.polls = 0
+        self.failures = 0
+        self.discoveries = 0
+        self.supervisor_restarts = 0
+    
+    def touch(self, incident_id: str) -> None:
+        """
+        Record that someone viewed an incident, making it hot.
+        
+        Args:
+            incident_id: PagerDuty incident ID (not ticket number)
+        """
+        if not incident_id:
+            return
+        is_new = incident_id not in self.viewed and incident_id not in self.incidents
+        self.viewed[incident_id] = time.monotonic()
+        self._ensure_started()
+        if is_new:
+            self._wake.set()
+    
+    def observe(self, incident_id: str, priority: Optional[str] = None, status: Optional[str] = None) -> None:
+        """
+        Record that an incident changed upstream (e.g. from a webhook event).
+        
+        A hot incident is re-polled right away instead of at its next interval. When
+        the event carries the priority and status, a newly opened high-priority
+        incident becomes hot and a closed one stops being hot without waiting for
+        the next discovery.
+        
+        Args:
+            incident_id: PagerDuty incident ID (not ticket number)
+            priority: Priority name, if the event carries it
+            status: Incident status, if the event carries it
+        """
+        if status is not None and self.hot_priorities:
+            if priority in self.hot_priorities and status in ("triggered", "acknowledged"):
+                self.discovered.add(incident_id)
+            else:
+                self.discovered.discard(incident_id)
+        state = self.incidents.get(incident_id)
+        if state is not None:
+            state.interval = self.min_interval
+            state.next_poll_at = 0.0
+        if state is not None or incident_id in self.discovered:
+            self._ensure_started()
+            self._wake.set()
+    
+    def start(self) -> None:
+        """Start the pool, so open high-priority incidents are kept warm before anyone views them"""
+        self._ensure_started()
+    
+    def _ensure_started(self) -> None:
+        """Start (or restart after a crash) the supervisor on the running event loop"""
+        if self._supervisor is not None and not self._supervisor.done():
+            return
+        if self._supervisor is not None:
+            self.supervisor_restarts += 1
+            if not self._supervisor.cancelled() and self._supervisor.exception() is not None:
+                print(f"Incident warmer stopped unexpectedly: {self._supervisor.exception()}")
+        self._supervisor = start_background_task(self._supervise())
+    
+    async def _supervise(self) -> None:
+        """Keep the hot set current and start due polls, at most `concurrency` at a time"""
+        while True:
+            now = time.monotonic()
+            next_poll_at = now + 1.0
+            try:
+                if now >= self._next_discovery_at:
+                    self._next_discovery_at = now + self.discovery_interval
+                    await self._discover()
+                self._update_hot_set(now)
+                self._start_due_polls(now)
+                next_poll_at = min((state.next_poll_at for state in self.incidents.values()), default=next_poll_at)
+            except Exception as e:
+                # Keep supervising; a bad iteration must not stop the warmer for good
+                print(f"Error in incident warmer: {e}")
+            
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=min(max(next_poll_at - now, 0.05), 1.0))
+            except asyncio.TimeoutError:
+                pass
+    
+    def _update_hot_set(self, now: float) -> None:
+        """Add incidents that became hot and drop the ones that cooled down"""
+        hot = self._hot_set(now)
+        for incident_id in list(self.incidents):
+            if incident_id not in hot:
+                del self.incidents[incident_id]
+        for incident_id in hot:
+            if incident_id not in self.incidents:
+                state = WarmIncident(incident_id, self.min_interval)
+                if incident_id in self.viewed:
+                    # The view that made it hot has just fetched it
+                    state.next_poll_at = now + self.min_interval
+                self.incidents[incident_id] = state
+    
+    def _start_due_polls(self, now: float) -> None:
+        """Start the most overdue polls that fit in the free slots"""
+        due = sorted(
+            (state for state in self.incidents.values()
+             if state.next_poll_at <= now and state.incident_id not in self._running),
+            key=lambda state: state.next_poll_at
+        )
+        for state in due[:max(0, self.concurrency - len(self._running))]:
+            if self.skip(state.incident_id):
+                state.next_poll_at = now + self.min_interval
+                continue
+            task = asyncio.ensure_future(self._poll(state))
+            self._running[state.incident_id] = task
+            task.add_done_callback(lambda _, incident_id=state.incident_id: self._poll_done(incident_id))
+    
+    def _poll_done(self, incident_id: str) -> None:
+        self._running.pop(incident_id, None)
+        # A slot freed up, let the supervisor hand it out
+        self._wake.set()
+    
+    def _hot_set(self, now: float) -> Set[str]:
+        """Viewed-recently and discovered incidents, capped at max_incidents"""
+        for incident_id, viewed_at in list(self.viewed.items()):
+            if now - viewed_at > self.view_ttl:
+                del self.viewed[incident_id]
+        recently_viewed = sorted(self.viewed, key=self.viewed.get, reverse=True)
+        hot = list(dict.fromkeys(recently_viewed + sorted(self.discovered)))
+        return set(hot[:self.max_incidents])
+    
+    async def _discover(self) -> None:
+        """List open incidents and mark the high-priority ones as hot"""
+        if not self.hot_priorities:
+            return
+        try:
+            incidents = await self.client.list_open_incidents(priority=PRIORITY_BACKGROUND)
+        except Exception as e:
+            print(f"Error discovering open incidents: {e}")
+            return
+        self.discoveries += 1
+        self.discovered = {
+            incident['id'] for incident in incidents
+            if (incident.get('priority') or {}).get('summary') in self.hot_priorities
+        }
+    
+    async def _poll(self, state: WarmIncident) -> None:
+        """Refresh one incident's cached snapshot, Slack channel and responders"""
+        self.polls += 1
+        state.polls += 1
+        state.last_polled_at = time.monotonic()
+        try:
+            # The fresh snapshot keeps the incident cache TTL: a poll refreshes it, it
+            # never outlives what a request would have cached
+            incident_data = await self.client.refresh_incident(
+                state.incident_id, priority=PRIORITY_BACKGROUND
+            )
+            await self.client.get_slack_channel_from_log_entries(state.incident_id)
+            await self.client.get_responders_data(incident_data)
+        except Exception as e:
+            self.failures += 1
+            state.failures += 1
+            print(f"Error warming incident {state.incident_id}: {e}")
+            state.interval = min(state.interval * 2, self.max_interval)
+        else:
+            incident = incident_data.get('incident', {})
+            changed = incident.get('updated_at') != state.updated_at
+            state.updated_at = incident.get('updated_at')
+            state.priority = (incident.get('priority') or {}).get('summary')
+            state.status = incident.get('status')
+            state.interval = self.min_interval if changed else min(state.interval * 2, self._cap(state))
+        # Jitter so incidents that became hot together do not stay in lockstep
+        state.next_poll_at = time.monotonic() + state.interval * random.uniform(0.9, 1.1)
+    
+    def _cap(self, state: WarmIncident) -> float:
+        """Longest poll interval for an incident, shorter for high-priority open ones"""
+        if state.priority in self.hot_priorities and state.status in ("triggered", "acknowledged"):
+            return self.hot_max_interval
+        return self.max_interval
+    
+    async def aclose(self) -> None:
+        """Stop the supervisor and every running poll"""
+        tasks = list(self._running.values())
+        if self._supervisor is not None:
+            tasks.append(self._supervisor)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._supervisor = None
+        self._running.clear()
+    
+    def stats(self) -> Dict:
+        """Get the hot set with per-incident poll intervals, plus pool counters"""
+        now = time.monotonic()
+        return {
+            "running": self._supervisor is not None and not self._supervisor.done(),
+            "hot_incidents": len(self.incidents),
+            "viewed": len(self.viewed),
+            "discovered": len(self.discovered),
+            "polls_in_flight": len(self._running),
+            "polls": self.polls,
+            "failures": self.failures,
+            "discoveries": self.discoveries,
+            "supervisor_restarts": self.supervisor_restarts,
+            "incidents": {
+                incident_id: {
+                    "priority": state.priority,
+                    "status": state.status,
+                    "interval": round(state.interval, 1),
+                    "next_poll_in": round(max(0.0, state.next_poll_at - now), 1),
+                    "polls": state.polls,
+                    "failures": state.failures
+                }
+                for incident_id, state in self.incidents.items()
+            }
+        }
@@ -0,0 +1,297 @@
+"""
+Instrumentation of outbound calls to PagerDuty and Slack
+Prometheus-format histograms plus a per-request trace for the Server-Timing header
+"""
+
+import asyncio
+import contextvars
+import re
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Coroutine, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Latency buckets in seconds, from cache-speed responses to slow paginated scans
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Response size buckets in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Path segments made only of these characters are resource names; anything else is an ID
+_RESOURCE_SEGMENT = re.compile(r"[a-z_]+")
+
+
+@dataclass
+class UpstreamCall:
+    """One logical outbound call, including any retries"""
+    upstream: str
+    method: str
+    endpoint: str
+    status: str
+    duration: float
+    retries: int = 0
+    bytes: int = 0
+
+
+def endpoint_template(path: str) -> str:
+    """
+    Turn a request path into a low-cardinality endpoint template.
+    
+    Args:
+        path: Request path, e.g. "/incidents/Q1CDMTGXP5QKOG/log_entries"
+    
+    Returns:
+        The path with IDs and numbers replaced, e.g. "/incidents/{id}/log_entries"
+    """
+    path = path.split("?", 1)[0]
+    segments = [
+        segment if not segment or _RESOURCE_SEGMENT.fullmatch(segment) else "{id}"
+        for segment in path.split("/")
+    ]
+    return "/".join(segments)
+
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+    
+    def __init__(self, name: str, documentation: str, labels: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, label_values: Tuple[str, ...], amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with labels, rendered the way Prometheus expects"""
+    
+    def __init__(self, name: str, documentation: str, labels: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (non-cumulative, last one is +Inf), sum, count
+        self._series: Dict[Tuple[str, ...], list] = {}
+    
+    def observe(self, label_values: Tuple[str, ...], value: float) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labels, label_values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+class RequestTrace:
+    """
+    Upstream calls made while serving one API request.
+    
+    Tasks spawned during the request inherit its context, and with it the trace;
+    once the response is sent the trace is closed and calls those tasks make later
+    are no longer attached to it.
+    """
+    
+    def __init__(self):
+        self.calls: List[UpstreamCall] = []
+        self.closed = False
+    
+    def add(self, call: UpstreamCall) -> None:
+        if not self.closed:
+            self.calls.append(call)
+    
+    def close(self) -> None:
+        self.closed = True
+    
+    def __len__(self) -> int:
+        return len(self.calls)
+    
+    def __iter__(self) -> Iterator[UpstreamCall]:
+        return iter(self.calls)
+
+
+# Trace of the API request being served in the current context (None outside a request)
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("upstream_trace", default=None)
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics for outbound calls and the API requests they serve.
+    
+    Safe to record into from the sync client's threads and the event loop alike.
+    """
+    
+    def __init__(self):
+        """Create the metric families"""
+        self._lock = threading.Lock()
+        upstream_labels = ("upstream", "method", "endpoint", "status")
+        self.upstream_duration = Histogram(
+            "upstream_request_duration_seconds",
+            "Duration of outbound calls including queueing and retries",
+            upstream_labels
+        )
+        self.upstream_response_bytes = Histogram(
+            "upstream_response_size_bytes",
+            "Size of outbound call response bodies",
+            upstream_labels,
+            buckets=SIZE_BUCKETS
+        )
+        self.upstream_retries = Counter(
+            "upstream_request_retries_total",
+            "Retries of outbound calls after throttling or server errors",
+            upstream_labels
+        )
+        self.request_duration = Histogram(
+            "http_request_duration_seconds",
+            "Duration of API requests served by this app",
+            ("method", "route", "status")
+        )
+        self.request_upstream_calls = Histogram(
+            "http_request_upstream_calls",
+            "Outbound calls made while serving one API request",
+            ("method", "route"),
+            buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250)
+        )
+    
+    def record_upstream(self, call: UpstreamCall) -> None:
+        """Record an outbound call and attach it to the current API request's trace"""
+        labels = (call.upstream, call.method, call.endpoint, call.status)
+        with self._lock:
+            self.upstream_duration.observe(labels, call.duration)
+            self.upstream_response_bytes.observe(labels, call.bytes)
+            if call.retries:
+                self.upstream_retries.inc(labels, call.retries)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(call)
+    
+    def record_request(self, method: str, route: str, status: int, duration: float, upstream_calls: int) -> None:
+        """Record a served API request"""
+        with self._lock:
+            self.request_duration.observe((method, route, str(status)), duration)
+            self.request_upstream_calls.observe((method, route), upstream_calls)
+    
+    def render(self) -> str:
+        """Render every metric family in the Prometheus text exposition format"""
+        with self._lock:
+            families = [
+                self.upstream_duration,
+                self.upstream_response_bytes,
+                self.upstream_retries,
+                self.request_duration,
+                self.request_upstream_calls
+            ]
+            lines = [line for family in families for line in family.render()]
+        return "\n".join(lines) + "\n"
+
+
+def start_trace() -> Tuple[RequestTrace, contextvars.Token]:
+    """
+    Start collecting the upstream calls made in the current context (one API request).
+    
+    Returns:
+        The trace and the token to pass to end_trace() once the response is ready
+    """
+    trace = RequestTrace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(trace: RequestTrace, token: contextvars.Token) -> None:
+    """Stop collecting into a trace, including from tasks the request left running"""
+    trace.close()
+    detach_trace(token)
+
+
+def detach_trace(token: contextvars.Token) -> None:
+    """
+    Stop attaching calls made in the current context to the trace, but leave it open.
+    
+    Tasks that already copied the context keep recording into it until it is
+    closed, e.g. the route producing a streamed response body.
+    """
+    _current_trace.reset(token)
+
+
+def start_background_task(coro: Coroutine) -> asyncio.Task:
+    """
+    Start a long-lived task outside of any API request's trace.
+    
+    A task copies the context it is created in, so one started while serving a
+    request would otherwise count every call it makes against that request.
+    """
+    return contextvars.Context().run(asyncio.ensure_future, coro)
+
+
+def server_timing_header(trace: RequestTrace, total: float) -> str:
+    """
+    Build a Server-Timing header value breaking a request down by upstream endpoint.
+    
+    Calls to the same endpoint are summed into one entry. Durations of concurrent
+    calls overlap, so entries can add up to more than the total.
+    
+    Args:
+        trace: Upstream calls made while serving the request
+        total: Total time spent serving the request, in seconds
+    
+    Returns:
+        Header value, e.g. 'pagerduty-0;dur=41.2;desc="GET /incidents/{id} x1", app;dur=57.9'
+    """
+    grouped: Dict[Tuple[str, str, str], List[UpstreamCall]] = {}
+    for call in trace:
+        grouped.setdefault((call.upstream, call.method, call.endpoint), []).append(call)
+    
+    entries = []
+    for index, ((upstream, method, endpoint), calls) in enumerate(grouped.items()):
+        duration = sum(call.duration for call in calls) * 1000
+        retries = sum(call.retries for call in calls)
+        description = f"{method} {endpoint} x{len(calls)}"
+        if retries:
+            description += f" ({retries} retries)"
+        entries.append(f'{upstream}-{index};dur={duration:.1f};desc="{description}"')
+    entries.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+# Global metrics instance
+metrics = MetricsRegistry()
@@ -0,0 +1,409 @@
+"""
+Durable outbox for outgoing writes
+SQLite (WAL) journal of notes, status updates and Slack messages, drained by a background worker
+"""
+
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .instrumentation import start_background_task
+
+
+# Item states; "sent" and "failed" are final
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedupe_key TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, kind, next_attempt_at);
+CREATE INDEX IF NOT EXISTS outbox_dedupe ON outbox (dedupe_key);
+"""
+
+
+class OutboxRejected(Exception):
+    """The upstream refused the write; retrying it would not help"""
+
+
+class Outbox:
+    """
+    Durable queue of outgoing writes, stored in SQLite in WAL mode.
+    
+    Each write is committed (and fsynced) before the caller is acknowledged, then
+    dispatched by a background worker through the handler registered for its
+    kind. Items of one kind are dispatched one at a time in creation order.
+    Failed attempts are retried with jittered exponential backoff; a handler
+    raising OutboxRejected fails the item at once.
+    
+    A dispatched item is leased, so after a crash (or in another process sharing
+    the file) it is picked up again once the lease expires. Delivery is therefore
+    at least once.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        max_attempts: int = 10,
+        base_backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        lease: float = 120.0,
+        retention: float = 7 * 86400
+    ):
+        """
+        Open (or create) the outbox file.
+        
+        Args:
+            path: SQLite database file
+            max_attempts: Attempts per item before it is marked failed
+            base_backoff: First retry delay in seconds, doubled on each retry
+            max_backoff: Upper bound of a single retry delay in seconds
+            lease: Seconds a dispatched item stays claimed before another worker may retry it
+            retention: Seconds sent items are kept before they are pruned
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.retention = retention
+        self.handlers: Dict[str, Callable[[Dict], Awaitable[Optional[Dict]]]] = {}
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # fsync on every commit: an acknowledged write must survive a power loss
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(_SCHEMA)
+        
+        self._worker: Optional[asyncio.Task] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._running_items: Dict[str, str] = {}
+        self._wake = asyncio.Event()
+        self._changed: Dict[str, asyncio.Event] = {}
+        
+        # Metrics
+        self.dispatched = 0
+        self.retries = 0
+        self.failures = 0
+    
+    def register(self, kind: str, handler: Callable[[Dict], Awaitable[Optional[Dict]]]) -> None:
+        """
+        Set the coroutine function dispatching items of a kind and start draining them.
+        
+        The handler receives the item (see get()) and returns a JSON-serializable
+        result; it raises to have the item retried, or OutboxRejected to fail it.
+        """
+        self.handlers[kind] = handler
+        self._ensure_worker()
+        self._wake.set()
+    
+    async def enqueue(self, kind: str, payload: Dict, dedupe_key: Optional[str] = None) -> Tuple[Dict, bool]:
+        """
+        Durably record an outgoing write.
+        
+        Args:
+            kind: Item kind, selecting the handler
+            payload: JSON-serializable arguments for the handler
+            dedupe_key: Key identifying the write; an item with the same key that has
+                not failed is returned instead of recording a new one
+        
+        Returns:
+            Tuple of (item, duplicate)
+        """
+        item, duplicate = await asyncio.to_thread(self._insert, kind, payload, dedupe_key)
+        if not duplicate and kind in self.handlers:
+            self._ensure_worker()
+            self._wake.set()
+        return item, duplicate
+    
+    def _insert(self, kind: str, payload: Dict, dedupe_key: Optional[str]) -> Tuple[Dict, bool]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if dedupe_key:
+                    row = self._db.execute(
+                        "SELECT * FROM outbox WHERE dedupe_key = ? AND status != ? ORDER BY created_at DESC LIMIT 1",
+                        (dedupe_key, STATUS_FAILED)
+                    ).fetchone()
+                    if row is not None:
+                        self._db.execute("COMMIT")
+                        return self._to_dict(row), True
+                now = time.time()
+                item_id = uuid.uuid4().hex
+                self._db.execute(
+                    "INSERT INTO outbox (id, kind, payload, dedupe_key, status, created_at, next_attempt_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (item_id, kind, json.dumps(payload), dedupe_key, STATUS_PENDING, now, now)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return self._get(item_id), False
+    
+    def get(self, item_id: str) -> Optional[Dict]:
+        """Get an item by ID, or None if it is unknown (or was pruned)"""
+        with self._lock:
+            return self._get(item_id)
+    
+    def _get(self, item_id: str) -> Optional[Dict]:
+        row = self._db.execute("SELECT * FROM outbox WHERE id = ?", (item_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+    
+    def list_items(self, status: Optional[str] = None, kind: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """List items, newest first, optionally filtered by status and kind"""
+        query = "SELECT * FROM outbox"
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if kind:
+            conditions.append("kind = ?")
+            params.append(kind)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [self._to_dict(row) for row in self._db.execute(query, params).fetchall()]
+    
+    def counts(self) -> Dict[str, int]:
+        """Number of items per status"""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+    
+    async def retry(self, item_id: str) -> Optional[Dict]:
+        """
+        Put a failed item back in the queue with a fresh set of attempts.
+        
+        Returns:
+            The item, or None if it is unknown
+        """
+        item = await asyncio.to_thread(self._requeue_failed, item_id)
+        if item is not None and item["status"] == STATUS_PENDING:
+            self._ensure_worker()
+            self._wake.set()
+            self._notify(item_id)
+        return item
+    
+    def _requeue_failed(self, item_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = 0, next_attempt_at = ?, finished_at = NULL "
+                "WHERE id = ? AND status = ?",
+                (STATUS_PENDING, time.time(), item_id, STATUS_FAILED)
+            )
+            return self._get(item_id)
+    
+    async def wait_for_change(self, item_id: str, timeout: float) -> bool:
+        """
+        Wait until this process updates the item.
+        
+        Returns:
+            False if nothing changed within the timeout
+        """
+        event = self._changed.setdefault(item_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
+    def _notify(self, item_id: str) -> None:
+        event = self._changed.pop(item_id, None)
+        if event is not None:
+            event.set()
+    
+    def _ensure_worker(self) -> None:
+        """Start the worker on the running event loop if it is not running yet"""
+        if self._worker is None or self._worker.done():
+            self._worker = start_background_task(self._run())
+    
+    async def _run(self) -> None:
+        """Claim due items, one in flight per kind, until cancelled"""
+        await asyncio.to_thread(self._prune)
+        while True:
+            self._wake.clear()
+            timeout = 1.0
+            try:
+                for kind in self.handlers:
+                    if kind in self._running:
+                        continue
+                    item = await asyncio.to_thread(self._claim, kind)
+                    if item is not None:
+                        task = asyncio.ensure_future(self._dispatch(item))
+                        self._running[kind] = task
+                        self._running_items[kind] = item["id"]
+                        task.add_done_callback(lambda _, kind=kind: self._dispatch_done(kind))
+                next_due = await asyncio.to_thread(self._next_due)
+                if next_due is not None:
+                    timeout = min(timeout, max(next_due - time.time(), 0.05))
+            except Exception as e:
+                # Keep draining; a bad iteration (e.g. a locked database) must not stop the worker
+                print(f"Error in outbox worker: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    def _dispatch_done(self, kind: str) -> None:
+        self._running.pop(kind, None)
+        self._running_items.pop(kind, None)
+        self._wake.set()
+    
+    def _claim(self, kind: str) -> Optional[Dict]:
+        """Lease the oldest due item of a kind, or return None if none is due"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # An item still leased (by a worker that crashed or another process) keeps the kind busy
+                leased = self._db.execute(
+                    "SELECT 1 FROM outbox WHERE kind = ? AND status = ? AND lease_until > ? LIMIT 1",
+                    (kind, STATUS_SENDING, now)
+                ).fetchone()
+                row = None if leased is not None else self._db.execute(
+                    "SELECT * FROM outbox WHERE kind = ? AND ("
+                    "(status = ? AND next_attempt_at <= ?) OR (status = ? AND lease_until <= ?)"
+                    ") ORDER BY created_at LIMIT 1",
+                    (kind, STATUS_PENDING, now, STATUS_SENDING, now)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE outbox SET status = ?, attempts = attempts + 1, lease_until = ? WHERE id = ?",
+                        (STATUS_SENDING, now + self.lease, row["id"])
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return self._get(row["id"]) if row is not None else None
+    
+    def _next_due(self) -> Optional[float]:
+        kinds = list(self.handlers)
+        if not kinds:
+            return None
+        placeholders = ",".join("?" * len(kinds))
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT MIN(next_attempt_at) FROM outbox WHERE status = ? AND kind IN ({placeholders})",
+                (STATUS_PENDING, *kinds)
+            ).fetchone()
+        return row[0]
+    
+    async def _dispatch(self, item: Dict) -> None:
+        """Run the item's handler and record the outcome"""
+        self.dispatched += 1
+        self._notify(item["id"])
+        try:
+            result = await self.handlers[item["kind"]](item)
+        except asyncio.CancelledError:
+            # Shutting down: aclose() hands the item back to the queue
+            raise
+        except OutboxRejected as e:
+            self.failures += 1
+            await asyncio.to_thread(self._finish, item["id"], STATUS_FAILED, str(e), None)
+        except Exception as e:
+            if item["attempts"] >= self.max_attempts:
+                self.failures += 1
+                await asyncio.to_thread(self._finish, item["id"], STATUS_FAILED, str(e), None)
+            else:
+                self.retries += 1
+                delay = random.uniform(0.5, 1.0) * min(self.max_backoff, self.base_backoff * (2 ** (item["attempts"] - 1)))
+                await asyncio.to_thread(self._reschedule, item["id"], str(e), time.time() + delay)
+        else:
+            await asyncio.to_thread(self._finish, item["id"], STATUS_SENT, None, result)
+        self._notify(item["id"])
+    
+    def _finish(self, item_id: str, status: str, error: Optional[str], result: Optional[Dict]) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = ?, last_error = ?, result = ?, lease_until = NULL, finished_at = ? WHERE id = ?",
+                (status, error, json.dumps(result) if result is not None else None, time.time(), item_id)
+            )
+    
+    def _reschedule(self, item_id: str, error: str, next_attempt_at: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = ?, last_error = ?, next_attempt_at = ?, lease_until = NULL WHERE id = ?",
+                (STATUS_PENDING, error, next_attempt_at, item_id)
+            )
+    
+    def _prune(self) -> None:
+        """Delete sent items older than the retention period"""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM outbox WHERE status = ? AND finished_at < ?",
+                (STATUS_SENT, time.time() - self.retention)
+            )
+    
+    def _to_dict(self, row: sqlite3.Row) -> Dict:
+        item = dict(row)
+        item["payload"] = json.loads(item["payload"])
+        item["result"] = json.loads(item["result"]) if item["result"] else None
+        return item
+    
+    async def aclose(self, drain_timeout: float = 5.0) -> None:
+        """Keep draining due items for up to drain_timeout seconds, then stop the worker and close the file"""
+        deadline = time.monotonic() + drain_timeout
+        while self._worker is not None and not self._worker.done() and time.monotonic() < deadline:
+            next_due = await asyncio.to_thread(self._next_due)
+            if not self._running and (next_due is None or next_due > time.time()):
+                break
+            await asyncio.sleep(0.05)
+        # Taken before cancelling: each dispatch forgets its item as it finishes
+        interrupted = list(self._running_items.values())
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        pending = list(self._running.values())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        with self._lock:
+            # Release what was cut short so the next start picks it up right away
+            self._db.executemany(
+                "UPDATE outbox SET status = ?, lease_until = NULL, next_attempt_at = ? WHERE id = ? AND status = ?",
+                [(STATUS_PENDING, time.time(), item_id, STATUS_SENDING) for item_id in interrupted]
+            )
+            self._db.close()
+        self._running.clear()
+        self._running_items.clear()
+    
+    def stats(self) -> Dict:
+        """Get item counts per status and dispatch counters"""
+        return {
+            "counts": self.counts(),
+            "in_flight": len(self._running),
+            "dispatched": self.dispatched,
+            "retries": self.retries,
+            "failures": self.failures
+        }
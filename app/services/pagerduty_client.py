@@ -3,12 +3,43 @@ PagerDuty API client
 Pure Python module with no external framework dependencies
 """
 
+import hashlib
 import os
 import requests
-from datetime import datetime, timezone
-from typing import Dict, List, Optional
-import pytz
-from app.config.notification_template import get_bullet_template, get_status_prefix, format_header, format_update_line, format_footer
+from urllib.parse import urlparse
+from typing import Callable, Dict, List, Optional, Union
+from app.services.cache import TTLCache
+from app.services.disk_cache import NS_CURRENT_USER, NS_SLACK_CHANNELS, NS_USER_TEAMS, DiskCache
+from app.services.incident_index import IncidentIndex, is_incident_number
+from app.services.instrumentation import UpstreamCall, endpoint_template, metrics
+from app.services.template_engine import CompiledTemplate, TemplateRegistry
+from app.services.time_format import (
+    DEFAULT_TIMEZONE,
+    PAGERDUTY_TIMEZONE,
+    STYLE_NOTIFICATION,
+    STYLE_PAGERDUTY,
+    format_timestamp,
+    utc_now
+)
+from app.services.title_normalizer import TitleNormalizer
+
+
+PAGERDUTY_API_URL = "https://api.pagerduty.com"
+
+# Seconds the token's user display name is kept in the disk cache
+CURRENT_USER_TTL = 86400
+
+# Links rendered into notification messages
+INCIDENT_URL = "https://discoveryinc.pagerduty.com/incidents/{incident_number}"
+STATUS_DASHBOARD_URL = "https://discoveryinc.pagerduty.com/status-dashboard"
+
+# Stands in for the update number when messages are rendered for the browser to number
+UPDATE_NUMBER_MARK = "\x00"
+
+
+def message_variant_key(first: bool, resolve: bool, downgrade: bool) -> str:
+    """Key of a pre-rendered message variant, e.g. "later-resolve" (built the same way by script.js)"""
+    return ("first" if first else "later") + ("-resolve" if resolve else "") + ("-downgrade" if downgrade else "")
 
 
 class PagerDutyClient:
@@ -17,13 +48,34 @@ class PagerDutyClient:
     No external framework dependencies - can be used by CLI, FastAPI, or any other application.
     """
     
-    def __init__(self, token: Optional[str] = None):
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        user_teams_cache: Optional[TTLCache] = None,
+        slack_channel_negative_ttl: float = 60.0,
+        api_url: str = PAGERDUTY_API_URL,
+        templates: Optional[TemplateRegistry] = None,
+        title_normalizer: Optional[TitleNormalizer] = None,
+        incident_index: Optional[IncidentIndex] = None,
+        disk_cache: Optional[DiskCache] = None
+    ):
         """
         Initialize the PagerDuty API client.
         
         Args:
             token: PagerDuty API token. If None, will try to get from PAGER_DUTY_TOKEN env var.
+            user_teams_cache: Cache of user ID -> team names. Pass a shared instance to reuse
+                lookups across clients; a private cache is created if None.
+            slack_channel_negative_ttl: Seconds to remember that an incident has no Slack channel yet
+            api_url: Base URL of the PagerDuty REST API
+            templates: Notification templates to render with; only the built-in one if None
+            title_normalizer: Turns incident titles into alert titles; default rules if None
+            incident_index: Incident number <-> ID map filled from every incident seen; a
+                memory-only one if None
+            disk_cache: Persistent cache the Slack channels, the token's user and (unless
+                user_teams_cache is given) user teams are kept in across restarts; memory only if None
         """
+        self.api_url = api_url.rstrip('/')
         self.token = token or os.getenv("PAGER_DUTY_TOKEN")
         if not self.token:
             raise ValueError("PAGER_DUTY_TOKEN must be provided or set as environment variable")
@@ -33,6 +85,52 @@ class PagerDutyClient:
             'Content-Type': 'application/json',
             'Authorization': f'Token token={self.token}'
         }
+        
+        # Reuse connections (and TLS sessions) across API calls
+        self.session = requests.Session()
+        self.session.hooks['response'].append(self._record_response)
+        
+        # Slack channels, the current user and by default user teams outlive the process here
+        self.disk_cache = disk_cache
+        
+        # Team membership changes rarely, so cache it across incidents
+        if user_teams_cache is None:
+            user_teams_cache = TTLCache(maxsize=1024, ttl=900, store=disk_cache, namespace=NS_USER_TEAMS)
+        self.user_teams_cache = user_teams_cache
+        
+        # Resolved responders per incident snapshot (incident id + updated_at)
+        self.responders_cache = TTLCache(maxsize=256, ttl=900)
+        
+        # Slack channels discovered per incident ID. A channel never changes once set, while
+        # "no channel yet" is only kept briefly; the scan cursor lets the next scan skip the
+        # log entries that were already checked.
+        self.slack_channel_cache = TTLCache(maxsize=1024, ttl=86400, store=disk_cache, namespace=NS_SLACK_CHANNELS)
+        self.slack_channel_negative_ttl = slack_channel_negative_ttl
+        self.log_entries_scan_cursor = TTLCache(maxsize=1024, ttl=86400)
+        
+        # Display name of the token's user, looked up once (the token never changes) and
+        # stored under a fingerprint of the token, never the token itself
+        self.current_user_key = hashlib.sha256(self.token.encode()).hexdigest()[:32]
+        self.current_user: Optional[str] = None
+        if disk_cache is not None:
+            stored = disk_cache.get(NS_CURRENT_USER, self.current_user_key)
+            if stored is not None:
+                self.current_user = stored[0]
+        
+        self.templates = templates if templates is not None else TemplateRegistry()
+        self.title_normalizer = title_normalizer if title_normalizer is not None else TitleNormalizer()
+        self.incident_index = incident_index if incident_index is not None else IncidentIndex()
+    
+    def _record_response(self, response: requests.Response, *args, **kwargs) -> None:
+        """Session response hook recording every PagerDuty API call in the upstream metrics"""
+        metrics.record_upstream(UpstreamCall(
+            upstream="pagerduty",
+            method=response.request.method,
+            endpoint=endpoint_template(urlparse(response.request.url).path),
+            status=str(response.status_code),
+            duration=response.elapsed.total_seconds(),
+            bytes=len(response.content)
+        ))
     
     def get_incident_data(self, ticket_number: str) -> Dict:
         """
@@ -48,13 +146,14 @@ class PagerDutyClient:
             Exception: If API request fails
         """
         # Include conference bridge in the incident data
-        url = f"https://api.pagerduty.com/incidents/{ticket_number}?include[]=conference_bridge"
-        response = requests.get(url, headers=self.headers)
+        url = f"{self.api_url}/incidents/{ticket_number}?include[]=conference_bridge"
+        response = self.session.get(url, headers=self.headers)
         
         if response.status_code != 200:
             raise Exception(f"Failed to fetch incident {ticket_number}: {response.status_code} - {response.text}")
         
         incident_data = response.json()
+        self.incident_index.record(incident_data['incident'])
         
         # Get Slack channel information from log entries using incident ID
         incident_id = incident_data['incident']['id']
@@ -76,13 +175,20 @@ class PagerDutyClient:
         Returns:
             Dict containing Slack channel information or None if not found
         """
+        # An empty dict marks a recent scan that found no channel
+        cached_channel = self.slack_channel_cache.get(incident_id)
+        if cached_channel is not None:
+            return cached_channel or None
+        
         try:
             more = True
-            offset = ""
+            # Only scan log entries newer than the ones a previous scan already checked
+            newest_entry_at = self.log_entries_scan_cursor.get(incident_id)
+            params = {"since": newest_entry_at} if newest_entry_at else {}
             
             while more:
-                url = f"https://api.pagerduty.com/incidents/{incident_id}/log_entries?{offset}"
-                response = requests.get(url, headers=self.headers)
+                url = f"{self.api_url}/incidents/{incident_id}/log_entries"
+                response = self.session.get(url, headers=self.headers, params=params)
                 
                 if response.status_code != 200:
                     return None
@@ -90,22 +196,38 @@ class PagerDutyClient:
                 data = response.json()
                 more = data.get('more', False)
                 if more:
-                    offset = f"offset={data['offset'] + data['limit']}"
+                    params["offset"] = data['offset'] + data['limit']
                 
                 # Look for chat channel integration events
                 for entry in data.get('log_entries', []):
-                    if entry.get('type') == 'integration_chat_channel_event_log_entry':
-                        return {
-                            "chat_channel_name": entry.get('chat_channel_name'),
-                            "chat_channel_web_link": entry.get('chat_channel_web_link')
-                        }
+                    slack_channel_info = self._get_chat_channel(entry)
+                    if slack_channel_info:
+                        self.slack_channel_cache.set(incident_id, slack_channel_info)
+                        return slack_channel_info
+                    newest_entry_at = max(newest_entry_at or '', entry.get('created_at', ''))
             
+            self._record_missing_slack_channel(incident_id, newest_entry_at)
             return None
             
         except Exception as e:
             print(f"Error fetching Slack channel info: {e}")
             return None
     
+    def _get_chat_channel(self, log_entry: Dict) -> Optional[Dict]:
+        """Get the Slack channel from a chat channel integration log entry, if it is one"""
+        if log_entry.get('type') != 'integration_chat_channel_event_log_entry':
+            return None
+        return {
+            "chat_channel_name": log_entry.get('chat_channel_name'),
+            "chat_channel_web_link": log_entry.get('chat_channel_web_link')
+        }
+    
+    def _record_missing_slack_channel(self, incident_id: str, newest_entry_at: Optional[str]) -> None:
+        """Remember briefly that an incident has no Slack channel and where the scan stopped"""
+        self.slack_channel_cache.set(incident_id, {}, ttl=self.slack_channel_negative_ttl)
+        if newest_entry_at:
+            self.log_entries_scan_cursor.set(incident_id, newest_entry_at)
+    
     def get_status_updates(self, incident_id: str) -> List[Dict]:
         """
         Get status updates for a PagerDuty incident.
@@ -118,8 +240,8 @@ class PagerDutyClient:
         """
         try:
             # Use the status_updates endpoint instead of log_entries to get full message content
-            url = f"https://api.pagerduty.com/incidents/{incident_id}/status_updates"
-            response = requests.get(url, headers=self.headers)
+            url = f"{self.api_url}/incidents/{incident_id}/status_updates"
+            response = self.session.get(url, headers=self.headers)
             
             if response.status_code != 200:
                 print(f"Error fetching status updates: {response.status_code} - {response.text}")
@@ -153,8 +275,8 @@ class PagerDutyClient:
             notes = []
             
             while more:
-                url = f"https://api.pagerduty.com/incidents/{incident_id}/notes?{offset}"
-                response = requests.get(url, headers=self.headers)
+                url = f"{self.api_url}/incidents/{incident_id}/notes?{offset}"
+                response = self.session.get(url, headers=self.headers)
                 
                 if response.status_code != 200:
                     print(f"Error fetching notes: {response.status_code} - {response.text}")
@@ -178,50 +300,78 @@ class PagerDutyClient:
             print(f"Error fetching incident notes: {e}")
             return []
     
-    def convert_utc_to_eastern(self, utc_date_string: str) -> str:
+    def convert_utc_to_eastern(self, utc_date_string: str, tz: str = DEFAULT_TIMEZONE) -> str:
         """
         Convert UTC date string to Eastern time format.
         
         Args:
             utc_date_string: UTC date in format "2025-09-12T19:28:02Z"
+            tz: Time zone to show the date in (the audience's zone, US/Eastern by default)
         
         Returns:
             Formatted date like "12-September-2025 | 3:28 PM EDT"
         """
         try:
-            # Parse the UTC date
-            utc_dt = datetime.fromisoformat(utc_date_string.replace('Z', '+00:00'))
-            
-            # Convert to Eastern time
-            eastern_tz = pytz.timezone('US/Eastern')
-            eastern_dt = utc_dt.astimezone(eastern_tz)
-            
-            # Format the date
-            day = eastern_dt.day
-            month = eastern_dt.strftime('%B')  # Full month name
-            year = eastern_dt.year
-            
-            # Format time with AM/PM (remove zero padding from hour)
-            hour = eastern_dt.hour % 12 or 12  # Convert 0 to 12, 13 to 1, etc.
-            minute = eastern_dt.minute
-            am_pm = eastern_dt.strftime('%p')
-            time_str = f"{hour}:{minute:02d} {am_pm}"
-            
-            # Get timezone abbreviation (EST/EDT)
-            tz_abbr = eastern_dt.strftime('%Z')
-            
-            return f"{day}-{month}-{year} | {time_str} {tz_abbr}"
-        
+            return format_timestamp(utc_date_string, STYLE_NOTIFICATION, tz)
         except Exception as e:
             return f"Error converting date: {e}"
     
+    def get_render_values(
+        self,
+        incident_data: Dict,
+        responders_data: Optional[List[Dict]] = None,
+        tz: str = DEFAULT_TIMEZONE
+    ) -> Dict:
+        """
+        Compute the values notification templates are rendered with.
+        
+        Messages are rendered from these, both by /generate and for the render
+        context the browser re-renders from.
+        
+        Args:
+            incident_data: Incident data from PagerDuty API
+            responders_data: Already resolved responders; looked up from the API if None
+            tz: Time zone timestamps are shown in (the template's audience)
+        
+        Returns:
+            Dict of template values, with both candidate update timestamps: created_at
+            (incident creation, used by update 1) and current_time (used by later updates)
+        """
+        incident = incident_data['incident']
+        title = incident['title']
+        incident_number = incident['incident_number']
+        escalation_policy = incident['escalation_policy']['summary']
+        severity = incident['priority']['name'][-1]
+        
+        # Get the latest engaged team from responders data
+        latest_team_name = self._get_latest_engaged_team(incident_data, responders_data)
+        
+        # Fallback to escalation policy if no responders found
+        if not latest_team_name:
+            latest_team_name = escalation_policy.split(' - ')[0] if ' - ' in escalation_policy else escalation_policy
+        
+        return {
+            "severity": severity,
+            "new_severity": int(severity) + 1 if severity.isdigit() else None,
+            "title": title,
+            "alert_title": self.title_normalizer.normalize(title),
+            "team_name": latest_team_name,
+            "incident_number": incident_number,
+            "incident_url": INCIDENT_URL.format(incident_number=incident_number),
+            "status_dashboard_url": STATUS_DASHBOARD_URL,
+            "created_at": self.convert_utc_to_eastern(incident['created_at'], tz),
+            "current_time": self.convert_utc_to_eastern(utc_now(), tz)
+        }
+    
     def generate_notification_message(
         self, 
         incident_data: Dict, 
         ticket_number: str, 
         update_number: int = 1, 
         resolve: bool = False, 
-        downgrade: bool = False
+        downgrade: bool = False,
+        responders_data: Optional[List[Dict]] = None,
+        template: Optional[str] = None
     ) -> str:
         """
         Generate notification message for incident.
@@ -232,121 +382,113 @@ class PagerDutyClient:
             update_number: The update number (defaults to 1)
             resolve: Whether to add "Resolved |" prefix to update line
             downgrade: Whether to add "Downgraded |" prefix to update line
+            responders_data: Already resolved responders; looked up from the API if None
+            template: Name of the notification template; the default one if None
             
         Returns:
             Formatted notification message string
+        
+        Raises:
+            UnknownTemplate: If no template has that name
         """
+        compiled = self.templates.get(template)
         try:
-            # Extract incident details
-            title = incident_data['incident']['title']
-            incident_number = incident_data['incident']['incident_number']
-            priority = incident_data['incident']['priority']['name']
-            escalation_policy = incident_data['incident']['escalation_policy']['summary']
-            severity = priority[-1]
-            
-            # Determine which date to use
-            if update_number == 1:
-                # Use incident creation date for update 1
-                created_at = self.convert_utc_to_eastern(incident_data['incident']['created_at'])
-            else:
-                # Use current date for subsequent updates
-                current_utc = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
-                created_at = self.convert_utc_to_eastern(current_utc)
-            
-            # Get the latest engaged team from responders data
-            latest_team_name = self._get_latest_engaged_team(incident_data)
-            
-            # Fallback to escalation policy if no responders found
-            if not latest_team_name:
-                latest_team_name = escalation_policy.split(' - ')[0] if ' - ' in escalation_policy else escalation_policy
-            
-            # Clean up title for the SRO message
-            alert_title = title
-            
-            # Logic: remove first two pipe-separated sections if each has 2 or fewer words
-            parts = [part.strip() for part in title.split('|')]
-            
-            if len(parts) >= 3:
-                # Check if first two parts each have 2 or fewer words
-                first_part = parts[0]
-                second_part = parts[1]
-                
-                first_word_count = len(first_part.split())
-                second_word_count = len(second_part.split())
-                
-                if first_word_count <= 2 and second_word_count <= 2:
-                    # Remove the first two parts and join the rest
-                    alert_title = ' | '.join(parts[2:])
-                else:
-                    # Keep the whole title if not both first two parts have ≤2 words
-                    alert_title = title
-            elif len(parts) == 2:
-                # Only 2 parts - check if first has 2 or fewer words
-                first_part = parts[0]
-                first_word_count = len(first_part.split())
-                
-                if first_word_count <= 2:
-                    # Remove the first part
-                    alert_title = parts[1]
-                else:
-                    # Keep the whole title if first part has more than 2 words
-                    alert_title = title
-            else:
-                # Only 1 part or no pipes - keep as is
-                alert_title = title
-            
-            # Create notification message using template
-            # Build bullet points based on update number and flags
-            bullets = []
-            
-            if update_number == 1:
-                bullets.append(get_bullet_template("initial_sro_report").format(alert_title=alert_title))
-                bullets.append(get_bullet_template("team_engaged").format(team_name=latest_team_name))
-            else:
-                bullets.append(get_bullet_template("team_has").format(team_name=latest_team_name))
-            
-            # Add downgrade bullet if downgrade flag is provided
-            if downgrade:
-                bullets.append(get_bullet_template("downgraded").format(new_severity=int(severity) + 1))
-            
-            # Add resolve bullet if resolve flag is provided
-            if resolve:
-                bullets.append(get_bullet_template("resolved"))
-            
-            # Add final bullet based on flags
-            if resolve or downgrade:
-                bullets.append(get_bullet_template("no_further_updates"))
-            elif update_number == 1:
-                bullets.append(get_bullet_template("further_updates_initial"))
-            else:
-                bullets.append(get_bullet_template("further_updates_followup"))
-            
-            # Create the notification message using template
-            # Build prefix based on flags (can combine multiple)
-            prefix_parts = []
-            if resolve:
-                prefix_parts.append(get_status_prefix("resolved"))
-            if downgrade:
-                prefix_parts.append(get_status_prefix("downgraded"))
-            
-            update_prefix = " | ".join(prefix_parts) + " | " if prefix_parts else ""
-            
-            # Format the notification using template functions
-            header = format_header(severity, title, incident_number)
-            update_line = format_update_line(update_prefix, update_number, created_at)
-            footer = format_footer()
-            
-            notification_message = f"""{header}
-
-{update_line}
-{"\n".join(f"- {bullet}" for bullet in bullets)}
-
-{footer}"""
-            return notification_message.strip()
-            
+            values = self.get_render_values(incident_data, responders_data, compiled.definition.timezone)
+            return self.render_message(compiled, values, update_number, resolve, downgrade)
         except Exception as e:
             raise Exception(f"Error creating notification message: {e}")
     
+    def render_message(
+        self,
+        compiled: CompiledTemplate,
+        values: Dict,
+        update_number: Union[int, str] = 1,
+        resolve: bool = False,
+        downgrade: bool = False
+    ) -> str:
+        """
+        Render a notification message from computed template values.
+        
+        Args:
+            compiled: Notification template
+            values: Template values from get_render_values
+            update_number: The update number (1 renders the initial report)
+            resolve: Whether to add the resolved prefix and bullet
+            downgrade: Whether to add the downgraded prefix and bullet
+        
+        Returns:
+            Formatted notification message string
+        """
+        first = update_number == 1
+        # Update 1 is dated when the incident was created, later updates when they are sent
+        created_at = values['created_at'] if first else values['current_time']
+        
+        # Build bullet points based on update number and flags
+        bullets = []
+        
+        if first:
+            bullets.append(compiled.bullet("initial_sro_report", alert_title=values['alert_title']))
+            bullets.append(compiled.bullet("team_engaged", team_name=values['team_name']))
+        else:
+            bullets.append(compiled.bullet("team_has", team_name=values['team_name']))
+        
+        # Add downgrade bullet if downgrade flag is provided
+        if downgrade:
+            bullets.append(compiled.bullet("downgraded", new_severity=values['new_severity']))
+        
+        # Add resolve bullet if resolve flag is provided
+        if resolve:
+            bullets.append(compiled.bullet("resolved"))
+        
+        # Add final bullet based on flags
+        if resolve or downgrade:
+            bullets.append(compiled.bullet("no_further_updates"))
+        elif first:
+            bullets.append(compiled.bullet("further_updates_initial"))
+        else:
+            bullets.append(compiled.bullet("further_updates_followup"))
+        
+        # Build prefix based on flags (can combine multiple)
+        prefix_parts = []
+        if resolve:
+            prefix_parts.append(compiled.status_prefix("resolved"))
+        if downgrade:
+            prefix_parts.append(compiled.status_prefix("downgraded"))
+        
+        update_prefix = " | ".join(prefix_parts) + " | " if prefix_parts else ""
+        
+        # Render the notification with the precompiled template
+        return compiled.message(
+            compiled.header(values['severity'], values['title'], values['incident_url']),
+            compiled.update_line(update_prefix, update_number, created_at),
+            bullets,
+            compiled.footer(values['status_dashboard_url'])
+        )
+    
+    def render_message_variants(self, compiled: CompiledTemplate, values: Dict) -> Dict[str, List[str]]:
+        """
+        Render the notification message for every combination of form toggles.
+        
+        The message of update 1 is complete. Later updates differ only in their
+        number, so each of their messages is split around it: joining the pieces
+        with the update number gives exactly what render_message returns.
+        
+        Args:
+            compiled: Notification template
+            values: Template values from get_render_values
+        
+        Returns:
+            Message pieces keyed by message_variant_key()
+        """
+        variants = {}
+        for first in (True, False):
+            for resolve in (False, True):
+                for downgrade in (False, True):
+                    message = self.render_message(compiled, values, 1 if first else UPDATE_NUMBER_MARK, resolve, downgrade)
+                    key = message_variant_key(first, resolve, downgrade)
+                    variants[key] = [message] if first else message.split(UPDATE_NUMBER_MARK)
+        return variants
+    
     def get_user_teams(self, user_id: str) -> List[str]:
         """
         Get teams for a specific user from PagerDuty API.
@@ -357,24 +499,33 @@ class PagerDutyClient:
         Returns:
             List of team names the user belongs to
         """
+        cached_teams = self.user_teams_cache.get(user_id)
+        if cached_teams is not None:
+            return cached_teams
+        
         try:
-            url = f"https://api.pagerduty.com/users/{user_id}"
-            response = requests.get(url, headers=self.headers)
+            url = f"{self.api_url}/users/{user_id}"
+            response = self.session.get(url, headers=self.headers)
             
             if response.status_code == 200:
-                user_data = response.json()
-                teams = []
-                for team in user_data.get('user', {}).get('teams', []):
-                    team_name = team.get('summary', 'Unknown Team')
-                    # Skip SRO US teams
-                    if 'SRO US' not in team_name:
-                        teams.append(team_name)
+                teams = self._get_team_names(response.json().get('user', {}))
+                self.user_teams_cache.set(user_id, teams)
                 return teams
             else:
                 return []
         except Exception:
             return []
     
+    def _get_team_names(self, user: Dict) -> List[str]:
+        """Get the team names of a PagerDuty user object, skipping SRO US teams"""
+        teams = []
+        for team in user.get('teams', []):
+            team_name = team.get('summary', 'Unknown Team')
+            # Skip SRO US teams
+            if 'SRO US' not in team_name:
+                teams.append(team_name)
+        return teams
+    
     def get_responders_data(self, incident_data: Dict) -> List[Dict]:
         """
         Get responders data in a structured format, ordered by request time.
@@ -382,6 +533,45 @@ class PagerDutyClient:
         Args:
             incident_data: Incident data from PagerDuty API
             
+        Returns:
+            List of dictionaries containing responder information, ordered by request time
+        """
+        snapshot_key = self._get_snapshot_key(incident_data)
+        if snapshot_key is not None:
+            cached_responders = self.responders_cache.get(snapshot_key)
+            if cached_responders is not None:
+                return cached_responders
+        
+        responders_data = self._build_responders_data(incident_data, self.get_user_teams)
+        if snapshot_key is not None:
+            self.responders_cache.set(snapshot_key, responders_data)
+        return responders_data
+    
+    def _get_snapshot_key(self, incident_data: Dict) -> Optional[tuple]:
+        """
+        Get the key identifying one version of an incident.
+        
+        Args:
+            incident_data: Incident data from PagerDuty API
+            
+        Returns:
+            (incident id, updated_at) tuple, or None if the payload lacks either field
+        """
+        incident = incident_data.get('incident', {})
+        incident_id = incident.get('id')
+        updated_at = incident.get('updated_at')
+        if not incident_id or not updated_at:
+            return None
+        return (incident_id, updated_at)
+    
+    def _build_responders_data(self, incident_data: Dict, user_teams_lookup: Callable[[str], List[str]]) -> List[Dict]:
+        """
+        Build the responders list, resolving user teams through the given lookup.
+        
+        Args:
+            incident_data: Incident data from PagerDuty API
+            user_teams_lookup: Callable returning the team names for a user ID
+            
         Returns:
             List of dictionaries containing responder information, ordered by request time
         """
@@ -497,7 +687,7 @@ class PagerDutyClient:
                     if not user_already_included:
                         # Look up teams for this user
                         if user_id:
-                            user_teams = self.get_user_teams(user_id)
+                            user_teams = user_teams_lookup(user_id)
                             if user_teams:
                                 # For each user team, check if it matches any escalation policy color
                                 team_colors = []
@@ -546,7 +736,7 @@ class PagerDutyClient:
                     
                     # Add individual user to ordered responders
                     if user_id:
-                        user_teams = self.get_user_teams(user_id)
+                        user_teams = user_teams_lookup(user_id)
                         if user_teams:
                             # For each user team, check if it matches any escalation policy color
                             team_colors = []
@@ -582,6 +772,25 @@ class PagerDutyClient:
         except Exception as e:
             raise Exception(f"Error getting responders data: {e}")
     
+    def _get_responder_user_ids(self, incident_data: Dict) -> List[str]:
+        """
+        Get the user IDs whose teams _build_responders_data needs to look up.
+        
+        Args:
+            incident_data: Incident data from PagerDuty API
+            
+        Returns:
+            List of user IDs, in lookup order
+        """
+        user_ids = []
+        
+        def record_lookup(user_id: str) -> List[str]:
+            user_ids.append(user_id)
+            return []
+        
+        self._build_responders_data(incident_data, record_lookup)
+        return user_ids
+    
     def _get_color_for_group(self, group_name: str, color_map: Dict) -> str:
         """Get or assign a subtle color for a group name"""
         # Subtle, professional colors for escalation policies
@@ -609,18 +818,20 @@ class PagerDutyClient:
         
         return color_map[trimmed_name]
     
-    def _get_latest_engaged_team(self, incident_data: Dict) -> Optional[str]:
+    def _get_latest_engaged_team(self, incident_data: Dict, responders_data: Optional[List[Dict]] = None) -> Optional[str]:
         """
         Get the latest team that was engaged as a responder.
         
         Args:
             incident_data: Incident data from PagerDuty API
+            responders_data: Already resolved responders; looked up from the API if None
             
         Returns:
             The name of the latest engaged team, or None if no responders found
         """
         try:
-            responders_data = self.get_responders_data(incident_data)
+            if responders_data is None:
+                responders_data = self.get_responders_data(incident_data)
             
             if not responders_data:
                 return None
@@ -708,7 +919,7 @@ class PagerDutyClient:
         """
         try:
             # PagerDuty API endpoint for adding notes to incidents
-            url = f"https://api.pagerduty.com/incidents/{incident_id}/notes"
+            url = f"{self.api_url}/incidents/{incident_id}/notes"
             
             # Prepare the payload for adding a note
             payload = {
@@ -718,7 +929,7 @@ class PagerDutyClient:
             }
             
             # Make the API request to add note
-            response = requests.post(
+            response = self.session.post(
                 url,
                 headers=self.headers,
                 json=payload,
@@ -746,17 +957,50 @@ class PagerDutyClient:
     def get_incident_data_by_id(self, incident_id: str) -> Dict:
         """Get incident data by incident ID"""
         try:
-            url = f"https://api.pagerduty.com/incidents/{incident_id}"
-            response = requests.get(url, headers=self.headers, timeout=30)
+            url = f"{self.api_url}/incidents/{incident_id}"
+            response = self.session.get(url, headers=self.headers, timeout=30)
             
             if response.status_code == 200:
-                return response.json()
+                incident_data = response.json()
+                self.incident_index.record(incident_data.get('incident', {}))
+                return incident_data
             else:
                 raise Exception(f"Failed to get incident data: {response.status_code}")
         except Exception as e:
             raise Exception(f"Error getting incident data: {str(e)}")
     
-    def _format_status_update_template(self, incident_data: Dict, message: str, status: str, incident_id: str) -> str:
+    def resolve_incident_id(self, key: str) -> str:
+        """
+        Get the incident ID of an incident number or ID.
+        
+        Answered from the incident index when the number has been seen before;
+        otherwise the incident is fetched once (PagerDuty accepts the number in
+        place of the ID) and the index learns it.
+        
+        Args:
+            key: Incident number or incident ID
+        
+        Returns:
+            Incident ID
+        
+        Raises:
+            Exception: If the incident cannot be fetched
+        """
+        if not is_incident_number(key):
+            return key
+        incident_id = self.incident_index.id_for(key)
+        if incident_id is None:
+            incident_id = self.get_incident_data_by_id(key)['incident']['id']
+        return incident_id
+    
+    def _format_status_update_template(
+        self,
+        incident_data: Dict,
+        message: str,
+        status: str,
+        incident_id: str,
+        current_user: Optional[str] = None
+    ) -> str:
         """Format the status update using PagerDuty communication template"""
         try:
             incident = incident_data.get('incident', {})
@@ -775,10 +1019,11 @@ class PagerDutyClient:
             
             # Format dates
             created_date = self._format_pagerduty_date(created_at)
-            updated_date = self._format_pagerduty_date(datetime.now(timezone.utc).isoformat())
+            updated_date = self._format_pagerduty_date(utc_now())
             
             # Get current user from PagerDuty API
-            current_user = self._get_current_user()
+            if current_user is None:
+                current_user = self._get_current_user()
             
             # Build the HTML template
             html_template = f"""
@@ -825,50 +1070,51 @@ class PagerDutyClient:
             return f"<p>{message}</p>"
     
     def _format_pagerduty_date(self, iso_date: str) -> str:
-        """Format ISO date to PagerDuty format"""
+        """Format ISO date to PagerDuty format ("MM/DD/YYYY HH:MMam/pm (America/New_York)")"""
         try:
             if not iso_date:
                 return ""
-            
-            # Parse the ISO date
-            dt = datetime.fromisoformat(iso_date.replace('Z', '+00:00'))
-            
-            # Convert to America/New_York timezone
-            ny_tz = pytz.timezone('America/New_York')
-            dt_ny = dt.astimezone(ny_tz)
-            
-            # Format as "MM/DD/YYYY HH:MMam/pm (America/New_York)"
-            formatted = dt_ny.strftime("%m/%d/%Y %I:%M%p").lower()
-            return f"{formatted} (America/New_York)"
-            
+            return format_timestamp(iso_date, STYLE_PAGERDUTY, PAGERDUTY_TIMEZONE)
         except Exception:
             return iso_date
     
     def _get_current_user(self) -> str:
-        """Get current user information from PagerDuty API"""
+        """Get current user information from PagerDuty API (cached after the first successful lookup)"""
+        if self.current_user is not None:
+            return self.current_user
         try:
             # Get current user from PagerDuty API
-            url = "https://api.pagerduty.com/users/me"
-            response = requests.get(url, headers=self.headers, timeout=30)
+            url = f"{self.api_url}/users/me"
+            response = self.session.get(url, headers=self.headers, timeout=30)
             
             if response.status_code == 200:
                 user_data = response.json()
-                user = user_data.get('user', {})
-                first_name = user.get('first_name', '')
-                last_name = user.get('last_name', '')
-                if first_name and last_name:
-                    return f"{first_name} {last_name}"
-                elif first_name:
-                    return first_name
-                elif last_name:
-                    return last_name
-                else:
-                    return user.get('name', 'System')
+                return self._remember_current_user(self._get_user_display_name(user_data.get('user', {})))
             else:
                 return "System"
         except Exception:
             return "System"
     
+    def _remember_current_user(self, display_name: str) -> str:
+        """Keep the display name of the token's user for this and later processes"""
+        self.current_user = display_name
+        if self.disk_cache is not None:
+            self.disk_cache.set(NS_CURRENT_USER, self.current_user_key, display_name, CURRENT_USER_TTL)
+        return display_name
+    
+    def _get_user_display_name(self, user: Dict) -> str:
+        """Display name of a user object, from first and last name where available"""
+        first_name = user.get('first_name', '')
+        last_name = user.get('last_name', '')
+        if first_name and last_name:
+            return f"{first_name} {last_name}"
+        elif first_name:
+            return first_name
+        elif last_name:
+            return last_name
+        else:
+            return user.get('name', 'System')
+    
     def get_custom_field_values(self, incident_id: str) -> Dict:
         """
         Get custom field values for a PagerDuty incident.
@@ -884,8 +1130,8 @@ class PagerDutyClient:
             Returns empty dict if custom fields are not configured or available.
         """
         try:
-            url = f"https://api.pagerduty.com/incidents/{incident_id}/custom_fields/values"
-            response = requests.get(url, headers=self.headers, timeout=30)
+            url = f"{self.api_url}/incidents/{incident_id}/custom_fields/values"
+            response = self.session.get(url, headers=self.headers, timeout=30)
             
             if response.status_code == 200:
                 return response.json()
@@ -919,7 +1165,7 @@ class PagerDutyClient:
         """
         try:
             # PagerDuty API endpoint for status updates
-            url = f"https://api.pagerduty.com/incidents/{incident_id}/status_updates"
+            url = f"{self.api_url}/incidents/{incident_id}/status_updates"
             
             # Prepare the payload for status update with PagerDuty communication template
             # Get incident data to populate template variables
@@ -945,7 +1191,7 @@ class PagerDutyClient:
             }
             
             # Make the API request to send status update
-            response = requests.post(
+            response = self.session.post(
                 url,
                 headers=self.headers,
                 json=payload,
@@ -3,88 +3,431 @@ PagerDuty service for FastAPI application
 Uses the shared PagerDutyCore module for business logic
 """
 
+import asyncio
+import json
 import os
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+import httpx
 from fastapi import HTTPException
 
-from .pagerduty_client import PagerDutyClient
+from .async_pagerduty_client import AsyncPagerDutyClient
+from .cache import TTLCache
+from .disk_cache import NS_USER_TEAMS, DiskCache
+from .incident_index import IncidentIndex
+from .incident_stream import IncidentStreamHub, Subscription
+from .incident_timeline import Timeline
+from .incident_warmer import IncidentWarmer
+from .outbox import Outbox, OutboxRejected
+from .pagerduty_webhooks import WebhookProcessor, verify_signature
+from .request_scheduler import RequestScheduler
+from .template_engine import TemplateRegistry, UnknownTemplate
+from . import time_format
+from .title_normalizer import TitleNormalizer, parse_prefix_rules
 from app.config.config import settings
 
 
+# Outbox item kinds of queued PagerDuty writes
+OUTBOX_NOTE = "pagerduty.note"
+OUTBOX_STATUS_UPDATE = "pagerduty.status_update"
+
+
 class PagerDutyService:
-    """FastAPI service wrapper around PagerDutyClient"""
+    """FastAPI service wrapper around AsyncPagerDutyClient"""
     
-    def __init__(self):
-        """Initialize the service with API credentials"""
+    def __init__(
+        self,
+        http_client: Optional[httpx.AsyncClient] = None,
+        outbox: Optional[Outbox] = None,
+        templates: Optional[TemplateRegistry] = None
+    ):
+        """Initialize the service with API credentials, an optional shared HTTP client, durable outbox and template registry"""
+        self.outbox = outbox
         self.token = settings.PAGER_DUTY_TOKEN or os.getenv("PAGER_DUTY_TOKEN")
         if not self.token:
             raise ValueError("PAGER_DUTY_TOKEN environment variable not set")
         
+        # Slowly changing lookups survive restarts and are shared with the CLI
+        disk_cache = DiskCache(settings.DISK_CACHE_PATH or None)
+        
+        # PagerDuty pushes changes when webhooks are set up, so polling is only a safety net
+        self.webhook_secrets = [secret.strip() for secret in settings.PAGERDUTY_WEBHOOK_SECRETS.split(',') if secret.strip()]
+        fallback_interval = settings.PAGERDUTY_WEBHOOK_FALLBACK_POLL_INTERVAL if self.webhook_secrets else None
+        
         # Initialize the PagerDuty client
-        self.core = PagerDutyClient(token=self.token)
+        self.core = AsyncPagerDutyClient(
+            token=self.token,
+            http_client=http_client,
+            api_url=settings.PAGERDUTY_API_URL,
+            user_teams_cache=TTLCache(
+                maxsize=settings.USER_TEAMS_CACHE_SIZE,
+                ttl=settings.USER_TEAMS_CACHE_TTL,
+                store=disk_cache,
+                namespace=NS_USER_TEAMS
+            ),
+            scheduler=RequestScheduler(
+                rate_per_minute=settings.PAGERDUTY_RATE_LIMIT_PER_MINUTE,
+                burst=settings.PAGERDUTY_RATE_LIMIT_BURST,
+                max_concurrency=settings.PAGERDUTY_MAX_CONCURRENCY,
+                max_retries=settings.PAGERDUTY_MAX_RETRIES
+            ),
+            slack_channel_negative_ttl=settings.SLACK_CHANNEL_NEGATIVE_TTL,
+            incident_cache_ttl=settings.INCIDENT_CACHE_TTL,
+            templates=templates,
+            title_normalizer=TitleNormalizer(
+                rules=parse_prefix_rules(settings.TITLE_PREFIX_RULES),
+                max_prefix_words=settings.TITLE_MAX_PREFIX_WORDS,
+                max_prefix_sections=settings.TITLE_MAX_PREFIX_SECTIONS,
+                cache_size=settings.TITLE_CACHE_SIZE
+            ),
+            incident_index=IncidentIndex(settings.INCIDENT_INDEX_PATH or None),
+            disk_cache=disk_cache,
+            # Pushed notes and status updates are appended to the timelines as they arrive
+            timeline_sync_interval=fallback_interval or settings.TIMELINE_SYNC_INTERVAL
+        )
+        
+        # One background poll loop per incident watched through the change stream
+        self.stream_hub = IncidentStreamHub(
+            self.core,
+            poll_interval=fallback_interval or settings.INCIDENT_STREAM_POLL_INTERVAL,
+            idle_timeout=settings.INCIDENT_STREAM_IDLE_TIMEOUT
+        )
+        
+        # Background polls keeping viewed and high-priority open incidents warm in the caches
+        self.warmer = IncidentWarmer(
+            self.core,
+            view_ttl=settings.WARMER_VIEW_TTL,
+            hot_priorities=[name.strip() for name in settings.WARMER_HOT_PRIORITIES.split(',') if name.strip()],
+            discovery_interval=fallback_interval or settings.WARMER_DISCOVERY_INTERVAL,
+            min_interval=settings.WARMER_MIN_INTERVAL,
+            hot_max_interval=fallback_interval or settings.WARMER_HOT_MAX_INTERVAL,
+            max_interval=fallback_interval or settings.WARMER_MAX_INTERVAL,
+            max_incidents=settings.WARMER_MAX_INCIDENTS,
+            concurrency=settings.WARMER_CONCURRENCY,
+            # Incidents with stream subscribers are already polled by their watcher
+            skip=self.stream_hub.is_watching
+        ) if settings.WARMER_ENABLED else None
+        
+        # Pushed incident events, applied in the background
+        self.webhooks = WebhookProcessor(
+            self.core,
+            self.stream_hub,
+            warmer=self.warmer,
+            queue_size=settings.PAGERDUTY_WEBHOOK_QUEUE_SIZE,
+            record_path=settings.PAGERDUTY_WEBHOOK_RECORD_PATH or None
+        ) if self.webhook_secrets else None
+    
+    def start_background_tasks(self) -> None:
+        """Start the incident warmer and the outbox handlers (needs a running event loop)"""
+        if self.warmer is not None:
+            self.warmer.start()
+        if self.outbox is not None:
+            self.outbox.register(OUTBOX_NOTE, self._dispatch_note)
+            self.outbox.register(OUTBOX_STATUS_UPDATE, self._dispatch_status_update)
+    
+    def _touch(self, incident_data: Dict) -> None:
+        """Mark a viewed incident as hot for the warmer"""
+        if self.warmer is not None:
+            self.warmer.touch(incident_data.get('incident', {}).get('id'))
+    
+    async def aclose(self) -> None:
+        """Stop the background tasks and the request scheduler, and release the client's HTTP connections if it owns them"""
+        if self.webhooks is not None:
+            await self.webhooks.aclose()
+        if self.warmer is not None:
+            await self.warmer.aclose()
+        await self.stream_hub.aclose()
+        await self.core.aclose()
+        # Both files are shared with the CLI, which may hold their locks
+        await asyncio.to_thread(self.core.incident_index.close)
+        await asyncio.to_thread(self.core.disk_cache.close)
+    
+    def get_scheduler_stats(self) -> Dict:
+        """Get queue depth, throttling and retry counters of the request scheduler"""
+        return self.core.scheduler.stats()
+    
+    def get_cache_stats(self) -> Dict:
+        """Get hit/miss counters for the in-process caches"""
+        return {
+            "user_teams": self.core.user_teams_cache.stats(),
+            "responders": self.core.responders_cache.stats(),
+            "slack_channels": self.core.slack_channel_cache.stats(),
+            "incidents": self.core.incident_cache.stats(),
+            "note_timelines": self.core.note_timelines.stats(),
+            "status_update_timelines": self.core.status_update_timelines.stats(),
+            "alert_titles": self.core.title_normalizer.cache.stats(),
+            "timestamps": time_format.cache_stats(),
+            "incident_index": self.core.incident_index.stats(),
+            "disk": self.core.disk_cache.stats(),
+            "in_flight": self.core.in_flight.stats()
+        }
+    
+    def get_warmer_stats(self) -> Dict:
+        """Get the warmer's hot set, poll intervals and counters"""
+        if self.warmer is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.warmer.stats()}
+    
+    def get_webhook_stats(self) -> Dict:
+        """Get the webhook queue depth and event counters"""
+        if self.webhooks is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.webhooks.stats()}
+    
+    def receive_webhook(self, body: bytes, signature: Optional[str]) -> Dict:
+        """
+        Verify a PagerDuty webhook delivery and queue its event.
+        
+        Args:
+            body: Raw request body
+            signature: X-PagerDuty-Signature header
+        
+        Returns:
+            Dict with the event ID and type
+        
+        Raises:
+            HTTPException: 404 if webhooks are not configured, 401 for a bad signature,
+                400 for a body that is not an event, 503 if the queue is full
+        """
+        if self.webhooks is None:
+            raise HTTPException(status_code=404, detail="PagerDuty webhooks are not configured")
+        if not verify_signature(body, signature, self.webhook_secrets):
+            raise HTTPException(status_code=401, detail="Invalid PagerDuty webhook signature")
+        try:
+            event = json.loads(body).get('event')
+        except (ValueError, AttributeError):
+            event = None
+        if not isinstance(event, dict):
+            raise HTTPException(status_code=400, detail="Webhook body is not a PagerDuty V3 event")
+        if not self.webhooks.enqueue(event):
+            # PagerDuty retries deliveries that fail
+            raise HTTPException(status_code=503, detail="Webhook queue is full")
+        return {"event_id": event.get('id'), "event_type": event.get('event_type')}
+    
+    def get_stream_stats(self) -> Dict:
+        """Get subscriber and poll counters of the incident watchers"""
+        return self.stream_hub.stats()
+    
+    def subscribe_incident(self, incident_id: str) -> Subscription:
+        """Subscribe to an incident's change stream (a snapshot followed by deltas)"""
+        return self.stream_hub.subscribe(incident_id)
+    
+    def unsubscribe_incident(self, incident_id: str, subscription: Subscription) -> None:
+        """Leave an incident's change stream"""
+        self.stream_hub.unsubscribe(incident_id, subscription)
+    
+    async def resolve_incident_id(self, key: str) -> str:
+        """Get the incident ID of an incident number or ID (from the incident index when the number was seen before)"""
+        try:
+            return await self.core.resolve_incident_id(key)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
     
-    def get_incident_data(self, ticket_number: str) -> Dict:
+    async def get_incident_data(self, ticket_number: str) -> Dict:
         """Get incident data including conference bridge and Slack channel information"""
         try:
-            return self.core.get_incident_data(ticket_number)
+            incident_data = await self.core.get_incident_data(ticket_number)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
+        self._touch(incident_data)
+        return incident_data
     
-    def generate_notification_message(
+    async def get_incident_bundle(self, ticket_number: str) -> Dict:
+        """Get incident data, responders, notes, status updates and custom fields in one call"""
+        try:
+            bundle = await self.core.get_incident_bundle(ticket_number)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        self._touch(bundle["incident_data"])
+        return bundle
+    
+    async def generate_notification_message(
         self, 
         incident_data: Dict, 
         ticket_number: str, 
         update_number: int = 1, 
         resolve: bool = False, 
-        downgrade: bool = False
+        downgrade: bool = False,
+        responders_data: Optional[List[Dict]] = None,
+        template: Optional[str] = None
     ) -> str:
         """Generate notification message for incident"""
         try:
-            return self.core.generate_notification_message(
-                incident_data, ticket_number, update_number, resolve, downgrade
+            return await self.core.generate_notification_message(
+                incident_data, ticket_number, update_number, resolve, downgrade,
+                responders_data=responders_data,
+                template=template
             )
+        except UnknownTemplate as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
     
-    def get_responders_data(self, incident_data: Dict) -> List[Dict]:
+    async def get_render_context(self, ticket_number: str, template: Optional[str] = None) -> Dict:
+        """
+        Get an incident's notification messages pre-rendered for every toggle of the form.
+        
+        Served from the incident and responder caches (kept fresh by the warmer while
+        the incident is viewed), so re-rendering does not reach PagerDuty.
+        
+        Returns:
+            Dict with the template values and the message variants (see
+            PagerDutyClient.render_message_variants), which the browser only joins
+        """
+        try:
+            compiled = self.core.templates.get(template)
+        except UnknownTemplate as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        
+        incident_data = await self.get_incident_data(ticket_number)
+        try:
+            responders = await self.core.get_responders_data(incident_data)
+        except Exception:
+            # The team name falls back to the escalation policy, same as message generation
+            responders = []
+        try:
+            values = self.core.get_render_values(incident_data, responders, compiled.definition.timezone)
+            messages = self.core.render_message_variants(compiled, values)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error building render context: {e}")
+        
+        return {
+            "ticket_number": ticket_number,
+            "incident_id": incident_data['incident'].get('id'),
+            "template": compiled.name,
+            "values": values,
+            "messages": messages
+        }
+    
+    async def get_responders_data(self, incident_data: Dict) -> List[Dict]:
         """Get responders data in a structured format"""
         try:
-            return self.core.get_responders_data(incident_data)
+            return await self.core.get_responders_data(incident_data)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
     
-    def add_note(self, incident_id: str, message: str) -> Dict:
-        """Add a note to a PagerDuty incident"""
+    async def add_note(self, incident_id: str, message: str) -> Dict:
+        """Add a note to a PagerDuty incident (queued in the outbox when there is one)"""
+        incident_id = await self.resolve_incident_id(incident_id)
+        if self.outbox is not None:
+            return await self._enqueue(OUTBOX_NOTE, {"incident_id": incident_id, "message": message}, "Note queued")
         try:
-            return self.core.add_note(incident_id, message)
+            result = await self.core.add_note(incident_id, message)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
+        # Let stream subscribers see the new note without waiting for the next poll
+        self.stream_hub.poke(incident_id)
+        return result
     
-    def send_status_update(self, incident_id: str, status: str, message: str) -> Dict:
-        """Send a status update to a PagerDuty incident"""
+    async def send_status_update(self, incident_id: str, status: str, message: str) -> Dict:
+        """Send a status update to a PagerDuty incident (queued in the outbox when there is one)"""
+        incident_id = await self.resolve_incident_id(incident_id)
+        if self.outbox is not None:
+            return await self._enqueue(
+                OUTBOX_STATUS_UPDATE,
+                {"incident_id": incident_id, "status": status, "message": message},
+                "Status update queued"
+            )
         try:
-            return self.core.send_status_update(incident_id, status, message)
+            result = await self.core.send_status_update(
+                incident_id, status, message,
+                # Push the note to stream subscribers once it lands
+                on_note_added=lambda _: self.stream_hub.poke(incident_id)
+            )
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
+        self.stream_hub.poke(incident_id)
+        return result
+    
+    def get_note_write(self, write_id: str) -> Dict:
+        """Get the state of a note written in the background after a status update"""
+        write = self.core.get_note_write(write_id)
+        if write is None:
+            raise HTTPException(status_code=404, detail=f"Unknown note write {write_id}")
+        return write
     
-    def get_status_updates(self, incident_id: str) -> List[Dict]:
-        """Get status updates for a PagerDuty incident"""
+    async def _enqueue(self, kind: str, payload: Dict, message: str) -> Dict:
+        """Record a write in the outbox and acknowledge it once it is on disk"""
         try:
-            return self.core.get_status_updates(incident_id)
+            item, _ = await self.outbox.enqueue(kind, payload)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to queue write: {str(e)}")
+        return {"success": True, "queued": True, "outbox_id": item["id"], "status": item["status"], "message": message}
+    
+    async def _dispatch_note(self, item: Dict) -> Dict:
+        """Outbox handler adding a queued note"""
+        payload = item["payload"]
+        result = self._check_write(await self.core.add_note(payload["incident_id"], payload["message"]))
+        self.stream_hub.poke(payload["incident_id"])
+        return result
+    
+    async def _dispatch_status_update(self, item: Dict) -> Dict:
+        """Outbox handler sending a queued status update, then queueing its note"""
+        payload = item["payload"]
+        result = self._check_write(await self.core.send_status_update(
+            payload["incident_id"], payload["status"], payload["message"], add_note=False
+        ))
+        # The note is a write of its own, so it gets its own outbox item and retries.
+        # Failing here must not fail the item: that would send the status update again.
+        try:
+            note, _ = await self.outbox.enqueue(
+                OUTBOX_NOTE, {"incident_id": payload["incident_id"], "message": payload["message"]}
+            )
+            note_result = {"success": None, "queued": True, "outbox_id": note["id"]}
+        except Exception as e:
+            print(f"Error queueing status update note for incident {payload['incident_id']}: {e}")
+            note_result = {"success": False, "error": str(e)}
+        self.stream_hub.poke(payload["incident_id"])
+        return {**result, "note_result": note_result}
+    
+    def _check_write(self, result: Dict) -> Dict:
+        """Raise for a failed write: plainly if it is worth retrying, OutboxRejected if not"""
+        if result.get("success"):
+            return result
+        error = f"{result.get('message')} - {result.get('error')}"
+        status_code = result.get("status_code") or 0
+        if status_code == 429 or status_code >= 500:
+            raise Exception(error)
+        raise OutboxRejected(error)
+    
+    async def get_status_updates(self, incident_id: str, since: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+        """Get status updates for a PagerDuty incident, or only the ones added after a cursor"""
+        incident_id = await self.resolve_incident_id(incident_id)
+        try:
+            timeline = await self.core.get_status_updates_timeline(incident_id)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
+        return self._read_timeline(timeline, "status_updates", since, limit)
     
-    def get_incident_notes(self, incident_id: str) -> List[Dict]:
-        """Get notes for a PagerDuty incident"""
+    async def get_incident_notes(self, incident_id: str, since: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+        """Get notes for a PagerDuty incident, or only the ones added after a cursor"""
+        incident_id = await self.resolve_incident_id(incident_id)
         try:
-            return self.core.get_incident_notes(incident_id)
+            timeline = await self.core.get_notes_timeline(incident_id)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
+        return self._read_timeline(timeline, "notes", since, limit)
+    
+    def _read_timeline(self, timeline: Timeline, key: str, since: Optional[str], limit: Optional[int]) -> Dict:
+        """
+        Read a page of a timeline.
+        
+        Returns:
+            Dict with the entries under `key`, the cursor to pass as `since` next time,
+            whether more entries follow and whether `since` was stale and the read
+            started over (the caller should then replace what it holds)
+        """
+        if since is None and limit is None:
+            # The whole list, ordered by creation time as before cursors existed
+            return {key: timeline.items(), "cursor": timeline.cursor, "more": False, "reset": False}
+        items, cursor, more, reset = timeline.since(since, limit)
+        return {key: items, "cursor": cursor, "more": more, "reset": reset}
     
-    def get_custom_field_values(self, incident_id: str) -> Dict:
+    async def get_custom_field_values(self, incident_id: str) -> Dict:
         """Get custom field values for a PagerDuty incident"""
+        incident_id = await self.resolve_incident_id(incident_id)
         try:
-            return self.core.get_custom_field_values(incident_id)
+            return await self.core.get_custom_field_values(incident_id)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
     
\ No newline at end of file
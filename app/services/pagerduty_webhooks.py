@@ -0,0 +1,258 @@
+"""
+PagerDuty V3 webhook ingestion
+Signature verification and a queue applying pushed incident events to the caches and change streams
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from .async_pagerduty_client import AsyncPagerDutyClient
+from .cache import TTLCache
+from .incident_stream import IncidentStreamHub
+from .incident_timeline import with_display_time
+from .incident_warmer import IncidentWarmer
+from .instrumentation import start_background_task
+
+
+SIGNATURE_HEADER = "X-PagerDuty-Signature"
+
+# Sent once when a webhook subscription is created or tested
+PING_EVENT = "pagey.ping"
+
+
+def sign(body: bytes, secret: str) -> str:
+    """Signature PagerDuty sends for a body, e.g. "v1=5f0c...\""""
+    return "v1=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body: bytes, header: Optional[str], secrets: Iterable[str]) -> bool:
+    """
+    Check the X-PagerDuty-Signature header of a webhook delivery.
+    
+    The header lists one "v1=<hex HMAC-SHA256>" signature per signing secret of
+    the subscription (several while a secret is being rotated); any match with
+    any configured secret accepts the delivery.
+    
+    Args:
+        body: Raw request body, exactly as received
+        header: Value of X-PagerDuty-Signature, or None if missing
+        secrets: Signing secrets of the webhook subscriptions
+    """
+    if not header:
+        return False
+    signatures = [signature.strip() for signature in header.split(',')]
+    for secret in secrets:
+        expected = sign(body, secret)
+        if any(hmac.compare_digest(expected, signature) for signature in signatures):
+            return True
+    return False
+
+
+def event_incident_id(event: Dict) -> Optional[str]:
+    """
+    ID of the incident an event is about.
+    
+    Incident state events carry the incident itself as data; notes, status updates
+    and responder events carry an incident reference under data.incident.
+    """
+    data = event.get('data') or {}
+    if data.get('type') == 'incident':
+        return data.get('id')
+    return (data.get('incident') or {}).get('id')
+
+
+class WebhookProcessor:
+    """
+    Applies PagerDuty webhook events, one at a time, from a bounded queue.
+    
+    The endpoint only verifies and enqueues, so PagerDuty gets its 2xx right away
+    and a burst of events never holds up API requests. For every incident event
+    the cached snapshot is dropped (the next read fetches the full incident, with
+    its conference bridge, which events do not carry), stream watchers and the
+    warmer re-fetch it once instead of waiting for their next poll, and new
+    notes and status updates are appended to the incident's timelines and pushed
+    to stream subscribers as they arrive.
+    
+    PagerDuty delivers at least once and retries failed deliveries, so events are
+    deduplicated by ID.
+    """
+    
+    def __init__(
+        self,
+        client: AsyncPagerDutyClient,
+        stream_hub: IncidentStreamHub,
+        warmer: Optional[IncidentWarmer] = None,
+        queue_size: int = 1000,
+        record_path: Optional[str] = None
+    ):
+        """
+        Initialize the processor (the worker starts with the first event).
+        
+        Args:
+            client: PagerDuty client whose caches events invalidate
+            stream_hub: Change stream watchers to update
+            warmer: Warmer to re-poll hot incidents through, if enabled
+            queue_size: Events waiting to be applied before deliveries are refused
+            record_path: File every accepted event is appended to (one JSON object per
+                line), for replaying with benchmarks/replay_webhooks.py; None to not record
+        """
+        self.client = client
+        self.stream_hub = stream_hub
+        self.warmer = warmer
+        self.record_path = record_path
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.seen_events = TTLCache(maxsize=4096, ttl=3600)
+        self._worker: Optional[asyncio.Task] = None
+        
+        self.handlers: Dict[str, Callable[[str, Dict], None]] = {
+            "incident.annotated": self._apply_note,
+            "incident.status_update_published": self._apply_status_update
+        }
+        
+        # Metrics
+        self.received = 0
+        self.duplicates = 0
+        self.refused = 0
+        self.processed = 0
+        self.failures = 0
+        self.event_types: Dict[str, int] = {}
+        self.last_event_at: Optional[float] = None
+    
+    def enqueue(self, event: Dict) -> bool:
+        """
+        Queue a verified event.
+        
+        Returns:
+            False if the queue is full; the delivery should be refused so PagerDuty retries it
+        """
+        self.received += 1
+        event_id = event.get('id')
+        if event_id and event_id in self.seen_events:
+            self.duplicates += 1
+            return True
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.refused += 1
+            return False
+        if event_id:
+            self.seen_events.set(event_id, True)
+        self._ensure_started()
+        return True
+    
+    def _ensure_started(self) -> None:
+        """Start (or restart after a crash) the worker on the running event loop"""
+        if self._worker is not None and not self._worker.done():
+            return
+        self._worker = start_background_task(self._run())
+    
+    async def _run(self) -> None:
+        while True:
+            event = await self.queue.get()
+            try:
+                await self.apply(event)
+            except Exception as e:
+                self.failures += 1
+                print(f"Error applying PagerDuty webhook event {event.get('id')}: {e}")
+            finally:
+                self.queue.task_done()
+            self._record(event)
+            # Let request handlers run between events of a burst
+            await asyncio.sleep(0)
+    
+    async def apply(self, event: Dict) -> None:
+        """Apply one event to the caches, change streams and warmer"""
+        event_type = event.get('event_type', 'unknown')
+        self.processed += 1
+        self.event_types[event_type] = self.event_types.get(event_type, 0) + 1
+        self.last_event_at = time.time()
+        if event_type == PING_EVENT or event.get('resource_type') != 'incident':
+            return
+        
+        incident_id = event_incident_id(event)
+        if not incident_id:
+            return
+        data = event.get('data') or {}
+        if data.get('type') == 'incident':
+            await self.client.incident_index.arecord({'id': incident_id, 'incident_number': data.get('number')})
+        
+        self.client.invalidate_incident(incident_id)
+        
+        handler = self.handlers.get(event_type)
+        if handler is not None:
+            # Notes and status updates arrive complete: no need to poll for them
+            handler(incident_id, event)
+        else:
+            self.stream_hub.poke(incident_id)
+        
+        if self.warmer is not None:
+            priority = (data.get('priority') or {}).get('summary') if data.get('type') == 'incident' else None
+            self.warmer.observe(incident_id, priority=priority, status=data.get('status'))
+    
+    def _apply_note(self, incident_id: str, event: Dict) -> None:
+        """Append an added note to its timeline and stream, shaped like the notes API returns it"""
+        data = event.get('data') or {}
+        if data.get('trimmed'):
+            # Long notes arrive shortened; appended under their ID they could never be completed,
+            # so have the next read (and the watcher's poll) fetch the full note instead
+            self.client.mark_timeline_stale("notes", incident_id)
+            self.stream_hub.poke(incident_id)
+            return
+        note = with_display_time({
+            "id": data.get('id'),
+            "content": data.get('content', ''),
+            "created_at": event.get('occurred_at'),
+            "user": event.get('agent')
+        })
+        self.client.record_timeline_items("notes", incident_id, [note])
+        self.stream_hub.push(incident_id, "notes", [note])
+    
+    def _apply_status_update(self, incident_id: str, event: Dict) -> None:
+        """Append a published status update to its timeline and stream, shaped like the status updates API returns it"""
+        data = event.get('data') or {}
+        status_update = with_display_time({
+            "id": data.get('id'),
+            "message": data.get('message', ''),
+            "created_at": event.get('occurred_at'),
+            "sender": data.get('sender') or event.get('agent')
+        })
+        self.client.record_timeline_items("status_updates", incident_id, [status_update])
+        self.stream_hub.push(incident_id, "status_updates", [status_update])
+    
+    def _record(self, event: Dict) -> None:
+        """Append the event to the recording file"""
+        if not self.record_path:
+            return
+        try:
+            with open(self.record_path, 'a') as f:
+                f.write(json.dumps({"event": event}, separators=(',', ':')) + "\n")
+        except OSError as e:
+            print(f"Error recording PagerDuty webhook event: {e}")
+    
+    async def aclose(self) -> None:
+        """Stop the worker (events still queued are dropped; PagerDuty is not asked to resend them)"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    def stats(self) -> Dict:
+        """Get queue depth and event counters"""
+        return {
+            "queued": self.queue.qsize(),
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "refused": self.refused,
+            "processed": self.processed,
+            "failures": self.failures,
+            "event_types": dict(self.event_types),
+            "last_event_at": self.last_event_at
+        }
+
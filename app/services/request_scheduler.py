@@ -0,0 +1,261 @@
+"""
+Rate-limit aware scheduler for PagerDuty API requests
+Token bucket, priority lanes and 429 backoff shared by every outgoing call
+"""
+
+import asyncio
+import itertools
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+
+# Priority lanes, lowest value is served first
+PRIORITY_WRITE = 0        # Notes and status updates typed by an operator
+PRIORITY_READ = 1         # Reads serving an interactive API request
+PRIORITY_BACKGROUND = 2   # Reads nobody is waiting on (warmers, pollers)
+
+LANE_NAMES = {
+    PRIORITY_WRITE: "write",
+    PRIORITY_READ: "read",
+    PRIORITY_BACKGROUND: "background"
+}
+
+# Responses worth retrying for idempotent requests
+RETRYABLE_READ_STATUSES = {500, 502, 503, 504}
+
+
+def parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """Read the Retry-After header as seconds, accepting both delta-seconds and HTTP dates"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Client-side token bucket matching the account's REST API rate limit.
+    
+    Tokens refill continuously at `rate` per second up to `capacity`. A 429 from
+    upstream pauses the whole bucket until the Retry-After deadline has passed.
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize a full bucket.
+        
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens held (the allowed burst)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+    
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for the given number of seconds"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+    
+    async def acquire(self) -> float:
+        """
+        Take one token, sleeping until one is available.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            delay = self.paused_until - now
+            if delay <= 0:
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+class RequestScheduler:
+    """
+    Central scheduler every PagerDuty request goes through.
+    
+    Requests wait in priority lanes and are released in priority order, limited by
+    a token bucket and a maximum number of requests in flight. 429 responses (and
+    5xx responses to reads) are retried with jittered exponential backoff that
+    honors Retry-After.
+    """
+    
+    def __init__(
+        self,
+        rate_per_minute: float = 900,
+        burst: float = 30,
+        max_concurrency: int = 10,
+        max_retries: int = 4,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0
+    ):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            rate_per_minute: Sustained request rate allowed by the account's REST API limit
+            burst: Requests that may be sent back to back before rate limiting kicks in
+            max_concurrency: Maximum number of requests in flight at once
+            max_retries: Retries for a throttled or failed request before giving up
+            base_backoff: First backoff delay in seconds, doubled on each retry
+            max_backoff: Upper bound of a single backoff delay in seconds
+        """
+        self.bucket = TokenBucket(rate=rate_per_minute / 60.0, capacity=burst)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._sequence = itertools.count()
+        
+        # Metrics
+        self.queue_depth = {lane: 0 for lane in LANE_NAMES.values()}
+        self.max_queue_depth = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.throttle_waits = 0
+        self.throttle_wait_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+    
+    def _ensure_worker(self) -> asyncio.PriorityQueue:
+        """Start the dispatcher on the running event loop if it is not running yet"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.PriorityQueue()
+            self._worker = asyncio.ensure_future(self._dispatch())
+        return self._queue
+    
+    async def _dispatch(self) -> None:
+        """Release queued requests in priority order as slots and tokens allow"""
+        while True:
+            _, _, ticket = await self._queue.get()
+            if ticket.done():
+                # The caller gave up while waiting
+                continue
+            await self._slots.acquire()
+            waited = await self.bucket.acquire()
+            if waited:
+                self.throttle_waits += 1
+                self.throttle_wait_seconds += waited
+            if ticket.done():
+                self._slots.release()
+            else:
+                ticket.set_result(None)
+    
+    async def _wait_for_turn(self, priority: int) -> None:
+        """Queue in the given lane until the dispatcher hands out a slot"""
+        queue = self._ensure_worker()
+        ticket = asyncio.get_running_loop().create_future()
+        lane = LANE_NAMES.get(priority, "read")
+        queued_at = time.monotonic()
+        
+        self.queue_depth[lane] += 1
+        self.max_queue_depth = max(self.max_queue_depth, sum(self.queue_depth.values()))
+        queue.put_nowait((priority, next(self._sequence), ticket))
+        try:
+            await ticket
+        except asyncio.CancelledError:
+            if ticket.done() and not ticket.cancelled():
+                # The slot was granted just as we were cancelled
+                self._slots.release()
+            raise
+        finally:
+            self.queue_depth[lane] -= 1
+            self.queue_wait_seconds += time.monotonic() - queued_at
+    
+    async def submit(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        priority: int = PRIORITY_READ,
+        idempotent: bool = True
+    ) -> httpx.Response:
+        """
+        Send a request through the scheduler.
+        
+        Args:
+            send: Zero-argument coroutine function performing the HTTP request
+            priority: Lane to queue in (PRIORITY_WRITE, PRIORITY_READ or PRIORITY_BACKGROUND)
+            idempotent: Whether 5xx responses may be retried (429 is always retried)
+        
+        Returns:
+            The final response; the last throttled response if retries ran out
+        """
+        attempt = 0
+        while True:
+            await self._wait_for_turn(priority)
+            try:
+                self.requests += 1
+                response = await send()
+            finally:
+                self._slots.release()
+            
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRYABLE_READ_STATUSES)
+            if not retryable or attempt >= self.max_retries:
+                return response
+            
+            retry_after = self._parse_retry_after(response)
+            if response.status_code == 429:
+                self.throttled += 1
+                # The limit is account-wide, so hold back every lane, not just this request
+                self.bucket.pause(retry_after if retry_after is not None else self._backoff(attempt))
+            
+            delay = max(retry_after or 0.0, self._backoff(attempt))
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+    
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given retry attempt"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+    
+    def _parse_retry_after(self, response: httpx.Response) -> Optional[float]:
+        return parse_retry_after(response)
+    
+    async def aclose(self) -> None:
+        """Stop the dispatcher"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    def stats(self) -> Dict:
+        """Get queue depth, throttling and retry counters"""
+        return {
+            "queue_depth": dict(self.queue_depth),
+            "max_queue_depth": self.max_queue_depth,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled_responses": self.throttled,
+            "throttle_waits": self.throttle_waits,
+            "throttle_wait_seconds": round(self.throttle_wait_seconds, 3),
+            "queue_wait_seconds": round(self.queue_wait_seconds, 3),
+            "tokens_available": round(self.bucket.tokens, 2)
+        }
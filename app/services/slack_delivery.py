@@ -0,0 +1,312 @@
+"""
+Queued Slack webhook delivery
+Per-webhook rate limiting, Retry-After aware retries and idempotent submission
+"""
+
+import asyncio
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from .cache import TTLCache
+from .instrumentation import start_background_task
+from .request_scheduler import TokenBucket, parse_retry_after
+
+
+# Delivery states; the last two are final
+STATUS_QUEUED = "queued"
+STATUS_SENDING = "sending"
+STATUS_RETRYING = "retrying"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+FINAL_STATUSES = {STATUS_SENT, STATUS_FAILED}
+
+# Webhook responses worth another attempt (throttling and Slack-side errors)
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SlackDelivery:
+    """One message on its way to a Slack webhook"""
+    
+    def __init__(self, webhook_url: str, payload: Dict, idempotency_key: Optional[str], delivery_id: Optional[str] = None):
+        self.id = delivery_id or uuid.uuid4().hex
+        self.webhook_url = webhook_url
+        self.payload = payload
+        self.idempotency_key = idempotency_key
+        self.status = STATUS_QUEUED
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.sent_at: Optional[float] = None
+        self.retry_at: Optional[float] = None
+        # Status of the last webhook response (None if the last attempt got no response)
+        self.status_code: Optional[int] = None
+        self._changed = asyncio.Event()
+    
+    @property
+    def done(self) -> bool:
+        return self.status in FINAL_STATUSES
+    
+    def update(self, status: str, error: Optional[str] = None, retry_at: Optional[float] = None) -> None:
+        """Move to a new state and wake everyone waiting on this delivery"""
+        self.status = status
+        self.error = error
+        self.retry_at = retry_at
+        if status == STATUS_SENT:
+            self.sent_at = time.time()
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+    
+    async def wait_for_change(self, timeout: float) -> bool:
+        """
+        Wait until the delivery changes state.
+        
+        Returns:
+            False if nothing changed within the timeout
+        """
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
+    def to_dict(self) -> Dict:
+        return {
+            "delivery_id": self.id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at,
+            "sent_at": self.sent_at,
+            "retry_in": round(max(0.0, self.retry_at - time.time()), 1) if self.retry_at else None
+        }
+
+
+class SlackDeliveryQueue:
+    """
+    Delivery queue with one worker and one rate limiter per webhook.
+    
+    Slack accepts roughly one message per second per incoming webhook, so each
+    webhook gets a token bucket at that rate and posts its messages in order.
+    Throttled (429) and failed (5xx, timeout) posts are retried with jittered
+    exponential backoff that honors Retry-After; other 4xx responses are final.
+    
+    Submissions are idempotent: a key seen within `idempotency_ttl` seconds, or a
+    message identical to one still waiting for the same webhook, returns the
+    existing delivery instead of posting twice.
+    """
+    
+    def __init__(
+        self,
+        post: Callable[[str, Dict], Awaitable[httpx.Response]],
+        rate_per_second: float = 1.0,
+        burst: float = 1,
+        max_attempts: int = 5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        idempotency_ttl: float = 600.0,
+        history_size: int = 500
+    ):
+        """
+        Initialize the queue (workers start with the first delivery).
+        
+        Args:
+            post: Coroutine function posting a payload to a webhook URL
+            rate_per_second: Messages per second allowed per webhook
+            burst: Messages a webhook may receive back to back
+            max_attempts: Attempts per message before it is marked failed
+            base_backoff: First retry delay in seconds without Retry-After, doubled on each retry
+            max_backoff: Upper bound of a single retry delay in seconds
+            idempotency_ttl: Seconds an idempotency key maps to its delivery
+            history_size: Deliveries kept for status lookups
+        """
+        self.post = post
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.history_size = history_size
+        
+        self.deliveries: "OrderedDict[str, SlackDelivery]" = OrderedDict()
+        self.idempotency_keys = TTLCache(maxsize=history_size, ttl=idempotency_ttl)
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._pending_messages: Dict[Tuple[str, str], str] = {}
+        
+        # Metrics
+        self.submitted = 0
+        self.deduplicated = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttled = 0
+    
+    def submit(
+        self,
+        webhook_url: str,
+        payload: Dict,
+        idempotency_key: Optional[str] = None,
+        delivery_id: Optional[str] = None
+    ) -> Tuple[SlackDelivery, bool]:
+        """
+        Queue a payload for a webhook, or find the delivery it duplicates.
+        
+        Args:
+            webhook_url: Slack incoming webhook URL
+            payload: Message payload
+            idempotency_key: Client-chosen key identifying this message
+            delivery_id: ID for the new delivery (e.g. its outbox item ID); random if None
+        
+        Returns:
+            Tuple of (delivery, duplicate) where duplicate is True if nothing new was queued
+        """
+        existing = self._find_duplicate(webhook_url, payload, idempotency_key)
+        if existing is not None:
+            self.deduplicated += 1
+            return existing, True
+        
+        delivery = SlackDelivery(webhook_url, payload, idempotency_key, delivery_id)
+        self.submitted += 1
+        self.deliveries[delivery.id] = delivery
+        while len(self.deliveries) > self.history_size:
+            oldest_id, oldest = next(iter(self.deliveries.items()))
+            if not oldest.done:
+                break
+            del self.deliveries[oldest_id]
+        if idempotency_key:
+            self.idempotency_keys.set(idempotency_key, delivery.id)
+        self._pending_messages[self._message_key(webhook_url, payload)] = delivery.id
+        
+        self._ensure_worker(webhook_url).put_nowait(delivery)
+        return delivery, False
+    
+    def get(self, delivery_id: str) -> Optional[SlackDelivery]:
+        return self.deliveries.get(delivery_id)
+    
+    def _find_duplicate(self, webhook_url: str, payload: Dict, idempotency_key: Optional[str]) -> Optional[SlackDelivery]:
+        """Delivery a submission repeats; failed deliveries may be submitted again"""
+        candidates = [self._pending_messages.get(self._message_key(webhook_url, payload))]
+        if idempotency_key:
+            candidates.insert(0, self.idempotency_keys.get(idempotency_key))
+        for delivery_id in candidates:
+            delivery = self.deliveries.get(delivery_id) if delivery_id else None
+            if delivery is not None and delivery.status != STATUS_FAILED:
+                return delivery
+        return None
+    
+    def _message_key(self, webhook_url: str, payload: Dict) -> Tuple[str, str]:
+        return (webhook_url, payload.get("text"))
+    
+    def _ensure_worker(self, webhook_url: str) -> asyncio.Queue:
+        """Start the webhook's worker on the running event loop if it is not running yet"""
+        worker = self._workers.get(webhook_url)
+        if worker is None or worker.done():
+            self._queues.setdefault(webhook_url, asyncio.Queue())
+            self._buckets.setdefault(webhook_url, TokenBucket(rate=self.rate_per_second, capacity=self.burst))
+            self._workers[webhook_url] = start_background_task(self._work(webhook_url))
+        return self._queues[webhook_url]
+    
+    async def _work(self, webhook_url: str) -> None:
+        """Post the webhook's deliveries one at a time, in submission order"""
+        queue = self._queues[webhook_url]
+        while True:
+            delivery = await queue.get()
+            try:
+                await self._deliver(delivery, self._buckets[webhook_url])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep the worker alive for the deliveries behind this one
+                print(f"Error delivering Slack message {delivery.id}: {e}")
+                self._finish(delivery, STATUS_FAILED, str(e))
+            finally:
+                queue.task_done()
+    
+    async def _deliver(self, delivery: SlackDelivery, bucket: TokenBucket) -> None:
+        """Post one delivery, retrying throttled and failed attempts"""
+        while True:
+            await bucket.acquire()
+            delivery.attempts += 1
+            delivery.update(STATUS_SENDING)
+            
+            retry_after = None
+            delivery.status_code = None
+            try:
+                response = await self.post(delivery.webhook_url, delivery.payload)
+            except httpx.TimeoutException:
+                error = "Slack request timed out"
+            except httpx.RequestError as e:
+                error = f"Slack request failed: {str(e)}"
+            else:
+                delivery.status_code = response.status_code
+                if response.status_code == 200:
+                    self._finish(delivery, STATUS_SENT)
+                    return
+                error = f"Slack API error: {response.status_code} - {response.text}"
+                if response.status_code not in RETRYABLE_STATUSES:
+                    self._finish(delivery, STATUS_FAILED, error)
+                    return
+                retry_after = parse_retry_after(response)
+                if response.status_code == 429:
+                    self.throttled += 1
+                    # Hold back every message for this webhook, not just this one
+                    bucket.pause(retry_after if retry_after is not None else self._backoff(delivery.attempts))
+            
+            if delivery.attempts >= self.max_attempts:
+                self._finish(delivery, STATUS_FAILED, error)
+                return
+            
+            delay = max(retry_after or 0.0, self._backoff(delivery.attempts))
+            self.retries += 1
+            delivery.update(STATUS_RETRYING, error, retry_at=time.time() + delay)
+            await asyncio.sleep(delay)
+    
+    def _finish(self, delivery: SlackDelivery, status: str, error: Optional[str] = None) -> None:
+        if status == STATUS_SENT:
+            self.sent += 1
+        else:
+            self.failed += 1
+        message_key = self._message_key(delivery.webhook_url, delivery.payload)
+        if self._pending_messages.get(message_key) == delivery.id:
+            del self._pending_messages[message_key]
+        delivery.update(status, error)
+    
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter after the given attempt"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+    
+    async def aclose(self, drain_timeout: float = 5.0) -> None:
+        """Give queued deliveries a chance to go out, then stop the workers"""
+        if any(not delivery.done for delivery in self.deliveries.values()):
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(queue.join() for queue in self._queues.values())),
+                    timeout=drain_timeout
+                )
+            except asyncio.TimeoutError:
+                print("Slack deliveries still queued at shutdown were dropped")
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._workers.clear()
+    
+    def stats(self) -> Dict:
+        """Get per-webhook queue depth and delivery counters"""
+        return {
+            "queued": sum(queue.qsize() for queue in self._queues.values()),
+            "webhooks": len(self._queues),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "throttled_responses": self.throttled
+        }
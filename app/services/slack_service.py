@@ -2,58 +2,196 @@
 Slack service for sending notifications to Slack channels
 """
 
+import asyncio
+import time
 import httpx
-from typing import Dict
+from typing import Dict, Optional
 from fastapi import HTTPException
 
 from app.config.config import settings
+from app.services.instrumentation import UpstreamCall, metrics
+from app.services.outbox import (
+    STATUS_FAILED as OUTBOX_FAILED, STATUS_PENDING as OUTBOX_PENDING,
+    STATUS_SENDING as OUTBOX_SENDING, STATUS_SENT as OUTBOX_SENT, Outbox, OutboxRejected
+)
+from app.services.slack_delivery import (
+    RETRYABLE_STATUSES, STATUS_FAILED, STATUS_QUEUED, STATUS_RETRYING, STATUS_SENDING, STATUS_SENT,
+    SlackDeliveryQueue
+)
+
+# Outbox item kind of queued Slack messages
+OUTBOX_KIND = "slack.message"
 
 
 class SlackService:
     """Service for sending notifications to Slack via webhook"""
     
-    def __init__(self):
-        """Initialize the service with webhook URL"""
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, outbox: Optional[Outbox] = None):
+        """Initialize the service with webhook URL, an optional shared HTTP client and an optional durable outbox"""
         self.webhook_url = settings.SLACK_WEBHOOK_URL
         if not self.webhook_url:
             raise ValueError("SLACK_WEBHOOK_URL environment variable not set")
+        
+        self.http_client = http_client
+        self.outbox = outbox
+        
+        # Rate-limited, retrying delivery used by the web UI
+        self.delivery_queue = SlackDeliveryQueue(
+            self._post,
+            rate_per_second=settings.SLACK_RATE_LIMIT_PER_SECOND,
+            max_attempts=settings.SLACK_MAX_ATTEMPTS,
+            idempotency_ttl=settings.SLACK_IDEMPOTENCY_TTL,
+            history_size=settings.SLACK_DELIVERY_HISTORY
+        )
+    
+    def _build_payload(self, message: str) -> Dict:
+        """Build the webhook payload for a notification message"""
+        # Add @here mention for Slack notifications
+        slack_message = f"{message}\n\n@here"
+        
+        # Use Block Kit format for proper @here mentions
+        return {
+            "text": slack_message,  # Fallback text for notifications
+            "blocks": [
+                {
+                    "type": "section",
+                    "text": {
+                        "type": "mrkdwn",
+                        "text": slack_message
+                    }
+                }
+            ]
+        }
+    
+    def start_background_tasks(self) -> None:
+        """Start draining Slack messages recorded in the outbox (needs a running event loop)"""
+        if self.outbox is not None:
+            self.outbox.register(OUTBOX_KIND, self._dispatch_outbox_item)
+    
+    async def enqueue_notification(self, message: str, idempotency_key: Optional[str] = None) -> Dict:
+        """
+        Queue a notification message for delivery to Slack.
+        
+        With an outbox the message is recorded durably first and survives restarts
+        and Slack outages; the delivery ID is then the outbox item ID.
+        
+        Args:
+            message: Notification message
+            idempotency_key: Client-chosen key; resubmitting it returns the original delivery
+        
+        Returns:
+            Delivery status, with "duplicate" set if the message was already queued or sent
+        """
+        if self.outbox is not None:
+            item, duplicate = await self.outbox.enqueue(OUTBOX_KIND, {"message": message}, dedupe_key=idempotency_key)
+            return {**self._outbox_delivery_status(item), "duplicate": duplicate}
+        
+        delivery, duplicate = self.delivery_queue.submit(
+            self.webhook_url, self._build_payload(message), idempotency_key
+        )
+        return {**delivery.to_dict(), "duplicate": duplicate}
+    
+    async def _dispatch_outbox_item(self, item: Dict) -> Dict:
+        """Outbox handler: deliver a recorded message through the rate-limited queue"""
+        delivery, _ = self.delivery_queue.submit(
+            self.webhook_url,
+            self._build_payload(item["payload"]["message"]),
+            idempotency_key=item["id"],
+            delivery_id=item["id"]
+        )
+        while not delivery.done:
+            await delivery.wait_for_change(timeout=60.0)
+        if delivery.status == STATUS_FAILED:
+            if delivery.status_code is not None and delivery.status_code not in RETRYABLE_STATUSES:
+                raise OutboxRejected(delivery.error)
+            raise Exception(delivery.error)
+        return {"sent_at": delivery.sent_at}
+    
+    async def get_delivery_status(self, delivery_id: str) -> Optional[Dict]:
+        """
+        Get the status of a queued or recent delivery.
+        
+        Returns:
+            Delivery status, or None if the delivery is unknown
+        """
+        item = await asyncio.to_thread(self.outbox.get, delivery_id) if self.outbox is not None else None
+        delivery = self.delivery_queue.get(delivery_id)
+        if item is not None and (item["status"] != OUTBOX_SENDING or delivery is None):
+            return self._outbox_delivery_status(item)
+        if delivery is None:
+            return None
+        status = delivery.to_dict()
+        if item is not None and delivery.status == STATUS_FAILED:
+            # The outbox has not decided yet whether to try again later
+            status["status"] = STATUS_RETRYING
+        return status
+    
+    async def wait_for_delivery_change(self, delivery_id: str, timeout: float) -> bool:
+        """
+        Wait until a delivery may have changed state.
+        
+        Returns:
+            False if nothing changed within the timeout
+        """
+        delivery = self.delivery_queue.get(delivery_id)
+        if delivery is not None and not delivery.done:
+            return await delivery.wait_for_change(timeout)
+        if self.outbox is not None:
+            return await self.outbox.wait_for_change(delivery_id, timeout)
+        return await delivery.wait_for_change(timeout) if delivery is not None else False
+    
+    def _outbox_delivery_status(self, item: Dict) -> Dict:
+        """Delivery status of a Slack message recorded in the outbox"""
+        status = {
+            OUTBOX_PENDING: STATUS_RETRYING if item["attempts"] else STATUS_QUEUED,
+            OUTBOX_SENDING: STATUS_SENDING,
+            OUTBOX_SENT: STATUS_SENT,
+            OUTBOX_FAILED: STATUS_FAILED
+        }[item["status"]]
+        retry_in = None
+        if item["status"] == OUTBOX_PENDING and item["attempts"]:
+            retry_in = round(max(0.0, item["next_attempt_at"] - time.time()), 1)
+        return {
+            "delivery_id": item["id"],
+            "status": status,
+            "attempts": item["attempts"],
+            "error": item["last_error"],
+            "created_at": item["created_at"],
+            "sent_at": item["finished_at"] if item["status"] == OUTBOX_SENT else None,
+            "retry_in": retry_in
+        }
+    
+    def get_delivery_stats(self) -> Dict:
+        """Get delivery queue depth and counters"""
+        return self.delivery_queue.stats()
+    
+    async def aclose(self) -> None:
+        """Let queued deliveries go out (briefly) and stop the delivery workers"""
+        await self.delivery_queue.aclose()
+    
+    async def _post(self, webhook_url: str, payload: Dict) -> httpx.Response:
+        """Post a payload to a webhook with the shared client (or a one-off one)"""
+        if self.http_client is not None:
+            return await self._post_webhook(self.http_client, payload, webhook_url)
+        async with httpx.AsyncClient() as client:
+            return await self._post_webhook(client, payload, webhook_url)
     
     async def send_notification(self, message: str) -> Dict:
-        """Send a notification message to Slack"""
+        """Send a notification message to Slack right away, without queueing or retries"""
         try:
-            # Add @here mention for Slack notifications
-            slack_message = f"{message}\n\n@here"
+            response = await self._post(self.webhook_url, self._build_payload(message))
             
-            # Use Block Kit format for proper @here mentions
-            payload = {
-                "text": slack_message,  # Fallback text for notifications
-                "blocks": [
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": slack_message
-                        }
-                    }
-                ]
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.webhook_url,
-                    headers={"Content-Type": "application/json"},
-                    json=payload,
-                    timeout=30.0
+            if response.status_code == 200:
+                return {"success": True, "message": "Notification sent successfully"}
+            else:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Slack API error: {response.text}"
                 )
-                
-                if response.status_code == 200:
-                    return {"success": True, "message": "Notification sent successfully"}
-                else:
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Slack API error: {response.text}"
-                    )
                     
+        except HTTPException:
+            # Keep Slack's own status (e.g. 429) instead of turning it into a 500
+            raise
         except httpx.TimeoutException:
             raise HTTPException(status_code=408, detail="Slack request timed out")
         except httpx.RequestError as e:
@@ -61,33 +199,49 @@ class SlackService:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
     
+    async def _post_webhook(self, client: httpx.AsyncClient, payload: Dict, webhook_url: Optional[str] = None) -> httpx.Response:
+        """Post a payload to the Slack webhook"""
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await client.post(
+                webhook_url or self.webhook_url,
+                headers={"Content-Type": "application/json"},
+                json=payload,
+                timeout=30.0
+            )
+            return response
+        finally:
+            self._record_call(response, time.perf_counter() - started)
+    
+    def _record_call(self, response: Optional[httpx.Response], duration: float) -> None:
+        """Record a webhook call in the upstream metrics (the webhook URL itself is a secret)"""
+        metrics.record_upstream(UpstreamCall(
+            upstream="slack",
+            method="POST",
+            endpoint="/webhook",
+            status=str(response.status_code) if response is not None else "error",
+            duration=duration,
+            bytes=len(response.content) if response is not None else 0
+        ))
+    
     def send_notification_sync(self, message: str) -> Dict:
         """Send a notification message to Slack (synchronous version)"""
         try:
-            # Add @here mention for Slack notifications
-            slack_message = f"{message}\n\n@here"
-            
-            # Use Block Kit format for proper @here mentions
-            payload = {
-                "text": slack_message,  # Fallback text for notifications
-                "blocks": [
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": slack_message
-                        }
-                    }
-                ]
-            }
+            payload = self._build_payload(message)
             
             with httpx.Client() as client:
-                response = client.post(
-                    self.webhook_url,
-                    headers={"Content-Type": "application/json"},
-                    json=payload,
-                    timeout=30.0
-                )
+                started = time.perf_counter()
+                response = None
+                try:
+                    response = client.post(
+                        self.webhook_url,
+                        headers={"Content-Type": "application/json"},
+                        json=payload,
+                        timeout=30.0
+                    )
+                finally:
+                    self._record_call(response, time.perf_counter() - started)
                 
                 if response.status_code == 200:
                     return {"success": True, "message": "Notification sent successfully"}
@@ -97,6 +251,9 @@ class SlackService:
                         detail=f"Slack API error: {response.text}"
                     )
                     
+        except HTTPException:
+            # Keep Slack's own status (e.g. 429) instead of turning it into a 500
+            raise
         except httpx.TimeoutException:
             raise HTTPException(status_code=408, detail="Slack request timed out")
         except httpx.RequestError as e:
@@ -0,0 +1,367 @@
+"""
+Notification template engine
+Loads named templates from YAML/JSON files, validates their placeholders and compiles each one once
+Pure Python module with no external framework dependencies
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, fields
+from string import Formatter
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.config.notification_template import ACTIVE_TEMPLATE, NotificationTemplate
+from app.services.time_format import get_zone
+
+try:
+    import yaml
+except ImportError:
+    # PyYAML is optional; without it only .json template files are loaded
+    yaml = None
+
+
+# Name of the template used when a request does not pick one
+DEFAULT_TEMPLATE_NAME = "default"
+
+TEMPLATE_FILE_EXTENSIONS = (".json", ".yaml", ".yml")
+
+# Placeholders each part of a template may use
+HEADER_VARIABLES = ("severity", "title", "incident_url")
+UPDATE_VARIABLES = ("update_prefix", "update_number", "created_at")
+FOOTER_VARIABLES = ("status_dashboard_url",)
+BULLET_VARIABLES = {
+    "initial_sro_report": ("alert_title",),
+    "team_engaged": ("team_name",),
+    "team_has": ("team_name",),
+    "downgraded": ("new_severity",),
+    "resolved": (),
+    "no_further_updates": (),
+    "further_updates_initial": (),
+    "further_updates_followup": ()
+}
+
+class TemplateError(Exception):
+    """A template file or format string that cannot be compiled"""
+
+
+class UnknownTemplate(TemplateError):
+    """No template with the requested name is loaded"""
+
+
+def compile_format(source: str, variables: Iterable[str], where: str) -> Callable[..., str]:
+    """
+    Compile a str.format-style string into a render function.
+    
+    The string is parsed once and turned into a Python function concatenating
+    its literal text and fields, so rendering does no parsing at all.
+    Placeholders must be plain names from `variables`, without conversions or
+    format specs, so the browser can substitute them the same way; missing
+    values render as empty strings.
+    
+    Args:
+        source: Format string, e.g. "SEV {severity} | {title}"
+        variables: Placeholder names the string may use
+        where: Location reported in errors, e.g. "default: header_template"
+    
+    Returns:
+        Function taking the variables as keyword arguments and returning the text
+    
+    Raises:
+        TemplateError: If the string is malformed, uses an unknown placeholder or
+            gives a placeholder a conversion or format spec
+    """
+    if not isinstance(source, str):
+        raise TemplateError(f"{where}: expected a string, got {type(source).__name__}")
+    variables = tuple(variables)
+    
+    parts: List[str] = []
+    try:
+        parsed = list(Formatter().parse(source))
+    except ValueError as e:
+        raise TemplateError(f"{where}: {e}")
+    for literal, field, format_spec, conversion in parsed:
+        if literal:
+            parts.append(repr(literal))
+        if field is None:
+            continue
+        if field not in variables:
+            allowed = ", ".join(f"{{{name}}}" for name in variables) or "none"
+            raise TemplateError(f"{where}: unknown placeholder {{{field}}} (allowed: {allowed})")
+        if conversion or format_spec:
+            raise TemplateError(f"{where}: conversions and format specs are not supported in {{{field}}}")
+        parts.append(f"str({field})")
+    
+    # Names are checked against `variables` and literals are repr()'d, so the
+    # generated source only ever contains identifiers we chose and constants
+    params = "*, " + ", ".join(f"{name}=''" for name in variables) if variables else ""
+    body = " + ".join(parts) if parts else "''"
+    namespace: Dict = {}
+    exec(f"def render({params}):\n    return {body}\n", {"__builtins__": {}, "str": str}, namespace)
+    render = namespace["render"]
+    render.source = source
+    return render
+
+
+class CompiledTemplate:
+    """A validated notification template with every part compiled to a render function"""
+    
+    def __init__(self, name: str, definition: NotificationTemplate, source_path: Optional[str] = None):
+        """
+        Compile a template.
+        
+        Args:
+            name: Template name requests select it by
+            definition: Template strings
+            source_path: File the template was loaded from (None for the built-in one)
+        
+        Raises:
+            TemplateError: If any part does not compile
+        """
+        self.name = name
+        self.definition = definition
+        self.source_path = source_path
+        self.loaded_at = time.time()
+        
+        self._header = compile_format(definition.header_template, HEADER_VARIABLES, f"{name}: header_template")
+        self._update_line = compile_format(definition.update_template, UPDATE_VARIABLES, f"{name}: update_template")
+        self._footer = compile_format(definition.footer_template, FOOTER_VARIABLES, f"{name}: footer_template")
+        
+        unknown = set(definition.bullet_templates) - set(BULLET_VARIABLES)
+        if unknown:
+            raise TemplateError(f"{name}: unknown bullet templates {', '.join(sorted(unknown))} (known: {', '.join(BULLET_VARIABLES)})")
+        self._bullets = {
+            key: compile_format(template, BULLET_VARIABLES[key], f"{name}: bullet_templates.{key}")
+            for key, template in definition.bullet_templates.items()
+        }
+        
+        for key, prefix in definition.status_prefixes.items():
+            if not isinstance(prefix, str):
+                raise TemplateError(f"{name}: status_prefixes.{key}: expected a string, got {type(prefix).__name__}")
+        self.status_prefixes = dict(definition.status_prefixes)
+        
+        if not isinstance(definition.timezone, str):
+            raise TemplateError(f"{name}: timezone: expected a string, got {type(definition.timezone).__name__}")
+        try:
+            get_zone(definition.timezone)
+        except ValueError as e:
+            raise TemplateError(f"{name}: timezone: {e}")
+    
+    def header(self, severity: str, title: str, incident_url: str) -> str:
+        return self._header(severity=severity, title=title, incident_url=incident_url)
+    
+    def update_line(self, update_prefix: str, update_number: int, created_at: str) -> str:
+        return self._update_line(update_prefix=update_prefix, update_number=update_number, created_at=created_at)
+    
+    def footer(self, status_dashboard_url: str) -> str:
+        return self._footer(status_dashboard_url=status_dashboard_url)
+    
+    def bullet(self, key: str, **values) -> str:
+        """Render a bullet template ("" if the template leaves it out)"""
+        render = self._bullets.get(key)
+        return render(**values) if render is not None else ""
+    
+    def status_prefix(self, key: str) -> str:
+        return self.status_prefixes.get(key, "")
+    
+    def message(self, header: str, update_line: str, bullets: List[str], footer: str) -> str:
+        """Lay out the rendered parts as one notification message"""
+        bullet_lines = "\n".join(["- " + bullet for bullet in bullets])
+        return "\n".join((header, "", update_line, bullet_lines, "", footer)).strip()
+    
+    def to_dict(self) -> Dict:
+        """Template strings as served to the browser"""
+        return asdict(self.definition)
+
+
+def load_template_file(path: str, defaults: NotificationTemplate) -> NotificationTemplate:
+    """
+    Read a template definition from a YAML or JSON file.
+    
+    Parts the file leaves out are taken from `defaults`; bullet templates and
+    status prefixes are merged key by key, so a file only needs what it changes.
+    
+    Raises:
+        TemplateError: If the file cannot be read or has unexpected keys
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except OSError as e:
+        raise TemplateError(f"{path}: {e}")
+    
+    if path.endswith(".json"):
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise TemplateError(f"{path}: invalid JSON: {e}")
+    elif yaml is None:
+        raise TemplateError(f"{path}: PyYAML is not installed (pip install pyyaml), cannot load YAML templates")
+    else:
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise TemplateError(f"{path}: invalid YAML: {e}")
+    
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise TemplateError(f"{path}: expected a mapping of template parts")
+    known = {field.name for field in fields(NotificationTemplate)}
+    unknown = set(data) - known
+    if unknown:
+        raise TemplateError(f"{path}: unknown keys {', '.join(sorted(unknown))} (known: {', '.join(sorted(known))})")
+    
+    values = asdict(defaults)
+    for key, value in data.items():
+        if key in ("bullet_templates", "status_prefixes"):
+            if not isinstance(value, dict):
+                raise TemplateError(f"{path}: {key} must be a mapping")
+            values[key] = {**values[key], **value}
+        else:
+            values[key] = value
+    return NotificationTemplate(**values)
+
+
+class TemplateRegistry:
+    """
+    Named, compiled notification templates with hot reload.
+    
+    The built-in template (ACTIVE_TEMPLATE in notification_template.py) is always
+    available as "default". Every *.json, *.yaml and *.yml file in `directory` adds
+    a template named after the file (a default.* file replaces the built-in one).
+    
+    Lookups stat the directory at most every `reload_interval` seconds and
+    recompile the files that changed, so edits apply without a restart. A file
+    that fails validation is reported and its last good version stays in use.
+    """
+    
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        default_name: str = DEFAULT_TEMPLATE_NAME,
+        reload_interval: float = 2.0,
+        builtin: NotificationTemplate = ACTIVE_TEMPLATE
+    ):
+        """
+        Initialize the registry and load the template files.
+        
+        Args:
+            directory: Directory holding template files; only the built-in template if None
+            default_name: Template used when a request does not name one
+            reload_interval: Minimum seconds between checks for changed files
+            builtin: Template served as "default" when no default.* file exists
+        """
+        self.directory = directory
+        self.default_name = default_name
+        self.reload_interval = reload_interval
+        self.builtin = CompiledTemplate(DEFAULT_TEMPLATE_NAME, builtin)
+        
+        self.templates: Dict[str, CompiledTemplate] = {DEFAULT_TEMPLATE_NAME: self.builtin}
+        self.errors: Dict[str, str] = {}
+        self._mtimes: Dict[str, tuple] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+        
+        self.reload()
+        if default_name not in self.templates:
+            print(f"Default notification template '{default_name}' is not loaded; requests must name a template")
+    
+    def get(self, name: Optional[str] = None) -> CompiledTemplate:
+        """
+        Get a compiled template, picking up file changes first.
+        
+        Args:
+            name: Template name; the default template if None
+        
+        Raises:
+            UnknownTemplate: If no template has that name
+        """
+        self._maybe_reload()
+        template = self.templates.get(name or self.default_name)
+        if template is None:
+            raise UnknownTemplate(f"Unknown notification template '{name or self.default_name}' (available: {', '.join(self.names())})")
+        return template
+    
+    def names(self) -> List[str]:
+        self._maybe_reload()
+        return sorted(self.templates)
+    
+    def _maybe_reload(self) -> None:
+        if self.directory is None or time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        self.reload()
+    
+    def reload(self) -> None:
+        """Recompile the template files that were added, changed or removed since the last check"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if self.directory is None:
+                return
+            
+            files = self._scan()
+            for name in list(self._mtimes):
+                if name not in files:
+                    # File removed; "default" falls back to the built-in template
+                    del self._mtimes[name]
+                    self.errors.pop(name, None)
+                    self.templates.pop(name, None)
+                    if name == DEFAULT_TEMPLATE_NAME:
+                        self.templates[name] = self.builtin
+                    print(f"Notification template '{name}' removed")
+            
+            for name, (path, mtime) in files.items():
+                if self._mtimes.get(name) == mtime:
+                    continue
+                self._mtimes[name] = mtime
+                try:
+                    definition = load_template_file(path, self.builtin.definition)
+                    self.templates[name] = CompiledTemplate(name, definition, source_path=path)
+                except TemplateError as e:
+                    self.errors[name] = str(e)
+                    state = "keeping the previous version" if name in self.templates else "not loaded"
+                    print(f"Invalid notification template '{name}' ({state}): {e}")
+                    continue
+                self.errors.pop(name, None)
+                self.reloads += 1
+    
+    def _scan(self) -> Dict[str, tuple]:
+        """Template files in the directory as name -> (path, mtime)"""
+        files: Dict[str, tuple] = {}
+        try:
+            entries = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return files
+        except OSError as e:
+            print(f"Cannot list notification templates in {self.directory}: {e}")
+            return files
+        for entry in entries:
+            name, extension = os.path.splitext(entry)
+            if extension not in TEMPLATE_FILE_EXTENSIONS or name.startswith("."):
+                continue
+            if name in files:
+                print(f"Ignoring {entry}: another file already defines template '{name}'")
+                continue
+            path = os.path.join(self.directory, entry)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed between listdir and stat
+                continue
+            files[name] = (path, (stat.st_mtime_ns, stat.st_size))
+        return files
+    
+    def stats(self) -> Dict:
+        """Get the loaded templates, their sources and any files that failed to load"""
+        self._maybe_reload()
+        return {
+            "default": self.default_name,
+            "templates": {
+                name: {"source": template.source_path or "built-in", "loaded_at": template.loaded_at}
+                for name, template in sorted(self.templates.items())
+            },
+            "errors": dict(self.errors),
+            "reloads": self.reloads
+        }
@@ -0,0 +1,98 @@
+"""
+Timestamp formatting
+Cached time zones and memoized formatting of PagerDuty timestamps, shared by the app and the CLI
+Pure Python module with no external framework dependencies
+"""
+
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+# Default audience of notification messages
+DEFAULT_TIMEZONE = "US/Eastern"
+
+# Status updates posted to PagerDuty name their zone, as PagerDuty's own templates do
+PAGERDUTY_TIMEZONE = "America/New_York"
+
+# Output styles
+STYLE_NOTIFICATION = "notification"  # 12-September-2025 | 3:28 PM EDT
+STYLE_PAGERDUTY = "pagerduty"        # 09/12/2025 03:28pm (America/New_York)
+STYLE_CLI = "cli"                    # 09/12/2025 03:28 PM EDT
+STYLE_TIMELINE = "timeline"          # 12-Sep-25 | 3:28 PM EDT
+
+# Distinct (timestamp, style, zone) results kept; timelines repeat the same timestamps
+FORMAT_CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=64)
+def get_zone(name: str) -> ZoneInfo:
+    """
+    Get a time zone by IANA name (e.g. "US/Eastern", "UTC", "Europe/London").
+    
+    Raises:
+        ValueError: If the zone is unknown
+    """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"Unknown time zone '{name}': {e}")
+
+
+def parse_timestamp(timestamp: str) -> datetime:
+    """Parse a PagerDuty ISO 8601 timestamp ("2025-09-12T19:28:02Z") into an aware datetime"""
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+
+
+def utc_now() -> str:
+    """Current time as a PagerDuty timestamp, truncated to the minute every style displays"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:00Z')
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def format_timestamp(timestamp: str, style: str = STYLE_NOTIFICATION, tz: str = DEFAULT_TIMEZONE) -> str:
+    """
+    Format a UTC timestamp for display in a time zone.
+    
+    Results are memoized per (timestamp, style, zone): note and status update
+    timelines are re-rendered for every view and batch item, while their
+    timestamps never change.
+    
+    Args:
+        timestamp: ISO 8601 timestamp, e.g. "2025-09-12T19:28:02Z"
+        style: One of STYLE_NOTIFICATION, STYLE_PAGERDUTY, STYLE_CLI, STYLE_TIMELINE
+        tz: IANA time zone name
+    
+    Returns:
+        Formatted local time, e.g. "12-September-2025 | 3:28 PM EDT"
+    
+    Raises:
+        ValueError: If the timestamp, style or zone is invalid
+    """
+    local = parse_timestamp(timestamp).astimezone(get_zone(tz))
+    
+    # Hour without zero padding, e.g. "3:28 PM EDT"
+    hour = local.hour % 12 or 12
+    if style == STYLE_NOTIFICATION:
+        return f"{local.day}-{local.strftime('%B')}-{local.year} | {hour}:{local.minute:02d} {local.strftime('%p')} {local.strftime('%Z')}"
+    if style == STYLE_TIMELINE:
+        return f"{local.day}-{local.strftime('%b-%y')} | {hour}:{local.minute:02d} {local.strftime('%p')} {local.strftime('%Z')}"
+    if style == STYLE_PAGERDUTY:
+        return f"{local.strftime('%m/%d/%Y %I:%M%p').lower()} ({tz})"
+    if style == STYLE_CLI:
+        return local.strftime('%m/%d/%Y %I:%M %p %Z')
+    raise ValueError(f"Unknown timestamp style '{style}'")
+
+
+def cache_stats() -> Dict:
+    """Get hit/miss counters of the formatting memo"""
+    info = format_timestamp.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_ratio": round(info.hits / lookups, 4) if lookups else 0.0
+    }
@@ -0,0 +1,132 @@
+"""
+Alert title normalization
+Strips brand and region prefixes from incident titles with configurable rules and a memo of recent titles
+Pure Python module with no external framework dependencies
+"""
+
+from typing import Dict, Iterable, List
+
+from .cache import TTLCache
+
+
+class PrefixRule:
+    """Drop a fixed number of leading sections from titles of one brand"""
+    
+    def __init__(self, brand: str, sections: int):
+        """
+        Initialize the rule.
+        
+        Args:
+            brand: First title section the rule applies to (case-insensitive)
+            sections: Leading sections to drop, brand included (0 keeps these titles whole)
+        """
+        if sections < 0:
+            raise ValueError(f"Prefix rule for '{brand}' must drop 0 or more sections, got {sections}")
+        self.brand = brand.strip()
+        self.sections = sections
+    
+    def __repr__(self) -> str:
+        return f"PrefixRule({self.brand!r}, {self.sections})"
+
+
+def parse_prefix_rules(spec: str) -> List[PrefixRule]:
+    """
+    Parse prefix rules written as comma-separated "brand=sections" pairs.
+    
+    Args:
+        spec: e.g. "HBO Max=2, Discovery+=1"
+    
+    Raises:
+        ValueError: If a pair is malformed
+    """
+    rules = []
+    for pair in spec.split(','):
+        if not pair.strip():
+            continue
+        brand, separator, sections = pair.rpartition('=')
+        if not separator or not brand.strip():
+            raise ValueError(f"Invalid title prefix rule '{pair.strip()}', expected brand=sections")
+        try:
+            rules.append(PrefixRule(brand, int(sections)))
+        except ValueError as e:
+            raise ValueError(f"Invalid title prefix rule '{pair.strip()}': {e}")
+    return rules
+
+
+class TitleNormalizer:
+    """
+    Turns incident titles like "HBO Max | LATAM | Playback errors" into the alert title
+    quoted in notifications ("Playback errors").
+    
+    Titles are split on `separator`. A brand rule matching the first section decides
+    how many sections to drop; otherwise up to `max_prefix_sections` leading sections
+    are dropped if every one of them has at most `max_prefix_words` words (short
+    brand/region labels), and the title is kept whole if any of them is longer. At
+    least one section is always kept.
+    
+    Results are memoized per raw title, since many incidents share the same title.
+    """
+    
+    def __init__(
+        self,
+        rules: Iterable[PrefixRule] = (),
+        separator: str = '|',
+        max_prefix_words: int = 2,
+        max_prefix_sections: int = 2,
+        cache_size: int = 4096
+    ):
+        """
+        Initialize the normalizer.
+        
+        Args:
+            rules: Brand rules, checked before the word-count heuristic
+            separator: Character separating title sections
+            max_prefix_words: Longest section (in words) treated as a brand/region label
+            max_prefix_sections: Most leading sections the heuristic drops
+            cache_size: Titles memoized
+        """
+        self.rules: Dict[str, PrefixRule] = {rule.brand.casefold(): rule for rule in rules}
+        self.separator = separator
+        self.max_prefix_words = max_prefix_words
+        self.max_prefix_sections = max_prefix_sections
+        # Normalization never changes for a title, the TTL only bounds memory of stale ones
+        self.cache = TTLCache(maxsize=cache_size, ttl=86400)
+    
+    def normalize(self, title: str) -> str:
+        """
+        Get the alert title of an incident title.
+        
+        Args:
+            title: Raw incident title
+        
+        Returns:
+            Title without its brand/region prefix, or the title unchanged if it has none
+        """
+        alert_title = self.cache.get(title)
+        if alert_title is None:
+            alert_title = self._normalize(title)
+            self.cache.set(title, alert_title)
+        return alert_title
+    
+    def _normalize(self, title: str) -> str:
+        parts = [part.strip() for part in title.split(self.separator)]
+        dropped = self._prefix_length(parts)
+        if not dropped:
+            return title
+        return f" {self.separator} ".join(parts[dropped:])
+    
+    def _prefix_length(self, parts: List[str]) -> int:
+        """Number of leading sections that make up the prefix"""
+        # Never drop the last section
+        droppable = len(parts) - 1
+        if droppable <= 0:
+            return 0
+        
+        rule = self.rules.get(parts[0].casefold())
+        if rule is not None:
+            return min(rule.sections, droppable)
+        
+        count = min(self.max_prefix_sections, droppable)
+        if all(len(part.split()) <= self.max_prefix_words for part in parts[:count]):
+            return count
+        return 0
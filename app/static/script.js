@@ -3,8 +3,23 @@
 // Global variable to store incident data for instant updates
 let cachedIncidentData = null;
 
-// Global variable to store notification template
-let notificationTemplate = null;
+// Render context of the loaded incident (server-computed values and template strings) and its ETag
+let renderContext = null;
+let renderContextEtag = null;
+
+// Incremented per render so a slow response never overwrites a newer toggle
+let renderSequence = 0;
+
+// Responders of the loaded incident, kept current by the incident change stream
+let cachedResponders = null;
+
+// Server-Sent Events connection pushing changes of the loaded incident
+let incidentStream = null;
+let incidentStreamState = null;
+
+// Notes and status updates held per incident with the server cursor they were read up to,
+// so a refresh only fetches what was added since
+let incidentTimelines = {};
 
 // DOM Cache for frequently accessed elements
 const DOMCache = {
@@ -328,212 +343,63 @@ function handleContentEditablePaste(event) {
     }
 }
 
-// Function to load notification template
-async function loadNotificationTemplate() {
-    try {
-        const response = await fetch('/api/template');
-        if (response.ok) {
-            notificationTemplate = await response.json();
-        } else {
-            console.warn('Failed to load notification template, using defaults');
-            // Set default template if API fails
-            notificationTemplate = {
-                header_template: "SEV {severity} | {title} | {incident_url}",
-                update_template: "{update_prefix}Update {update_number} | {created_at}",
-                bullet_templates: {
-                    "initial_sro_report": 'SRO US received a report stating "{alert_title}".',
-                    "team_engaged": "The {team_name} team has been engaged to investigate the incident.",
-                    "team_has": "The {team_name} team has",
-                    "downgraded": "The severity of this incident has been downgraded to a SEV {new_severity}.",
-                    "resolved": "This incident is resolved.",
-                    "no_further_updates": "No further updates will be provided for this incident.",
-                    "further_updates_initial": "Further updates will be provided as they become available.",
-                    "further_updates_followup": "Further updates will be provided within 2 hours."
-                },
-                footer_template: "Status Dashboard - {status_dashboard_url}\n\n@here PR",
-                status_prefixes: {
-                    "resolved": "Resolved",
-                    "downgraded": "Downgraded"
-                }
-            };
-        }
-    } catch (error) {
-        console.error('Error loading notification template:', error);
+// Function to load the render context of an incident, revalidating the cached one with its ETag
+async function loadRenderContext(ticketNumber) {
+    const headers = {};
+    if (renderContext && renderContext.ticket_number === ticketNumber && renderContextEtag) {
+        headers['If-None-Match'] = renderContextEtag;
     }
-}
-
-
-// Function to generate notification message locally (client-side)
-function generateNotificationMessageLocally(incidentData, ticketNumber, updateNumber, resolve, downgrade) {
     try {
-        // Ensure template is loaded
-        if (!notificationTemplate) {
-            console.error('Notification template not loaded');
-            return null;
-        }
-        // Extract incident details
-        const title = incidentData.incident.title;
-        const incidentNumber = incidentData.incident.incident_number;
-        const priority = incidentData.incident.priority.name;
-        const escalationPolicy = incidentData.incident.escalation_policy.summary;
-        const severity = priority.slice(-1);
-        
-        // Determine which date to use
-        let createdAt;
-        if (updateNumber === 1) {
-            // Use incident creation date for update 1
-            createdAt = convertUtcToEastern(incidentData.incident.created_at);
-        } else {
-            // Use current date for subsequent updates
-            const now = new Date();
-            const utcString = now.toISOString().replace('Z', '');
-            createdAt = convertUtcToEastern(utcString + 'Z');
-        }
-        
-        // Clean up escalation policy name
-        const trimmedPolicy = escalationPolicy.split(' - ')[0];
-        
-        // Clean up title for the SRO message - logic: remove first two pipe-separated sections if each has 2 or fewer words
-        let alertTitle = title;
-        const parts = title.split('|').map(part => part.trim());
-        
-        if (parts.length >= 3) {
-            // Check if first two parts each have 2 or fewer words
-            const firstPart = parts[0];
-            const secondPart = parts[1];
-            
-            const firstWordCount = firstPart.split(/\s+/).length;
-            const secondWordCount = secondPart.split(/\s+/).length;
-            
-            if (firstWordCount <= 2 && secondWordCount <= 2) {
-                // Remove the first two parts and join the rest
-                alertTitle = parts.slice(2).join(' | ');
-            }
-            // If not both first two parts have ≤2 words, keep the whole title
-        } else if (parts.length === 2) {
-            // Only 2 parts - check if first has 2 or fewer words
-            const firstPart = parts[0];
-            const firstWordCount = firstPart.split(/\s+/).length;
-            
-            if (firstWordCount <= 2) {
-                // Remove the first part
-                alertTitle = parts[1];
-            }
-            // If first part has more than 2 words, keep the whole title
-        }
-        // If only 1 part or no pipes, keep as is
-        
-        // Create notification message using template
-        const bullets = [];
-        
-        if (updateNumber === 1) {
-            bullets.push(notificationTemplate.bullet_templates.initial_sro_report.replace('{alert_title}', alertTitle));
-            bullets.push(notificationTemplate.bullet_templates.team_engaged.replace('{team_name}', trimmedPolicy));
-        } else {
-            bullets.push(notificationTemplate.bullet_templates.team_has.replace('{team_name}', trimmedPolicy));
-        }
-        
-        // Add downgrade bullet if downgrade flag is provided
-        if (downgrade) {
-            bullets.push(notificationTemplate.bullet_templates.downgraded.replace('{new_severity}', parseInt(severity) + 1));
-        }
-        
-        // Add resolve bullet if resolve flag is provided
-        if (resolve) {
-            bullets.push(notificationTemplate.bullet_templates.resolved);
+        const response = await fetch(`/api/incident/${encodeURIComponent(ticketNumber)}/render-context`, {
+            cache: 'no-store',
+            headers
+        });
+        if (response.status === 304) {
+            return renderContext;
         }
-        
-        // Add final bullet based on flags
-        if (resolve || downgrade) {
-            bullets.push(notificationTemplate.bullet_templates.no_further_updates);
-        } else if (updateNumber === 1) {
-            bullets.push(notificationTemplate.bullet_templates.further_updates_initial);
-        } else {
-            bullets.push(notificationTemplate.bullet_templates.further_updates_followup);
+        if (!response.ok) {
+            const result = await response.json().catch(() => ({}));
+            throw new Error(result.detail || `HTTP ${response.status}`);
         }
-        
-        // Create the notification message using template
-        const prefixParts = [];
-        if (resolve) prefixParts.push(notificationTemplate.status_prefixes.resolved);
-        if (downgrade) prefixParts.push(notificationTemplate.status_prefixes.downgraded);
-        
-        const updatePrefix = prefixParts.length > 0 ? prefixParts.join(" | ") + " | " : "";
-        
-        // Format using template
-        const header = notificationTemplate.header_template
-            .replace('{severity}', severity)
-            .replace('{title}', title)
-            .replace('{incident_url}', `https://discoveryinc.pagerduty.com/incidents/${incidentNumber}`);
-        
-        const updateLine = notificationTemplate.update_template
-            .replace('{update_prefix}', updatePrefix)
-            .replace('{update_number}', updateNumber)
-            .replace('{created_at}', createdAt);
-        
-        const footer = notificationTemplate.footer_template
-            .replace('{status_dashboard_url}', 'https://discoveryinc.pagerduty.com/status-dashboard');
-        
-        return `${header}
-
-${updateLine}
-${bullets.map(bullet => `- ${bullet}`).join('\n')}
-
-${footer}`;
-        
+        renderContext = await response.json();
+        renderContextEtag = response.headers.get('ETag');
+        return renderContext;
     } catch (error) {
-        console.error('Error generating notification locally:', error);
-        return null;
+        // Keep rendering from the last context of this incident if the server is unreachable
+        if (renderContext && renderContext.ticket_number === ticketNumber) {
+            console.warn('Using the last render context:', error);
+            return renderContext;
+        }
+        throw error;
     }
 }
 
-// Function to convert UTC to Eastern time (client-side version)
-function convertUtcToEastern(utcDateString) {
-    try {
-        const utcDate = new Date(utcDateString);
-        const easternDate = new Date(utcDate.toLocaleString("en-US", {timeZone: "America/New_York"}));
-        
-        const day = easternDate.getDate();
-        const month = easternDate.toLocaleString('en-US', { month: 'long' });
-        const year = easternDate.getFullYear();
-        
-        let hour = easternDate.getHours();
-        const minute = easternDate.getMinutes();
-        const ampm = hour >= 12 ? 'PM' : 'AM';
-        hour = hour % 12;
-        hour = hour ? hour : 12;
-        const timeStr = `${hour}:${minute.toString().padStart(2, '0')} ${ampm}`;
-        
-        const tzAbbr = easternDate.toLocaleString('en-US', { timeZoneName: 'short' }).split(' ').pop();
-        
-        return `${day}-${month}-${year} | ${timeStr} ${tzAbbr}`;
-    } catch (error) {
-        return `Error converting date: ${error}`;
+// Function to pick a notification message from a render context (the server renders every variant)
+function generateNotificationMessageLocally(context, updateNumber, resolve, downgrade) {
+    // Same key as message_variant_key in pagerduty_client.py
+    const key = (updateNumber === 1 ? 'first' : 'later') + (resolve ? '-resolve' : '') + (downgrade ? '-downgrade' : '');
+    const pieces = context.messages && context.messages[key];
+    if (!pieces) {
+        console.error('Render context has no message for', key);
+        return null;
     }
+    // Later updates are split around their number
+    return pieces.join(String(updateNumber));
 }
 
-// Function to convert UTC to Eastern time with shorter month/year for UI display
-function convertUtcToEasternShort(utcDateString) {
+// Function to render the notification message for the current form values
+// Returns null if a newer render started meanwhile or rendering failed
+async function renderNotificationMessage(ticketNumber, updateNumber, resolve, downgrade) {
+    const sequence = ++renderSequence;
+    let context;
     try {
-        const utcDate = new Date(utcDateString);
-        const easternDate = new Date(utcDate.toLocaleString("en-US", {timeZone: "America/New_York"}));
-        
-        const day = easternDate.getDate();
-        const month = easternDate.toLocaleString('en-US', { month: 'short' });
-        const year = easternDate.getFullYear().toString().slice(-2); // Get last 2 digits of year
-        
-        let hour = easternDate.getHours();
-        const minute = easternDate.getMinutes();
-        const ampm = hour >= 12 ? 'PM' : 'AM';
-        hour = hour % 12;
-        hour = hour ? hour : 12;
-        const timeStr = `${hour}:${minute.toString().padStart(2, '0')} ${ampm}`;
-        
-        const tzAbbr = easternDate.toLocaleString('en-US', { timeZoneName: 'short' }).split(' ').pop();
-        
-        return `${day}-${month}-${year} | ${timeStr} ${tzAbbr}`;
+        context = await loadRenderContext(ticketNumber);
     } catch (error) {
-        return `Error converting date: ${error}`;
+        console.error('Error loading render context:', error);
+        return sequence === renderSequence ? null : undefined;
     }
+    if (sequence !== renderSequence) return undefined;
+    return generateNotificationMessageLocally(context, updateNumber, resolve, downgrade);
 }
 
 // Function to fetch and display responders
@@ -557,7 +423,8 @@ async function fetchAndDisplayResponders(ticketNumber) {
             setTimeout(() => reject(new Error('Request timeout')), 30000) // 30 second timeout
         );
         
-        const fetchPromise = fetch(`/api/incident/${ticketNumber}?t=${cacheBuster}`, {
+        // The responders endpoint resolves the incident and its responders in one request
+        const fetchPromise = fetch(`/api/incident/${encodeURIComponent(ticketNumber)}/responders?t=${cacheBuster}`, {
             cache: 'no-cache',
             headers: {
                 'Cache-Control': 'no-cache'
@@ -567,35 +434,9 @@ async function fetchAndDisplayResponders(ticketNumber) {
         const response = await Promise.race([fetchPromise, timeoutPromise]);
         
         if (response.ok) {
-            const incidentData = await response.json();
-            const respondersResponse = await fetch('/api/generate', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'Cache-Control': 'no-cache'
-                },
-                body: JSON.stringify({
-                    ticket_number: ticketNumber,
-                    update_number: 1,
-                    resolve: false,
-                    downgrade: false,
-                    show_users: true
-                }),
-                cache: 'no-cache'
-            });
-            
-            if (respondersResponse.ok) {
-                const result = await respondersResponse.json();
-                if (result.responders && result.responders.length > 0) {
-                    displayResponders(result.responders);
-                } else {
-                    const noRespondersMsg = '<div class="text-center text-gray-500 italic py-8"><p>No responders found for this incident</p></div>';
-                    updateResponderContainers(noRespondersMsg);
-                }
-            } else {
-                const errorMsg = '<div class="text-center text-gray-500 italic py-8"><p>Error loading responders</p></div>';
-                updateResponderContainers(errorMsg);
-            }
+            const result = await response.json();
+            cachedResponders = result.responders || [];
+            showResponders(cachedResponders);
         } else {
             const notFoundMsg = '<div class="text-center text-gray-500 italic py-8"><p>Incident not found</p></div>';
             updateResponderContainers(notFoundMsg);
@@ -607,45 +448,6 @@ async function fetchAndDisplayResponders(ticketNumber) {
     }
 }
 
-// Function to get trimmed policy name (matches pagerduty_client.py logic)
-function getTrimmedPolicyName(policyName) {
-    if (policyName && policyName.includes(' - ')) {
-        return policyName.split(' - ')[0];
-    }
-    return policyName;
-}
-
-// Function to find matching escalation policy color for a team name
-function findMatchingEscalationPolicyColor(teamName, escalationPolicyColors) {
-    const trimmedTeam = getTrimmedPolicyName(teamName);
-    
-    // Check for exact match with trimmed team name
-    if (trimmedTeam in escalationPolicyColors) {
-        return escalationPolicyColors[trimmedTeam];
-    }
-    
-    // Check if the trimmed team name matches any trimmed escalation policy name
-    for (const [policyName, color] of Object.entries(escalationPolicyColors)) {
-        const trimmedPolicy = getTrimmedPolicyName(policyName);
-        if (trimmedTeam === trimmedPolicy) {
-            return color;
-        }
-    }
-    
-    return null;
-}
-
-// Function to extract escalation policy colors from responders data
-function extractEscalationPolicyColors(responders) {
-    const colors = {};
-    responders.forEach(responder => {
-        if (responder.team_name && responder.color) {
-            colors[responder.team_name] = responder.color;
-        }
-    });
-    return colors;
-}
-
 // Function to clear responders section
 function clearResponders() {
     const loadingMsg = '<div class="text-center text-gray-500 italic py-8"><div class="spinner"></div><p class="mt-2">Loading responders...</p></div>';
@@ -673,9 +475,6 @@ function displayResponders(responders) {
         return 0;
     });
     
-    // Extract escalation policy colors for matching
-    const escalationPolicyColors = extractEscalationPolicyColors(sortedResponders);
-    
     sortedResponders.forEach(responder => {
         html += '<div class="mb-6">';
         
@@ -781,17 +580,10 @@ function displayResponders(responders) {
                 responder.teams.forEach(teamData => {
                     // Handle both old format (string) and new format (object with team and color)
                     if (typeof teamData === 'string') {
-                        // Check if this team matches any escalation policy color
-                        const matchingColor = findMatchingEscalationPolicyColor(teamData, escalationPolicyColors);
-                        if (matchingColor) {
-                            html += `<li class="font-medium rounded transition-all duration-200 list-none my-1.5 pl-2 hover:translate-x-0.5 hover:shadow-sm text-gray-700 text-sm py-0.5" style="background-color: ${matchingColor}; border-left: 3px solid ${adjustColorBrightness(matchingColor, -20)}; padding: 4px 8px; margin: 2px 0; border-radius: 4px;">• ${teamData}</li>`;
-                        } else {
-                            html += `<li class="bg-gray-50 border-l-3 border-gray-300 px-2 py-1 my-0.5 rounded text-gray-600 font-medium rounded transition-all duration-200 list-none hover:translate-x-0.5 hover:shadow-sm text-sm">• ${teamData}</li>`;
-                        }
+                        html += `<li class="bg-gray-50 border-l-3 border-gray-300 px-2 py-1 my-0.5 rounded text-gray-600 font-medium rounded transition-all duration-200 list-none hover:translate-x-0.5 hover:shadow-sm text-sm">• ${teamData}</li>`;
                     } else {
-                        // Check if this team matches any escalation policy color (override existing color if match found)
-                        const matchingColor = findMatchingEscalationPolicyColor(teamData.team, escalationPolicyColors);
-                        const finalColor = matchingColor || teamData.color;
+                        // The server colors teams that match one of the incident's escalation policies
+                        const finalColor = teamData.color;
                         if (finalColor) {
                             html += `<li class="font-medium rounded transition-all duration-200 list-none my-1.5 pl-2 hover:translate-x-0.5 hover:shadow-sm text-gray-700 text-sm py-0.5" style="background-color: ${finalColor}; border-left: 3px solid ${adjustColorBrightness(finalColor, -20)}; padding: 4px 8px; margin: 2px 0; border-radius: 4px;">• ${teamData.team}</li>`;
                         } else {
@@ -880,6 +672,198 @@ function positionTooltipForViewport(element) {
     }
 }
 
+// Function to render responders or the "no responders" placeholder
+function showResponders(responders) {
+    if (responders && responders.length > 0) {
+        displayResponders(responders);
+    } else {
+        const noRespondersMsg = '<div class="text-center text-gray-500 italic py-8"><p>No responders found for this incident</p></div>';
+        updateResponderContainers(noRespondersMsg);
+    }
+}
+
+// Function to check whether the change stream of an incident is connected
+function isIncidentStreamOpen(incidentId) {
+    return incidentStream !== null &&
+        incidentStreamState !== null &&
+        incidentStreamState.incidentId === incidentId &&
+        incidentStream.readyState === EventSource.OPEN;
+}
+
+// Function to stop listening for incident changes
+function closeIncidentStream() {
+    if (incidentStream) {
+        incidentStream.close();
+    }
+    incidentStream = null;
+    incidentStreamState = null;
+}
+
+// Function to apply a changed incident (status, assignments, responders...) pushed by the server
+function applyIncidentChange(incidentData, responders) {
+    if (!incidentData) return;
+    cachedIncidentData = incidentData;
+    updateIncidentInfo(incidentData);
+    updateNotificationIfLoaded();
+    if (Array.isArray(responders)) {
+        cachedResponders = responders;
+        showResponders(responders);
+    }
+}
+
+// Function to subscribe to server-pushed changes of the loaded incident
+// initial: { incidentData, notes, statusUpdates } as already rendered from the bundle
+function openIncidentStream(incidentId, initial) {
+    closeIncidentStream();
+    if (!incidentId || !window.EventSource) return;
+    
+    const state = {
+        incidentId: incidentId,
+        updatedAt: initial.incidentData ? initial.incidentData.incident.updated_at : null,
+        notes: [...(initial.notes || [])],
+        statusUpdates: [...(initial.statusUpdates || [])]
+    };
+    const source = new EventSource(`/api/incident/${encodeURIComponent(incidentId)}/stream`);
+    incidentStream = source;
+    incidentStreamState = state;
+    
+    const parse = (event) => {
+        // Ignore events from a stream that was replaced in the meantime
+        if (incidentStream !== source) return null;
+        return JSON.parse(event.data);
+    };
+    const sameIds = (a, b) => a.length === b.length && a.every(item => b.some(other => other.id === item.id));
+    const renderTrail = () => loadStatusUpdatesTrail(incidentId, {
+        statusUpdates: [...state.statusUpdates],
+        notes: [...state.notes]
+    });
+    
+    // Full state, sent on connect and on every reconnect; only re-render what differs
+    source.addEventListener('snapshot', (event) => {
+        const data = parse(event);
+        if (!data) return;
+        const incident = data.incident_data ? data.incident_data.incident : null;
+        if (incident && incident.updated_at !== state.updatedAt) {
+            state.updatedAt = incident.updated_at;
+            applyIncidentChange(data.incident_data, data.responders);
+        }
+        const notes = data.notes || [];
+        const statusUpdates = data.status_updates || [];
+        if (!sameIds(notes, state.notes) || !sameIds(statusUpdates, state.statusUpdates)) {
+            state.notes = notes;
+            state.statusUpdates = statusUpdates;
+            renderTrail();
+        }
+    });
+    
+    source.addEventListener('incident', (event) => {
+        const data = parse(event);
+        if (!data) return;
+        state.updatedAt = data.incident_data.incident.updated_at;
+        applyIncidentChange(data.incident_data, data.responders);
+    });
+    
+    source.addEventListener('notes', (event) => {
+        const data = parse(event);
+        if (!data) return;
+        state.notes.push(...data.added);
+        loadIncidentNotes(incidentId, [...state.notes]);
+    });
+    
+    source.addEventListener('status_updates', (event) => {
+        const data = parse(event);
+        if (!data) return;
+        state.statusUpdates.push(...data.added);
+        renderTrail();
+    });
+    
+    source.onerror = () => {
+        // EventSource reconnects on its own and the server resends a snapshot
+        console.warn('Incident change stream interrupted, reconnecting...');
+    };
+}
+
+// Key identifying one Slack message, so a double click or a retry does not post it twice
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+// Follow a queued Slack delivery until it is sent or failed
+function followSlackDelivery(deliveryId, onStatus) {
+    const url = `/api/slack/deliveries/${encodeURIComponent(deliveryId)}`;
+    return new Promise((resolve) => {
+        const handle = (delivery) => {
+            onStatus(delivery);
+            if (delivery.status === 'sent' || delivery.status === 'failed') {
+                resolve(delivery);
+                return true;
+            }
+            return false;
+        };
+        const poll = async () => {
+            try {
+                const response = await fetch(url);
+                if (response.status === 404) {
+                    resolve({ status: 'failed', error: 'Slack delivery not found' });
+                    return;
+                }
+                if (response.ok && handle(await response.json())) return;
+            } catch (err) {
+                console.warn('Slack delivery status check failed:', err);
+            }
+            setTimeout(poll, 1000);
+        };
+        
+        if (!window.EventSource) {
+            poll();
+            return;
+        }
+        const source = new EventSource(`${url}/stream`);
+        source.addEventListener('status', (event) => {
+            if (handle(JSON.parse(event.data))) source.close();
+        });
+        source.onerror = () => {
+            // Fall back to polling rather than reconnecting the stream
+            source.close();
+            poll();
+        };
+    });
+}
+
+// Incident the write buttons act on: the loaded incident's ID, or the ticket number as
+// typed (the server resolves numbers to IDs from its incident index)
+function getCurrentIncidentId(ticketNumber) {
+    if (cachedIncidentData && cachedIncidentData.incident && cachedIncidentData.incident.id) {
+        return cachedIncidentData.incident.id;
+    }
+    return ticketNumber.trim();
+}
+
+// Wait for a write queued in the server's outbox (or, with basePath, a note written
+// in the background after a status update) to reach PagerDuty
+async function followOutboxItem(itemId, timeoutMs = 60000, basePath = '/api/outbox') {
+    const url = `${basePath}/${encodeURIComponent(itemId)}`;
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+        try {
+            const response = await fetch(url);
+            if (response.status === 404) {
+                return { status: 'failed', last_error: 'Queued write not found' };
+            }
+            if (response.ok) {
+                const item = await response.json();
+                if (item.status === 'sent' || item.status === 'failed') return item;
+            }
+        } catch (err) {
+            console.warn('Outbox status check failed:', err);
+        }
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+    // Still retrying; the server keeps the write and will deliver it
+    return { status: 'pending' };
+}
+
 // Event listeners will be attached in DOMContentLoaded
 
 // Track the last ticket number to detect changes
@@ -1035,6 +1019,12 @@ function addCopyButton(resultDiv, text) {
             // Get the current content from the editable result div, preserving line breaks
             const currentContent = getFormattedTextContent(resultDiv);
             
+            // Same content, same key: the server hands back the earlier delivery instead of posting again
+            if (slackButton.dataset.sentContent !== currentContent) {
+                slackButton.dataset.sentContent = currentContent;
+                slackButton.dataset.idempotencyKey = newIdempotencyKey();
+            }
+            
             // Add timeout to prevent infinite loading
             const timeoutPromise = new Promise((_, reject) => 
                 setTimeout(() => reject(new Error('Request timeout')), 30000) // 30 second timeout
@@ -1045,14 +1035,29 @@ function addCopyButton(resultDiv, text) {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ message: currentContent })
+                body: JSON.stringify({
+                    message: currentContent,
+                    idempotency_key: slackButton.dataset.idempotencyKey
+                })
             });
             
             const response = await Promise.race([fetchPromise, timeoutPromise]);
             
             const result = await response.json();
+            if (!response.ok) {
+                throw new Error(result.detail || 'Failed to Peer Review');
+            }
             
-            if (response.ok) {
+            // The message is queued; wait for Slack to accept it
+            const delivery = await followSlackDelivery(result.delivery_id, (status) => {
+                if (status.status === 'queued') {
+                    slackButton.textContent = '⏳ Queued...';
+                } else if (status.status === 'retrying') {
+                    slackButton.textContent = '⏳ Slack busy, retrying...';
+                }
+            });
+            
+            if (delivery.status === 'sent') {
                 slackButton.innerHTML = '✅ Sent to Slack!';
                 slackButton.style.background = '#28a745';
                 setTimeout(() => {
@@ -1061,7 +1066,7 @@ function addCopyButton(resultDiv, text) {
                     slackButton.disabled = false;
                 }, 3000);
             } else {
-                throw new Error(result.detail || 'Failed to Peer Review');
+                throw new Error(delivery.error || 'Failed to Peer Review');
             }
         } catch (err) {
             slackButton.innerHTML = '❌ Failed to Send';
@@ -1125,11 +1130,7 @@ function addCopyButton(resultDiv, text) {
                 throw new Error('Please enter a ticket number first');
             }
             
-            // Get the incident ID from cached incident data
-            if (!cachedIncidentData || !cachedIncidentData.incident || !cachedIncidentData.incident.id) {
-                throw new Error('Incident data not available. Please refresh the data first.');
-            }
-            const incidentId = cachedIncidentData.incident.id;
+            const incidentId = getCurrentIncidentId(ticketNumber);
             
             // Add timeout to prevent infinite loading
             const timeoutPromise = new Promise((_, reject) => 
@@ -1150,9 +1151,19 @@ function addCopyButton(resultDiv, text) {
             const response = await Promise.race([fetchPromise, timeoutPromise]);
             const result = await response.json();
             
+            if (response.ok && result.success && result.queued) {
+                // Accepted by the server; wait for PagerDuty to take it
+                const item = await followOutboxItem(result.outbox_id);
+                if (item.status === 'failed') {
+                    throw new Error(item.last_error || 'PagerDuty rejected the request');
+                }
+            }
+            
             if (response.ok && result.success) {
-                // Refresh the status updates trail
-                loadStatusUpdatesTrail(incidentId);
+                // Refresh the status updates trail (the change stream pushes it when connected)
+                if (!isIncidentStreamOpen(incidentId)) {
+                    loadStatusUpdatesTrail(incidentId);
+                }
                 
                 pagerdutyAckButton.textContent = '✔️ Ack Sent!';
                 pagerdutyAckButton.style.background = '#28a745';
@@ -1237,11 +1248,7 @@ function addCopyButton(resultDiv, text) {
                 throw new Error('Please enter a ticket number first');
             }
             
-            // Get the incident ID from cached incident data
-            if (!cachedIncidentData || !cachedIncidentData.incident || !cachedIncidentData.incident.id) {
-                throw new Error('Incident data not available. Please refresh the data first.');
-            }
-            const incidentId = cachedIncidentData.incident.id;
+            const incidentId = getCurrentIncidentId(ticketNumber);
             
             // Determine status based on form inputs
             const resolveChecked = document.getElementById('resolve').checked;
@@ -1276,9 +1283,19 @@ function addCopyButton(resultDiv, text) {
             const response = await Promise.race([fetchPromise, timeoutPromise]);
             const result = await response.json();
             
+            if (response.ok && result.success && result.queued) {
+                // Accepted by the server; wait for PagerDuty to take it
+                const item = await followOutboxItem(result.outbox_id);
+                if (item.status === 'failed') {
+                    throw new Error(item.last_error || 'PagerDuty rejected the request');
+                }
+            }
+            
             if (response.ok && result.success) {
-                // Refresh the status updates trail
-                loadStatusUpdatesTrail(incidentId);
+                // Refresh the status updates trail (the change stream pushes it when connected)
+                if (!isIncidentStreamOpen(incidentId)) {
+                    loadStatusUpdatesTrail(incidentId);
+                }
                 
                 pagerdutyAddNoteButton.textContent = '✅ Note Added!';
                 pagerdutyAddNoteButton.style.background = '#28a745';
@@ -1358,11 +1375,7 @@ function addCopyButton(resultDiv, text) {
                 throw new Error('Please enter a ticket number first');
             }
             
-            // Get the incident ID from cached incident data
-            if (!cachedIncidentData || !cachedIncidentData.incident || !cachedIncidentData.incident.id) {
-                throw new Error('Incident data not available. Please refresh the data first.');
-            }
-            const incidentId = cachedIncidentData.incident.id;
+            const incidentId = getCurrentIncidentId(ticketNumber);
             
             // Determine status based on form inputs
             const resolveChecked = document.getElementById('resolve').checked;
@@ -1398,6 +1411,16 @@ function addCopyButton(resultDiv, text) {
             const response = await Promise.race([fetchPromise, timeoutPromise]);
             const result = await response.json();
             
+            let noteResult = result.note_result;
+            if (response.ok && result.success && result.queued) {
+                // Accepted by the server; wait for PagerDuty to take it
+                const item = await followOutboxItem(result.outbox_id);
+                if (item.status === 'failed') {
+                    throw new Error(item.last_error || 'PagerDuty rejected the request');
+                }
+                noteResult = item.result && item.result.note_result;
+            }
+            
             if (response.ok && result.success) {
                 // Increment the update number by 1
                 const updateNumberInput = document.getElementById('update_number');
@@ -1409,6 +1432,19 @@ function addCopyButton(resultDiv, text) {
                 
                 statusUpdateButton.textContent = '✅ Status Update Sent!';
                 statusUpdateButton.style.background = '#28a745';
+                
+                // The note is written after the status update lands; report it if it does not make it
+                if (noteResult && noteResult.queued && (noteResult.write_id || noteResult.outbox_id)) {
+                    const follow = noteResult.write_id
+                        ? followOutboxItem(noteResult.write_id, 60000, '/api/note-writes')
+                        : followOutboxItem(noteResult.outbox_id);
+                    follow.then((item) => {
+                        if (item.status === 'failed') {
+                            console.error('Status update note failed:', item.last_error);
+                            alert(`The status update was sent, but adding its note failed: ${item.last_error || 'unknown error'}`);
+                        }
+                    });
+                }
                 setTimeout(() => {
                     statusUpdateButton.textContent = '📢 Send Status Update';
                     statusUpdateButton.style.background = 'linear-gradient(135deg, #FF6B35 0%, #F7931E 100%)';
@@ -1416,9 +1452,12 @@ function addCopyButton(resultDiv, text) {
                 }, 3000);
                 
                 // Refresh the status updates trail after a short delay to allow success state to be visible
-                setTimeout(() => {
-                    loadStatusUpdatesTrail(incidentId);
-                }, 1000);
+                // (the change stream pushes the new status update when connected)
+                if (!isIncidentStreamOpen(incidentId)) {
+                    setTimeout(() => {
+                        loadStatusUpdatesTrail(incidentId);
+                    }, 1000);
+                }
             } else {
                 throw new Error(result.message || result.error || 'Failed to send status update');
             }
@@ -1447,7 +1486,8 @@ function addCopyButton(resultDiv, text) {
 let statusUpdateTimer = null;
 
 // Function to load and display incident notes
-async function loadIncidentNotes(incidentId) {
+// preloadedNotes: notes already returned by the incident bundle (skips the fetch)
+async function loadIncidentNotes(incidentId, preloadedNotes = null) {
     console.log('loadIncidentNotes called with incidentId:', incidentId);
     const incidentNotesList = document.getElementById('incident-notes-list');
     const noIncidentNotes = document.getElementById('no-incident-notes');
@@ -1460,64 +1500,47 @@ async function loadIncidentNotes(incidentId) {
     incidentNotesList.innerHTML = '<div class="text-center text-gray-500 italic py-8"><div class="spinner"></div>Loading incident notes...</div>';
     
     try {
-        console.log('Fetching incident notes from API for incident:', incidentId);
-        // Add cache-busting parameter to prevent browser caching
-        const cacheBuster = new Date().getTime();
-        
-        // Add timeout to prevent infinite loading
-        const timeoutPromise = new Promise((_, reject) => 
-            setTimeout(() => reject(new Error('Request timeout')), 30000) // 30 second timeout
-        );
-        
-        const fetchPromise = fetch(`/api/incident/${incidentId}/notes?t=${cacheBuster}`, {
-            cache: 'no-cache',
-            headers: {
-                'Cache-Control': 'no-cache'
-            }
-        });
+        let notes;
+        if (Array.isArray(preloadedNotes)) {
+            notes = preloadedNotes;
+        } else {
+            console.log('Fetching new incident notes from API for incident:', incidentId);
+            notes = await fetchIncidentTimeline(incidentId, 'notes');
+        }
+        console.log('Received incident notes:', notes.length, 'notes');
         
-        const response = await Promise.race([fetchPromise, timeoutPromise]);
-        console.log('Incident notes API response status:', response.status);
-        if (response.ok) {
-            const data = await response.json();
-            const notes = data.notes || [];
-            console.log('Received incident notes:', notes.length, 'notes');
+        if (notes.length === 0) {
+            noIncidentNotes.classList.remove('hidden');
+            incidentNotesList.innerHTML = '';
+        } else {
+            noIncidentNotes.classList.add('hidden');
             
-            if (notes.length === 0) {
-                noIncidentNotes.classList.remove('hidden');
-                incidentNotesList.innerHTML = '';
-            } else {
-                noIncidentNotes.classList.add('hidden');
-                
-                // Sort by creation time (most recent first)
-                notes.sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+            // Sort by creation time (most recent first)
+            notes.sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+            
+            // Display incident notes
+            incidentNotesList.innerHTML = notes.map(note => {
+                const createdAt = note.created_at_display || note.created_at;
+                const userName = note.user ? note.user.summary : 'Unknown User';
+                const content = note.content || 'No content';
                 
-                // Display incident notes
-                incidentNotesList.innerHTML = notes.map(note => {
-                    const createdAt = convertUtcToEasternShort(note.created_at);
-                    const userName = note.user ? note.user.summary : 'Unknown User';
-                    const content = note.content || 'No content';
-                    
-                    return `
-                        <div class="incident-note-container bg-white border border-gray-200 rounded-lg p-4 shadow-sm">
-                            <div class="flex items-start justify-between mb-2">
-                                <div class="flex items-center space-x-2">
-                                    <span class="inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium bg-green-100 text-green-800">
-                                        Note
-                                    </span>
-                                    <span class="text-sm text-gray-500">by ${userName}</span>
-                                </div>
-                                <span class="text-sm text-gray-500">${createdAt}</span>
+                return `
+                    <div class="incident-note-container bg-white border border-gray-200 rounded-lg p-4 shadow-sm">
+                        <div class="flex items-start justify-between mb-2">
+                            <div class="flex items-center space-x-2">
+                                <span class="inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium bg-green-100 text-green-800">
+                                    Note
+                                </span>
+                                <span class="text-sm text-gray-500">by ${userName}</span>
                             </div>
-                            <div class="incident-note-content text-sm text-gray-700">${content}</div>
+                            <span class="text-sm text-gray-500">${createdAt}</span>
                         </div>
-                    `;
-                }).join('');
-                
-                console.log('Incident notes refreshed successfully');
-            }
-        } else {
-            throw new Error(`Failed to fetch incident notes: ${response.status}`);
+                        <div class="incident-note-content text-sm text-gray-700">${content}</div>
+                    </div>
+                `;
+            }).join('');
+            
+            console.log('Incident notes refreshed successfully');
         }
     } catch (error) {
         console.error('Error loading incident notes:', error);
@@ -1527,7 +1550,7 @@ async function loadIncidentNotes(incidentId) {
 }
 
 // Function to generate and show notification message after status updates are loaded
-function generateAndShowNotificationMessage() {
+async function generateAndShowNotificationMessage() {
     if (!DOMCache.notificationMessage || !cachedIncidentData) return;
     
     // Get current form values
@@ -1536,14 +1559,9 @@ function generateAndShowNotificationMessage() {
     const resolve = DOMCache.resolveCheckbox.checked;
     const downgrade = DOMCache.downgradeCheckbox.checked;
     
-    // Generate notification message locally with the correct update number
-    const notificationMessage = generateNotificationMessageLocally(
-        cachedIncidentData, 
-        ticketNumber, 
-        updateNumber, 
-        resolve, 
-        downgrade
-    );
+    // Render from the server's render context with the correct update number
+    const notificationMessage = await renderNotificationMessage(ticketNumber, updateNumber, resolve, downgrade);
+    if (notificationMessage === undefined) return;
     
     if (notificationMessage) {
         // Show the notification message
@@ -1562,7 +1580,8 @@ function generateAndShowNotificationMessage() {
 }
 
 // Function to load and display status updates trail
-async function loadStatusUpdatesTrail(incidentId) {
+// preloaded: optional { statusUpdates, notes } already returned by the incident bundle
+async function loadStatusUpdatesTrail(incidentId, preloaded = null) {
     console.log('loadStatusUpdatesTrail called with incidentId:', incidentId);
     const statusUpdatesTrail = document.getElementById('status-updates-trail');
     const statusUpdatesDivider = document.getElementById('status-updates-divider');
@@ -1596,8 +1615,8 @@ async function loadStatusUpdatesTrail(incidentId) {
     
     // Load both status updates and incident notes in parallel
     const [statusUpdatesPromise, incidentNotesPromise] = await Promise.allSettled([
-        loadStatusUpdates(incidentId),
-        loadIncidentNotes(incidentId)
+        loadStatusUpdates(incidentId, preloaded ? preloaded.statusUpdates : null),
+        loadIncidentNotes(incidentId, preloaded ? preloaded.notes : null)
     ]);
     
     // Handle status updates result
@@ -1625,7 +1644,7 @@ async function loadStatusUpdatesTrail(incidentId) {
             
             // Display status updates
             statusUpdatesList.innerHTML = statusUpdates.map(update => {
-                const createdAt = convertUtcToEasternShort(update.created_at);
+                const createdAt = update.created_at_display || update.created_at;
                 const userName = update.sender ? update.sender.summary : 'Unknown User';
                 const message = update.message || 'No message';
                 
@@ -1697,17 +1716,46 @@ async function loadStatusUpdatesTrail(incidentId) {
 }
 
 // Helper function to load status updates
-async function loadStatusUpdates(incidentId) {
-    console.log('Fetching status updates from API for incident:', incidentId);
+async function loadStatusUpdates(incidentId, preloadedStatusUpdates = null) {
+    if (Array.isArray(preloadedStatusUpdates)) {
+        return preloadedStatusUpdates;
+    }
+    
+    console.log('Fetching new status updates from API for incident:', incidentId);
+    const statusUpdates = await fetchIncidentTimeline(incidentId, 'status-updates');
+    console.log('Received status updates:', statusUpdates.length, 'updates');
+    return statusUpdates;
+}
+
+// Response key of each timeline endpoint
+const TIMELINE_KEYS = { 'notes': 'notes', 'status-updates': 'status_updates' };
+
+// Remember notes or status updates read in full (e.g. from the incident bundle) and their cursor
+function seedIncidentTimeline(incidentId, kind, items, cursor) {
+    if (!Array.isArray(items) || !cursor) return;
+    incidentTimelines[`${incidentId}/${kind}`] = {
+        items: new Map(items.map(item => [item.id, item])),
+        cursor: cursor
+    };
+}
+
+// Fetch the notes or status updates added since the last read and return the full list
+async function fetchIncidentTimeline(incidentId, kind) {
+    const key = `${incidentId}/${kind}`;
+    let timeline = incidentTimelines[key];
+    
     // Add cache-busting parameter to prevent browser caching
-    const cacheBuster = new Date().getTime();
+    const params = new URLSearchParams({ t: new Date().getTime() });
+    if (timeline) {
+        params.set('since', timeline.cursor);
+    }
     
     // Add timeout to prevent infinite loading
     const timeoutPromise = new Promise((_, reject) => 
         setTimeout(() => reject(new Error('Request timeout')), 30000) // 30 second timeout
     );
     
-    const fetchPromise = fetch(`/api/incident/${incidentId}/status-updates?t=${cacheBuster}`, {
+    const fetchPromise = fetch(`/api/incident/${incidentId}/${kind}?${params}`, {
         cache: 'no-cache',
         headers: {
             'Cache-Control': 'no-cache'
@@ -1715,15 +1763,22 @@ async function loadStatusUpdates(incidentId) {
     });
     
     const response = await Promise.race([fetchPromise, timeoutPromise]);
-    console.log('Status updates API response status:', response.status);
-    if (response.ok) {
-        const data = await response.json();
-        const statusUpdates = data.status_updates || [];
-        console.log('Received status updates:', statusUpdates.length, 'updates');
-        return statusUpdates;
-    } else {
-        throw new Error(`Failed to fetch status updates: ${response.status}`);
+    console.log(`Incident ${kind} API response status:`, response.status);
+    if (!response.ok) {
+        throw new Error(`Failed to fetch incident ${kind}: ${response.status}`);
     }
+    const data = await response.json();
+    
+    // A reset means the server no longer knows the cursor and sent everything
+    if (!timeline || data.reset) {
+        timeline = { items: new Map(), cursor: null };
+        incidentTimelines[key] = timeline;
+    }
+    for (const item of data[TIMELINE_KEYS[kind]] || []) {
+        timeline.items.set(item.id, item);
+    }
+    timeline.cursor = data.cursor;
+    return [...timeline.items.values()];
 }
 
 // Function to start the status update timer
@@ -1788,7 +1843,11 @@ function resetToOriginalState() {
     
     // Clear cached data
     cachedIncidentData = null;
+    cachedResponders = null;
+    renderContext = null;
+    renderContextEtag = null;
     lastTicketNumber = null;
+    closeIncidentStream();
     
     // Hide incident info section
     const incidentInfoSection = document.getElementById('incident-info-section');
@@ -1841,8 +1900,8 @@ function resetToOriginalState() {
     
 }
 
-// Function to update notification if one is already loaded (instant, no API calls)
-function updateNotificationIfLoaded() {
+// Function to update notification if one is already loaded (revalidates the render context, usually a 304)
+async function updateNotificationIfLoaded() {
     const resultContainer = document.getElementById('result-container');
     const resultDiv = document.getElementById('notification-message');
     
@@ -1855,14 +1914,7 @@ function updateNotificationIfLoaded() {
         const resolve = document.getElementById('resolve').checked;
         const downgrade = document.getElementById('downgrade').checked;
         
-        // Generate notification message locally (instant)
-        const newNotificationMessage = generateNotificationMessageLocally(
-            cachedIncidentData, 
-            ticketNumber, 
-            updateNumber, 
-            resolve, 
-            downgrade
-        );
+        const newNotificationMessage = await renderNotificationMessage(ticketNumber, updateNumber, resolve, downgrade);
         
         if (newNotificationMessage) {
             resultDiv.innerHTML = newNotificationMessage.replace(/\n/g, '<br>');
@@ -1883,9 +1935,6 @@ document.addEventListener('DOMContentLoaded', function() {
         DOMCache.updateNumberInput.disabled = true;
     }
     
-    // Load notification template first
-    loadNotificationTemplate();
-    
     // Add event listener for ticket number input
     DOMCache.ticketNumberInput.addEventListener('input', function(e) {
         const ticketNumber = e.target.value.trim();
@@ -1893,7 +1942,9 @@ document.addEventListener('DOMContentLoaded', function() {
         // Clear cached data when ticket number changes
         if (lastTicketNumber !== ticketNumber) {
             cachedIncidentData = null;
+            cachedResponders = null;
             lastTicketNumber = ticketNumber;
+            closeIncidentStream();
         }
         
         if (ticketNumber.length > 0) {
@@ -2027,13 +2078,11 @@ document.addEventListener('DOMContentLoaded', function() {
                     setTimeout(() => reject(new Error('Request timeout')), 30000) // 30 second timeout
                 );
                 
-                const fetchPromise = fetch('/api/generate', {
-                    method: 'POST',
+                // One bundled request returns the incident, responders, notes and status updates
+                const fetchPromise = fetch(`/api/incident/${encodeURIComponent(data.ticket_number)}/bundle`, {
                     headers: {
-                        'Content-Type': 'application/json',
                         'Cache-Control': 'no-cache'
                     },
-                    body: JSON.stringify(data),
                     cache: 'no-cache'
                 });
                 
@@ -2060,17 +2109,27 @@ document.addEventListener('DOMContentLoaded', function() {
                     resultContainer.classList.remove('hidden');
                     welcomeMessage.classList.add('hidden');
                     
+                    // Later refreshes only fetch what was added after the bundle
+                    const cursors = result.cursors || {};
+                    seedIncidentTimeline(result.incident_data.incident.id, 'notes', result.notes, cursors.notes);
+                    seedIncidentTimeline(result.incident_data.incident.id, 'status-updates', result.status_updates, cursors.status_updates);
+                    
                     // Load status updates trail first, then show notification message
-                    loadStatusUpdatesTrail(result.incident_data.incident.id);
+                    loadStatusUpdatesTrail(result.incident_data.incident.id, {
+                        statusUpdates: result.status_updates,
+                        notes: result.notes
+                    });
                     
                     // Display responders if available
-                    if (result.responders && result.responders.length > 0) {
-                        displayResponders(result.responders);
-                    } else {
-                        // No responders found, show appropriate message
-                        const noRespondersMsg = '<div class="text-center text-gray-500 italic py-8"><p>No responders found for this incident</p></div>';
-                        updateResponderContainers(noRespondersMsg);
-                    }
+                    cachedResponders = result.responders || [];
+                    showResponders(cachedResponders);
+                    
+                    // Keep everything current from server-pushed changes instead of re-fetching
+                    openIncidentStream(result.incident_data.incident.id, {
+                        incidentData: result.incident_data,
+                        notes: result.notes,
+                        statusUpdates: result.status_updates
+                    });
                 } else {
                     resultDiv.className = 'min-h-[200px] p-4 border border-red-300 rounded-md bg-red-50 text-red-700 error';
                     resultDiv.textContent = 'Error: ' + result.detail;
@@ -2093,8 +2152,7 @@ document.addEventListener('DOMContentLoaded', function() {
             resultContainer.classList.remove('hidden');
             welcomeMessage.classList.add('hidden');
             
-            const newNotificationMessage = generateNotificationMessageLocally(
-                cachedIncidentData, 
+            const newNotificationMessage = await renderNotificationMessage(
                 data.ticket_number, 
                 data.update_number, 
                 data.resolve, 
@@ -2110,8 +2168,10 @@ document.addEventListener('DOMContentLoaded', function() {
                 addCopyButton(resultDiv, newNotificationMessage);
             }
             
-            // For cached data, we need to fetch responders separately since they're not cached
-            if (data.ticket_number) {
+            // Responders are kept current by the change stream; only fetch them if they were never loaded
+            if (cachedResponders) {
+                showResponders(cachedResponders);
+            } else if (data.ticket_number) {
                 fetchAndDisplayResponders(data.ticket_number);
             }
         }
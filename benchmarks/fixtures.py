@@ -0,0 +1,172 @@
+"""
+Benchmark fixtures
+Incident payloads derived from incident_data.json plus synthetic variants
+"""
+
+import copy
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+
+FIXTURE_PATH = Path(__file__).resolve().parent.parent / "incident_data.json"
+
+# Users per synthetic escalation policy target
+USERS_PER_POLICY = 5
+
+
+def load_base_incident() -> Dict:
+    """Load the recorded incident payload shipped with the repo"""
+    with open(FIXTURE_PATH) as f:
+        return json.load(f)
+
+
+def _timestamp(base: datetime, seconds: int) -> str:
+    return (base + timedelta(seconds=seconds)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _user_reference(user_id: str) -> Dict:
+    return {"id": user_id, "type": "user_reference", "summary": f"Responder {user_id}"}
+
+
+def make_incident(base: Dict, incident_number: int, responders: int) -> Dict:
+    """
+    Build a synthetic incident from the recorded one with a given number of responders.
+    
+    Four out of five responders are requested through escalation policies (no team
+    lookup needed); the rest are requested individually, which makes the app look up
+    their teams.
+    
+    Args:
+        base: Recorded incident payload (see load_base_incident)
+        incident_number: Incident number of the synthetic incident
+        responders: Number of responders to generate
+    
+    Returns:
+        Incident payload shaped like GET /incidents/{id}
+    """
+    incident_data = copy.deepcopy(base)
+    incident = incident_data['incident']
+    incident_id = f"QBENCH{incident_number}"
+    created_at = datetime.fromisoformat(incident['created_at'].replace('Z', '+00:00'))
+    
+    incident['id'] = incident_id
+    incident['incident_number'] = incident_number
+    incident['updated_at'] = _timestamp(created_at, 3600)
+    
+    requests = []
+    targets = []
+    for index in range(responders):
+        user_id = f"PU{index:05d}"
+        requested_at = _timestamp(created_at, 60 + index)
+        responder = {"user": _user_reference(user_id), "requested_at": requested_at, "state": "joined"}
+        
+        if index % 5 == 4:
+            # Individually requested user
+            targets.append({"responder_request_target": {
+                "type": "user", "id": user_id, "summary": responder["user"]["summary"],
+                "incidents_responders": [responder]
+            }})
+        else:
+            policy_index = index // USERS_PER_POLICY
+            if not targets or targets[-1]["responder_request_target"]["id"] != f"PEP{policy_index:04d}":
+                targets.append({"responder_request_target": {
+                    "type": "escalation_policy", "id": f"PEP{policy_index:04d}",
+                    "summary": f"Bench Team {policy_index} - High",
+                    "incidents_responders": []
+                }})
+            targets[-1]["responder_request_target"]["incidents_responders"].append(responder)
+        
+        if len(targets) >= 10 or index == responders - 1:
+            requests.append({
+                "requested_at": requested_at,
+                "responder_request_targets": targets
+            })
+            targets = []
+    
+    incident['responder_requests'] = requests
+    incident['assignments'] = [
+        {"at": _timestamp(created_at, 0), "assignee": _user_reference("PU00000")}
+    ]
+    return incident_data
+
+
+def make_user(user_id: str) -> Dict:
+    """Build the user object returned by GET /users/{id}"""
+    team_index = sum(map(ord, user_id)) % 7
+    return {
+        "id": user_id,
+        "type": "user",
+        "name": f"Responder {user_id}",
+        "first_name": "Responder",
+        "last_name": user_id,
+        "teams": [
+            {"id": "PTSRO", "type": "team_reference", "summary": "SRO US"},
+            {"id": f"PTBENCH{team_index}", "type": "team_reference", "summary": f"Bench Team {team_index}"}
+        ]
+    }
+
+
+def make_log_entries(incident: Dict, count: int, channel_position: int) -> List[Dict]:
+    """
+    Build an incident's log entries with the Slack chat channel event at a given position.
+    
+    Args:
+        incident: The incident object the entries belong to
+        count: Total number of log entries
+        channel_position: Index of the chat channel event; -1 for no channel
+    
+    Returns:
+        List of log entries, oldest first
+    """
+    created_at = datetime.fromisoformat(incident['created_at'].replace('Z', '+00:00'))
+    entries = []
+    for index in range(count):
+        entry = {
+            "id": f"LE{index:06d}",
+            "type": "annotate_log_entry",
+            "created_at": _timestamp(created_at, index),
+            "summary": f"Synthetic log entry {index}"
+        }
+        if index == channel_position:
+            entry.update({
+                "type": "integration_chat_channel_event_log_entry",
+                "chat_channel_name": f"inc-{incident['incident_number']}",
+                "chat_channel_web_link": f"https://slack.example.com/archives/C{incident['incident_number']}"
+            })
+        entries.append(entry)
+    return entries
+
+
+def make_notes(incident: Dict, count: int) -> List[Dict]:
+    """Build an incident's notes, oldest first"""
+    created_at = datetime.fromisoformat(incident['created_at'].replace('Z', '+00:00'))
+    return [
+        {
+            "id": f"NOTE{index:05d}",
+            "content": f"Update {index + 1}: synthetic note",
+            "created_at": _timestamp(created_at, 300 * index),
+            "user": {"id": "PU00000", "type": "user_reference", "summary": "Responder PU00000"}
+        }
+        for index in range(count)
+    ]
+
+
+def make_status_updates(incident: Dict, count: int) -> List[Dict]:
+    """Build an incident's status updates, oldest first"""
+    created_at = datetime.fromisoformat(incident['created_at'].replace('Z', '+00:00'))
+    return [
+        {
+            "id": f"SU{index:05d}",
+            "message": f"Update {index + 1}: synthetic status update",
+            "created_at": _timestamp(created_at, 1800 * index),
+            "sender": {"id": "PU00000", "type": "user_reference", "summary": "Responder PU00000"}
+        }
+        for index in range(count)
+    ]
+
+
+def now_timestamp() -> str:
+    """Current UTC time in PagerDuty's timestamp format"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
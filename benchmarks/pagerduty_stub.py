@@ -0,0 +1,212 @@
+"""
+Local stand-in for the PagerDuty REST API
+Serves fixture incidents with configurable latency and page size, counting every call
+"""
+
+import argparse
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+
+from benchmarks import fixtures
+
+
+@dataclass
+class StubConfig:
+    """Shape of the data and timing served by the stub"""
+    latency: float = 0.02          # Seconds added to every response
+    page_size: int = 100           # Page size of paginated endpoints (PagerDuty caps at 100)
+    responders: List[int] = field(default_factory=lambda: [1, 50, 500])
+    log_entries: int = 10000
+    channel_position: int = -2     # Index of the chat channel log entry; -2 means last, -1 none
+    notes: int = 20
+    status_updates: int = 10
+
+
+class PagerDutyStub:
+    """
+    In-memory PagerDuty data set plus per-endpoint call counters.
+    
+    The recorded incident from incident_data.json is served as is; one synthetic
+    incident is added per entry of `config.responders`, numbered 900000 + responders.
+    """
+    
+    def __init__(self, config: Optional[StubConfig] = None):
+        self.config = config or StubConfig()
+        self.calls: Counter = Counter()
+        self.incidents: Dict[str, Dict] = {}
+        self.numbers: Dict[str, str] = {}
+        self.log_entries: Dict[str, List[Dict]] = {}
+        self.notes: Dict[str, List[Dict]] = {}
+        self.status_updates: Dict[str, List[Dict]] = {}
+        
+        base = fixtures.load_base_incident()
+        self._add_incident(base)
+        for count in self.config.responders:
+            self._add_incident(fixtures.make_incident(base, 900000 + count, count))
+    
+    def _add_incident(self, incident_data: Dict) -> None:
+        incident = incident_data['incident']
+        incident_id = incident['id']
+        channel_position = self.config.channel_position
+        if channel_position == -2:
+            channel_position = self.config.log_entries - 1
+        
+        self.incidents[incident_id] = incident_data
+        self.numbers[str(incident['incident_number'])] = incident_id
+        self.log_entries[incident_id] = fixtures.make_log_entries(incident, self.config.log_entries, channel_position)
+        self.notes[incident_id] = fixtures.make_notes(incident, self.config.notes)
+        self.status_updates[incident_id] = fixtures.make_status_updates(incident, self.config.status_updates)
+    
+    def incident_numbers(self) -> List[str]:
+        """Incident numbers served, recorded incident first"""
+        return list(self.numbers)
+    
+    def resolve(self, id_or_number: str) -> str:
+        """Map an incident number or ID to the incident ID"""
+        incident_id = self.numbers.get(id_or_number, id_or_number)
+        if incident_id not in self.incidents:
+            raise HTTPException(status_code=404, detail={"error": {"message": "Not Found"}})
+        return incident_id
+    
+    def page(self, items: List[Dict], key: str, request: Request) -> Dict:
+        """Slice a list the way PagerDuty's classic offset pagination does"""
+        limit = min(int(request.query_params.get('limit', self.config.page_size)), self.config.page_size)
+        offset = int(request.query_params.get('offset', 0))
+        return {
+            key: items[offset:offset + limit],
+            "offset": offset,
+            "limit": limit,
+            "more": offset + limit < len(items),
+            "total": None
+        }
+    
+    def reset_counters(self) -> None:
+        self.calls.clear()
+    
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+def create_stub_app(stub: PagerDutyStub) -> FastAPI:
+    """
+    Build the ASGI app serving a PagerDutyStub.
+    
+    Args:
+        stub: Data set and counters to serve
+    
+    Returns:
+        FastAPI app exposing the subset of the REST API the app and CLI use
+    """
+    app = FastAPI(title="PagerDuty stub")
+    
+    @app.middleware("http")
+    async def count_and_delay(request: Request, call_next):
+        await asyncio.sleep(stub.config.latency)
+        response = await call_next(request)
+        route = request.scope.get("route")
+        stub.calls[f"{request.method} {route.path if route else request.url.path}"] += 1
+        return response
+    
+    @app.get("/incidents")
+    async def list_incidents(incident_number: Optional[str] = None):
+        incidents = [
+            data['incident'] for incident_id, data in stub.incidents.items()
+            if incident_number is None or stub.numbers.get(incident_number) == incident_id
+        ]
+        return {"incidents": incidents, "offset": 0, "limit": len(incidents), "more": False}
+    
+    @app.get("/incidents/{id_or_number}")
+    async def get_incident(id_or_number: str):
+        return stub.incidents[stub.resolve(id_or_number)]
+    
+    @app.get("/incidents/{incident_id}/log_entries")
+    async def list_log_entries(incident_id: str, request: Request, since: Optional[str] = None):
+        entries = stub.log_entries[stub.resolve(incident_id)]
+        if since:
+            entries = [entry for entry in entries if entry['created_at'] > since]
+        return stub.page(entries, "log_entries", request)
+    
+    @app.get("/incidents/{incident_id}/notes")
+    async def list_notes(incident_id: str, request: Request):
+        return stub.page(stub.notes[stub.resolve(incident_id)], "notes", request)
+    
+    @app.post("/incidents/{incident_id}/notes", status_code=201)
+    async def create_note(incident_id: str, request: Request):
+        notes = stub.notes[stub.resolve(incident_id)]
+        body = await request.json()
+        note = {
+            "id": f"NOTE{len(notes):05d}",
+            "content": body.get('note', {}).get('content', ''),
+            "created_at": fixtures.now_timestamp(),
+            "user": {"id": "PU00000", "type": "user_reference", "summary": "Responder PU00000"}
+        }
+        notes.append(note)
+        return {"note": note}
+    
+    @app.get("/incidents/{incident_id}/status_updates")
+    async def list_status_updates(incident_id: str):
+        return {"status_updates": stub.status_updates[stub.resolve(incident_id)]}
+    
+    @app.post("/incidents/{incident_id}/status_updates")
+    async def create_status_update(incident_id: str, request: Request):
+        status_updates = stub.status_updates[stub.resolve(incident_id)]
+        body = await request.json()
+        status_update = {
+            "id": f"SU{len(status_updates):05d}",
+            "message": body.get('message', ''),
+            "created_at": fixtures.now_timestamp(),
+            "sender": {"id": "PU00000", "type": "user_reference", "summary": "Responder PU00000"}
+        }
+        status_updates.append(status_update)
+        return {"status_update": status_update}
+    
+    @app.get("/incidents/{incident_id}/custom_fields/values")
+    async def list_custom_field_values(incident_id: str):
+        stub.resolve(incident_id)
+        return {"custom_fields": [
+            {"id": "PCF001", "name": "impact", "display_name": "Impact", "value": "Degraded"}
+        ]}
+    
+    @app.get("/users")
+    async def list_users(request: Request):
+        user_ids = request.query_params.getlist("ids[]")
+        return {"users": [fixtures.make_user(user_id) for user_id in user_ids], "more": False}
+    
+    @app.get("/users/me")
+    async def get_current_user():
+        return {"user": fixtures.make_user("PU00000")}
+    
+    @app.get("/users/{user_id}")
+    async def get_user(user_id: str):
+        return {"user": fixtures.make_user(user_id)}
+    
+    return app
+
+
+def main():
+    """Serve the stub on its own, e.g. to point a local app or the CLI at it"""
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description="Local PagerDuty REST API stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Latency added to every response')
+    parser.add_argument('--page-size', type=int, default=100, help='Page size of paginated endpoints')
+    parser.add_argument('--log-entries', type=int, default=10000, help='Log entries per incident')
+    args = parser.parse_args()
+    
+    stub = PagerDutyStub(StubConfig(
+        latency=args.latency_ms / 1000.0,
+        page_size=args.page_size,
+        log_entries=args.log_entries
+    ))
+    print(f"Serving incidents {', '.join(stub.incident_numbers())} on http://{args.host}:{args.port}")
+    uvicorn.run(create_stub_app(stub), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+PagerDuty webhook replay
+Sends recorded webhook events to a running app, signed like PagerDuty signs them
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from app.services.pagerduty_webhooks import SIGNATURE_HEADER, sign
+
+
+SAMPLE_EVENTS_PATH = Path(__file__).resolve().parent / "webhook_events.ndjson"
+
+
+def read_events(path: Path) -> List[Dict]:
+    """Read recorded deliveries: one {"event": ...} body per line, blank lines and # comments skipped"""
+    events = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                events.append(json.loads(line))
+    return events
+
+
+def main():
+    """Replay recorded events"""
+    parser = argparse.ArgumentParser(
+        description="Replay recorded PagerDuty webhook events against /webhooks/pagerduty"
+    )
+    parser.add_argument('files', nargs='*', type=Path,
+                        help=f'NDJSON recordings, e.g. from PAGERDUTY_WEBHOOK_RECORD_PATH (default {SAMPLE_EVENTS_PATH.name})')
+    parser.add_argument('--url', default='http://127.0.0.1:8080/webhooks/pagerduty', help='Webhook endpoint')
+    parser.add_argument('--secret', help='Signing secret (default: the first of PAGERDUTY_WEBHOOK_SECRETS)')
+    parser.add_argument('--interval', type=float, default=0.0, help='Seconds between events')
+    parser.add_argument('--new-ids', action='store_true',
+                        help='Give every event a fresh ID, so the app does not drop a repeated replay as duplicates')
+    args = parser.parse_args()
+    
+    secret = args.secret or next(
+        (secret.strip() for secret in os.getenv("PAGERDUTY_WEBHOOK_SECRETS", "").split(',') if secret.strip()), None
+    )
+    if not secret:
+        print("Error: pass --secret or set PAGERDUTY_WEBHOOK_SECRETS")
+        sys.exit(1)
+    
+    failures = 0
+    with httpx.Client(timeout=10.0) as client:
+        for path in args.files or [SAMPLE_EVENTS_PATH]:
+            for body in read_events(path):
+                event = body.get('event', {})
+                if args.new_ids:
+                    event['id'] = uuid.uuid4().hex
+                content = json.dumps(body, separators=(',', ':')).encode()
+                response = client.post(
+                    args.url,
+                    content=content,
+                    headers={"Content-Type": "application/json", SIGNATURE_HEADER: sign(content, secret)}
+                )
+                if response.status_code >= 400:
+                    failures += 1
+                print(f"{response.status_code} {event.get('event_type', '?'):<40} {event.get('id')}")
+                if args.interval:
+                    time.sleep(args.interval)
+    
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
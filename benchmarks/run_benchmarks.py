@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark runner
+Drives the web app in-process and the CLI as a subprocess against the local PagerDuty stub
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import uvicorn
+
+from benchmarks.pagerduty_stub import PagerDutyStub, StubConfig, create_stub_app
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Interval of the event loop lag probe in seconds
+LOOP_PROBE_INTERVAL = 0.005
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percent / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class StubServer:
+    """Run the PagerDuty stub with uvicorn on a background thread"""
+    
+    def __init__(self, stub: PagerDutyStub):
+        self.stub = stub
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(
+            create_stub_app(stub), host="127.0.0.1", port=self.port, log_level="warning"
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+    
+    def __enter__(self) -> "StubServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+class LoopLagProbe:
+    """Measure how late the event loop wakes up a sleeping task, i.e. how long it was blocked"""
+    
+    def __init__(self):
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+    
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LOOP_PROBE_INTERVAL)
+            self.samples.append(max(0.0, loop.time() - started - LOOP_PROBE_INTERVAL))
+    
+    def start(self) -> None:
+        self.samples = []
+        self._task = asyncio.ensure_future(self._run())
+    
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def _reset_app_services(app) -> None:
+    """Drop the PagerDuty service so the next request starts with cold caches"""
+    service = app.state.pagerduty_service
+    if service is not None:
+        await service.aclose()
+    app.state.pagerduty_service = None
+
+
+def _summarize(name: str, latencies: List[float], elapsed: float, failures: int,
+               cold_calls: int, warm_calls: int, requests: int, loop_lag: List[float]) -> Dict:
+    return {
+        "scenario": name,
+        "requests": requests,
+        "failures": failures,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "cold_upstream_calls": cold_calls,
+        "upstream_calls_per_request": round(warm_calls / requests, 2) if requests else 0.0,
+        "max_loop_lag_ms": round(max(loop_lag) * 1000, 2) if loop_lag else None,
+        "p99_loop_lag_ms": round(_percentile(loop_lag, 99) * 1000, 2) if loop_lag else None
+    }
+
+
+async def run_app_scenario(
+    app,
+    client: httpx.AsyncClient,
+    stub: PagerDutyStub,
+    name: str,
+    send: Callable[[httpx.AsyncClient], Awaitable[httpx.Response]],
+    requests: int,
+    concurrency: int
+) -> Dict:
+    """
+    Benchmark one app endpoint.
+    
+    The first request runs against cold caches and only its upstream calls are
+    recorded; the timed run then sends `requests` requests, `concurrency` at a time.
+    
+    Args:
+        app: The FastAPI app under test
+        client: Client bound to the app through ASGITransport
+        stub: The stub the app talks to, for upstream call counts
+        name: Scenario name used in the report
+        send: Coroutine function sending one request
+        requests: Number of timed requests
+        concurrency: Requests in flight at once
+    
+    Returns:
+        Latency, throughput, upstream round-trip and loop lag figures
+    """
+    await _reset_app_services(app)
+    stub.reset_counters()
+    response = await send(client)
+    response.raise_for_status()
+    cold_calls = stub.total_calls()
+    
+    stub.reset_counters()
+    latencies: List[float] = []
+    failures = 0
+    remaining = iter(range(requests))
+    
+    async def worker():
+        nonlocal failures
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await send(client)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                failures += 1
+    
+    probe = LoopLagProbe()
+    probe.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await probe.stop()
+    
+    return _summarize(name, latencies, elapsed, failures, cold_calls, stub.total_calls(), requests, probe.samples)
+
+
+def run_cli_scenario(stub: PagerDutyStub, env: Dict[str, str], ticket_number: str, requests: int, daemon: bool = False) -> Dict:
+    """Benchmark pagerduty_cli.py end to end, one process per run, as operators use it"""
+    command = [sys.executable, str(REPO_ROOT / "pagerduty_cli.py"), ticket_number, "--users"]
+    if not daemon:
+        command.append("--no-daemon")
+    
+    latencies: List[float] = []
+    failures = 0
+    cold_calls = 0
+    stub.reset_counters()
+    started = time.perf_counter()
+    for index in range(requests):
+        run_started = time.perf_counter()
+        result = subprocess.run(command, env=env, cwd=REPO_ROOT, capture_output=True, text=True)
+        latencies.append(time.perf_counter() - run_started)
+        if result.returncode != 0:
+            failures += 1
+        if index == 0:
+            cold_calls = stub.total_calls()
+    elapsed = time.perf_counter() - started
+    
+    name = f"cli-daemon {ticket_number}" if daemon else f"cli {ticket_number}"
+    return _summarize(name, latencies, elapsed, failures, cold_calls, stub.total_calls(), requests, [])
+
+
+async def run_app_benchmarks(stub: PagerDutyStub, args: argparse.Namespace) -> List[Dict]:
+    """Run every app scenario for every incident served by the stub"""
+    # Imported late so the settings pick up the stub URL set by main()
+    from app.main import app
+    
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for ticket_number in stub.incident_numbers():
+                incident_id = stub.numbers[ticket_number]
+                scenarios = {
+                    f"generate {ticket_number}": lambda c, n=ticket_number: c.post(
+                        "/api/generate", json={"ticket_number": n, "show_users": True}
+                    ),
+                    f"incident {ticket_number}": lambda c, n=ticket_number: c.get(f"/api/incident/{n}"),
+                    f"responders {ticket_number}": lambda c, n=ticket_number: c.get(f"/api/incident/{n}/responders"),
+                    f"status-update {ticket_number}": lambda c, i=incident_id: c.post(
+                        "/api/status-update",
+                        json={"incident_id": i, "status": "investigating", "message": "Benchmark update"}
+                    )
+                }
+                for name, send in scenarios.items():
+                    if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                        continue
+                    results.append(await run_app_scenario(
+                        app, client, stub, name, send, args.requests, args.concurrency
+                    ))
+                    _print_row(results[-1])
+    return results
+
+
+def _print_header() -> None:
+    print(f"{'scenario':<24}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}{'cold calls':>12}"
+          f"{'calls/req':>11}{'max lag ms':>12}{'fail':>6}")
+
+
+def _print_row(result: Dict) -> None:
+    lag = result['max_loop_lag_ms']
+    print(f"{result['scenario']:<24}{result['p50_ms']:>10}{result['p99_ms']:>10}"
+          f"{result['throughput_rps']:>10}{result['cold_upstream_calls']:>12}"
+          f"{result['upstream_calls_per_request']:>11}{'-' if lag is None else lag:>12}{result['failures']:>6}")
+
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the notification app and CLI against a local PagerDuty stub"
+    )
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=10, help='App requests in flight at once')
+    parser.add_argument('--cli-runs', type=int, default=5, help='CLI runs per incident (0 to skip the CLI)')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Latency added to every stub response')
+    parser.add_argument('--page-size', type=int, default=100, help='Page size of paginated stub endpoints')
+    parser.add_argument('--log-entries', type=int, default=10000, help='Log entries per incident')
+    parser.add_argument('--responders', default='1,50,500',
+                        help='Comma separated responder counts of the synthetic incidents')
+    parser.add_argument('--only', action='append',
+                        help='Only run scenarios starting with this prefix (repeatable), e.g. "generate"')
+    parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+    
+    stub = PagerDutyStub(StubConfig(
+        latency=args.latency_ms / 1000.0,
+        page_size=args.page_size,
+        responders=[int(count) for count in args.responders.split(',') if count],
+        log_entries=args.log_entries
+    ))
+    
+    with StubServer(stub) as server, tempfile.TemporaryDirectory() as data_dir:
+        os.environ["PAGERDUTY_API_URL"] = server.url
+        os.environ["PAGER_DUTY_TOKEN"] = "benchmark"
+        # Never leave benchmark writes in the real outbox, where a later run would send them upstream
+        os.environ["OUTBOX_PATH"] = os.path.join(data_dir, "outbox.sqlite3")
+        # Nor stub incidents in the real incident index, whose entries would also skip stub calls
+        os.environ["INCIDENT_INDEX_PATH"] = os.path.join(data_dir, "incident_index.sqlite3")
+        # Every scenario starts cold: a disk cache would carry lookups over from the previous one
+        os.environ["DISK_CACHE_PATH"] = ""
+        
+        print(f"PagerDuty stub on {server.url}: {args.latency_ms:g} ms latency, "
+              f"page size {args.page_size}, {args.log_entries} log entries per incident")
+        _print_header()
+        results = asyncio.run(run_app_benchmarks(stub, args))
+        
+        # A private daemon socket, so a daemon the user runs against the real API is never used
+        cli_env = dict(os.environ, PD_CLI_SOCKET=os.path.join(data_dir, "pd-cli.sock"))
+        if args.cli_runs and (not args.only or any("cli".startswith(prefix) for prefix in args.only)):
+            for ticket_number in stub.incident_numbers():
+                results.append(run_cli_scenario(stub, cli_env, ticket_number, args.cli_runs))
+                _print_row(results[-1])
+        
+        if args.cli_runs and (not args.only or any("cli-daemon".startswith(prefix) for prefix in args.only)):
+            daemon = subprocess.Popen(
+                [sys.executable, str(REPO_ROOT / "pagerduty_cli.py"), "--daemon"],
+                env=cli_env, cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True
+            )
+            try:
+                # Listening once it has printed its socket
+                daemon.stdout.readline()
+                for ticket_number in stub.incident_numbers():
+                    results.append(run_cli_scenario(stub, cli_env, ticket_number, args.cli_runs, daemon=True))
+                    _print_row(results[-1])
+            finally:
+                daemon.terminate()
+                daemon.wait()
+    
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 """
 Standalone PagerDuty CLI Tool
-A self-contained script for generating PagerDuty incident notifications from the command line.
+A script for generating PagerDuty incident notifications from the command line.
+Runs from the repository checkout; date formatting, the incident index and the disk cache are shared with the web app.
 
 Usage:
     pagerduty_cli.py <ticket_number> [update_number] [options]
+    pagerduty_cli.py --daemon
 
 Examples:
     pagerduty_cli.py INC123456
@@ -15,88 +17,171 @@ Examples:
 Add to your zshrc:
     alias pd='/path/to/pagerduty_cli.py'
     # Then use: pd INC123456 --users
+
+Daemon mode:
+    A long-lived `pd --daemon` keeps the interpreter, the PagerDuty connection pool,
+    recently fetched incidents and the incident index warm. Every other run first
+    hands its arguments to the daemon over a Unix socket and prints the answer; if
+    no daemon is listening it does the work itself, exactly as before.
+    
+    pd --daemon &              # start it (or from a login item / launchd / systemd --user)
+    pd INC123456 2 --users     # answered by the daemon
+    pd --stop-daemon
 """
 
 import argparse
+import io
+import json
 import os
+import socket
 import sys
-import requests
-from datetime import datetime, timezone
 from typing import Dict, List, Optional
-import json
 
-# Check for required dependencies
-try:
-    import pytz
-except ImportError:
-    print("Error: pytz is required. Install with: pip install pytz")
-    sys.exit(1)
+# requests, dotenv and the app modules are imported where they are first used: a run
+# answered by the daemon never needs them, and importing requests alone takes longer
+# than the whole round trip to a warm daemon.
+
+
+# Same as app.services.time_format.DEFAULT_TIMEZONE, without importing it before it is needed
+DEFAULT_TIMEZONE = "US/Eastern"
+
+# Daemon wire protocol version; a daemon speaking another one is ignored
+DAEMON_PROTOCOL = 1
 
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    # dotenv is optional - we can work without it
-    pass
+# Seconds to wait for the daemon to accept a connection before running directly
+DAEMON_CONNECT_TIMEOUT = 0.5
+
+# Seconds an incident fetched by the daemon is reused by later runs
+DAEMON_INCIDENT_TTL = 10.0
+
+# Seconds without a request after which the daemon exits
+DAEMON_IDLE_TIMEOUT = 8 * 3600
+
+
+def default_socket_path() -> str:
+    """Per-user daemon socket, overridable with PD_CLI_SOCKET"""
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR") or os.getenv("TMPDIR") or "/tmp"
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.getenv("PD_CLI_SOCKET") or os.path.join(runtime_dir, f"pd-cli-{uid}.sock")
+
+
+def load_environment() -> None:
+    """Load .env (next to this script or above the working directory) if python-dotenv is installed"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        # dotenv is optional - we can work without it
+        pass
 
 
 class PagerDutyCLI:
     """Standalone PagerDuty CLI client"""
     
-    def __init__(self, token: str):
+    def __init__(
+        self,
+        token: str,
+        tz: str = DEFAULT_TIMEZONE,
+        index_path: Optional[str] = None,
+        api_url: Optional[str] = None,
+        incident_ttl: float = 0,
+        cache_path: Optional[str] = None
+    ):
+        """
+        Initialize the client.
+        
+        Args:
+            token: PagerDuty API token
+            tz: Time zone of dates
+            index_path: Incident number <-> ID index shared with the web app; INCIDENT_INDEX_PATH
+                (default data/incident_index.sqlite3) if None. Relative paths are relative to
+                this script, like the app's working directory; empty keeps it in memory only.
+            api_url: Base URL of the PagerDuty REST API; PAGERDUTY_API_URL or the public API if None
+            incident_ttl: Seconds a fetched incident is reused (0 fetches every time)
+            cache_path: Disk cache of the web app, read for the teams of responders; DISK_CACHE_PATH
+                (default data/cache.sqlite3) if None, relative to this script like index_path
+        """
+        import requests
+        from app.services.cache import TTLCache
+        from app.services.disk_cache import DiskCache
+        from app.services.incident_index import IncidentIndex
+        
         self.token = token
+        self.tz = tz
+        self.api_url = (api_url or os.getenv("PAGERDUTY_API_URL", "https://api.pagerduty.com")).rstrip('/')
+        
+        if index_path is None:
+            index_path = os.getenv("INCIDENT_INDEX_PATH", "data/incident_index.sqlite3")
+        self.incident_index = IncidentIndex(self._resolve_path(index_path))
+        if cache_path is None:
+            cache_path = os.getenv("DISK_CACHE_PATH", "data/cache.sqlite3")
+        self.disk_cache = DiskCache(self._resolve_path(cache_path))
+        self.incident_cache = TTLCache(maxsize=256, ttl=incident_ttl) if incident_ttl > 0 else None
+        
         self.headers = {
             'Accept': 'application/vnd.pagerduty+json;version=2',
             'Content-Type': 'application/json',
             'Authorization': f'Token token={self.token}'
         }
+        # Reuse connections (and TLS sessions) across requests; matters in the daemon
+        self.session = requests.Session()
+    
+    @staticmethod
+    def _resolve_path(path: str) -> Optional[str]:
+        """Resolve a data file path relative to this script; None if empty"""
+        if path and not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        return path or None
+    
+    def close(self) -> None:
+        """Close the incident index and the disk cache"""
+        self.incident_index.close()
+        self.disk_cache.close()
     
     def get_incident_data(self, ticket_number: str) -> Dict:
-        """Get incident data from PagerDuty API"""
+        """Get incident data from PagerDuty API (by incident number or ID, in one request)"""
+        import requests
+        from app.services.incident_index import is_incident_number
+        
+        if self.incident_cache is not None:
+            incident_data = self.incident_cache.get(ticket_number)
+            if incident_data is not None:
+                return incident_data
+        
         try:
-            # First try to get incident by number
-            url = f"https://api.pagerduty.com/incidents?incident_number={ticket_number}"
-            response = requests.get(url, headers=self.headers, timeout=30)
+            # The index shared with the web app knows the ID of every incident either has seen;
+            # PagerDuty also accepts the number in place of the ID, so a miss costs nothing extra
+            incident_id = self.incident_index.id_for(ticket_number) if is_incident_number(ticket_number) else None
+            url = f"{self.api_url}/incidents/{incident_id or ticket_number}"
+            response = self.session.get(url, headers=self.headers, timeout=30)
             
+            if response.status_code == 404:
+                raise Exception(f"No incident found with number {ticket_number}")
             if response.status_code != 200:
                 raise Exception(f"Failed to fetch incident: {response.status_code} - {response.text}")
             
-            data = response.json()
-            if not data.get('incidents'):
-                raise Exception(f"No incident found with number {ticket_number}")
-            
-            incident = data['incidents'][0]
-            incident_id = incident['id']
-            
-            # Get detailed incident data
-            detail_url = f"https://api.pagerduty.com/incidents/{incident_id}"
-            detail_response = requests.get(detail_url, headers=self.headers, timeout=30)
-            
-            if detail_response.status_code != 200:
-                raise Exception(f"Failed to fetch incident details: {detail_response.status_code}")
-            
-            return detail_response.json()
-            
+            incident_data = response.json()
+            self.incident_index.record(incident_data.get('incident', {}))
+            if self.incident_cache is not None:
+                self.incident_cache.set(ticket_number, incident_data)
+            return incident_data
+        
         except requests.exceptions.RequestException as e:
             raise Exception(f"Network error: {str(e)}")
     
     def convert_utc_to_eastern(self, utc_date_string: str) -> str:
-        """Convert UTC datetime to Eastern time"""
+        """Convert UTC datetime to Eastern time (or the zone picked with --timezone)"""
+        from app.services.time_format import STYLE_CLI, format_timestamp
+        
         try:
-            # Parse the UTC datetime
-            utc_dt = datetime.fromisoformat(utc_date_string.replace('Z', '+00:00'))
-            
-            # Convert to Eastern timezone
-            eastern = pytz.timezone('US/Eastern')
-            eastern_dt = utc_dt.astimezone(eastern)
-            
-            # Format as desired
-            return eastern_dt.strftime('%m/%d/%Y %I:%M %p %Z')
+            return format_timestamp(utc_date_string, STYLE_CLI, self.tz)
         except Exception as e:
             return f"Error converting date: {e}"
     
     def get_responders_data(self, incident_data: Dict) -> List[Dict]:
-        """Get responders data from incident"""
+        """Get responders data from incident, with the teams the web app last looked up for them"""
+        from app.services.disk_cache import NS_USER_TEAMS
+        
         try:
             incident = incident_data.get('incident', {})
             assignments = incident.get('assignments', [])
@@ -106,9 +191,11 @@ class PagerDutyCLI:
                 assignee = assignment.get('assignee', {})
                 if assignee.get('type') == 'user':
                     user_name = assignee.get('summary', 'Unknown User')
+                    # Looking teams up is left to the web app; users it has not seen stay unknown
+                    stored = self.disk_cache.get(NS_USER_TEAMS, assignee.get('id', ''))
                     responders.append({
                         'user_name': user_name,
-                        'teams': ['Unknown Team']  # Simplified for CLI
+                        'teams': stored[0] if stored and stored[0] else ['Unknown Team']
                     })
             
             return responders
@@ -117,14 +204,16 @@ class PagerDutyCLI:
             return []
     
     def generate_notification_message(
-        self, 
-        incident_data: Dict, 
-        ticket_number: str, 
-        update_number: int = 1, 
-        resolve: bool = False, 
+        self,
+        incident_data: Dict,
+        ticket_number: str,
+        update_number: int = 1,
+        resolve: bool = False,
         downgrade: bool = False
     ) -> str:
         """Generate notification message"""
+        from app.services.time_format import utc_now
+        
         try:
             incident = incident_data['incident']
             title = incident['title']
@@ -136,8 +225,7 @@ class PagerDutyCLI:
             if update_number == 1:
                 created_at = self.convert_utc_to_eastern(incident['created_at'])
             else:
-                current_utc = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
-                created_at = self.convert_utc_to_eastern(current_utc)
+                created_at = self.convert_utc_to_eastern(utc_now())
             
             # Build status prefix
             status_prefix = ""
@@ -163,43 +251,261 @@ class PagerDutyCLI:
 **Slack Channel:** TBD
 
 **Status:** Investigating the issue and will provide updates as more information becomes available."""
-            
+
             return message
-            
+        
         except Exception as e:
             raise Exception(f"Error generating notification: {str(e)}")
     
-    def print_responders_data(self, responders_data: List[Dict]) -> None:
-        """Print responders data in formatted way"""
+    def print_responders_data(self, responders_data: List[Dict], out=None) -> None:
+        """Print responders data in formatted way (to stdout, or the given stream)"""
+        out = out or sys.stdout
         try:
             if not responders_data:
-                print("No responders found.")
+                print("No responders found.", file=out)
                 return
             
-            print("\n--- Incident Responders ---")
+            print("\n--- Incident Responders ---", file=out)
             for responder in responders_data:
                 if "team_name" in responder:
                     team_name = responder["team_name"]
                     users = responder["users"]
                     
-                    print(f"\n{team_name}:")
+                    print(f"\n{team_name}:", file=out)
                     for user in sorted(users, key=lambda x: x.get('name', '')):
-                        print(f"  - {user.get('name', 'Unknown')}")
-                        
+                        print(f"  - {user.get('name', 'Unknown')}", file=out)
+                
                 elif "user_name" in responder:
                     user_name = responder["user_name"]
                     teams = responder["teams"]
                     
-                    print(f"\n{user_name}:")
+                    print(f"\n{user_name}:", file=out)
                     for team_data in teams:
                         if isinstance(team_data, dict):
                             team_name = team_data.get("team", "Unknown Team")
                         else:
                             team_name = team_data
-                        print(f"  - {team_name}")
+                        print(f"  - {team_name}", file=out)
         
         except Exception as e:
-            print(f"Error printing responders data: {e}")
+            print(f"Error printing responders data: {e}", file=out)
+
+
+def run(args: argparse.Namespace, token: Optional[str], out, get_client=None) -> int:
+    """
+    Fetch an incident and print its notification (and responders) to `out`.
+    
+    Args:
+        args: Parsed command line arguments
+        token: PagerDuty API token
+        out: Stream to print to
+        get_client: Called with (token, time zone) to get a client; a new PagerDutyCLI if None
+    
+    Returns:
+        Process exit code
+    """
+    from app.services.time_format import get_zone
+    
+    if not token:
+        print("Error: PagerDuty API token required!", file=out)
+        print("Set PAGER_DUTY_TOKEN environment variable or use --token", file=out)
+        print("\nTo get a token:", file=out)
+        print("1. Log into PagerDuty web interface", file=out)
+        print("2. Go to Profile → User Settings", file=out)
+        print("3. Create API User Token", file=out)
+        return 1
+    
+    tz = args.timezone or os.getenv("PAGER_DUTY_TIMEZONE") or DEFAULT_TIMEZONE
+    try:
+        get_zone(tz)
+    except ValueError as e:
+        print(f"Error: {e}", file=out)
+        return 1
+    
+    try:
+        # Initialize CLI client
+        cli = get_client(token, tz) if get_client is not None else PagerDutyCLI(token, tz)
+        
+        # Get incident data
+        print(f"Fetching incident {args.ticket_number}...", file=out)
+        incident_data = cli.get_incident_data(args.ticket_number)
+        
+        # Generate and print notification
+        notification = cli.generate_notification_message(
+            incident_data,
+            args.ticket_number,
+            args.update_number,
+            args.resolve,
+            args.downgrade
+        )
+        
+        print("\n" + "="*60, file=out)
+        print("NOTIFICATION MESSAGE", file=out)
+        print("="*60, file=out)
+        print(notification, file=out)
+        print("="*60, file=out)
+        
+        # Print responders if requested
+        if args.users:
+            responders = cli.get_responders_data(incident_data)
+            cli.print_responders_data(responders, out=out)
+    
+    except Exception as e:
+        print(f"Error: {e}", file=out)
+        return 1
+    return 0
+
+
+def script_version() -> int:
+    """Modification time of this script; a daemon started from an older version steps aside"""
+    return os.stat(os.path.abspath(__file__)).st_mtime_ns
+
+
+def call_daemon(request: Dict, socket_path: str) -> Optional[Dict]:
+    """
+    Send one request to the daemon.
+    
+    Returns:
+        The daemon's answer, or None if no daemon is listening (or it gave up on the request)
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(DAEMON_CONNECT_TIMEOUT)
+        sock.connect(socket_path)
+        # The daemon may be waiting on PagerDuty; give it the same time a direct run would
+        sock.settimeout(60)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    except OSError:
+        return None
+    finally:
+        sock.close()
+    if not line:
+        return None
+    try:
+        answer = json.loads(line)
+    except ValueError:
+        return None
+    return answer if answer.get("protocol") == DAEMON_PROTOCOL else None
+
+
+def run_via_daemon(args: argparse.Namespace, socket_path: str) -> Optional[int]:
+    """
+    Have the daemon do the run and print its output.
+    
+    Returns:
+        Exit code, or None if the run has to be done directly
+    """
+    # The caller's environment (and .env) decides, not the one the daemon was started from
+    load_environment()
+    args = argparse.Namespace(**{**vars(args), "timezone": args.timezone or os.getenv("PAGER_DUTY_TIMEZONE")})
+    answer = call_daemon({
+        "protocol": DAEMON_PROTOCOL,
+        "version": script_version(),
+        "command": "run",
+        "args": vars(args),
+        "token": args.token or os.getenv("PAGER_DUTY_TOKEN")
+    }, socket_path)
+    if answer is None or "exit_code" not in answer:
+        return None
+    sys.stdout.write(answer["output"])
+    sys.stdout.flush()
+    return answer["exit_code"]
+
+
+def serve(socket_path: str, idle_timeout: float) -> int:
+    """
+    Run the daemon in the foreground until it is stopped or idle for `idle_timeout` seconds.
+    
+    Requests are handled one at a time: a person types them, and one at a time keeps
+    the shared clients and caches free of concurrent use.
+    """
+    import signal
+    import socketserver
+    
+    if not hasattr(socket, "AF_UNIX"):
+        print("Error: daemon mode needs Unix domain sockets")
+        return 1
+    
+    load_environment()
+    version = script_version()
+    clients: Dict[tuple, PagerDutyCLI] = {}
+    
+    def get_client(token: str, tz: str) -> PagerDutyCLI:
+        key = (token, tz)
+        if key not in clients:
+            clients[key] = PagerDutyCLI(token, tz, incident_ttl=DAEMON_INCIDENT_TTL)
+        return clients[key]
+    
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                request = json.loads(self.rfile.readline())
+            except ValueError:
+                return
+            answer = {"protocol": DAEMON_PROTOCOL}
+            command = request.get("command")
+            if command == "ping":
+                answer["pid"] = os.getpid()
+            elif command == "stop":
+                answer["stopped"] = True
+                self.server.stopping = True
+            elif request.get("protocol") != DAEMON_PROTOCOL or request.get("version") != version:
+                # The script changed since the daemon started: let the caller run directly
+                # and make way for a daemon running the new code
+                answer["restart"] = True
+                self.server.stopping = True
+            elif command == "run":
+                out = io.StringIO()
+                try:
+                    args = argparse.Namespace(**request["args"])
+                    # Never the daemon's own token: a caller without one is told to set it
+                    answer["exit_code"] = run(args, request.get("token"), out, get_client=get_client)
+                except Exception as e:
+                    print(f"Error: {e}", file=out)
+                    answer["exit_code"] = 1
+                answer["output"] = out.getvalue()
+            self.wfile.write(json.dumps(answer).encode() + b"\n")
+    
+    class Server(socketserver.UnixStreamServer):
+        stopping = False
+        
+        def handle_timeout(self):
+            self.stopping = True
+    
+    # Replace a socket left behind by a daemon that died, but never steal a live one
+    if call_daemon({"protocol": DAEMON_PROTOCOL, "command": "ping"}, socket_path) is not None:
+        print(f"A daemon is already listening on {socket_path}")
+        return 1
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    
+    # Only this user may connect: the daemon acts with their PagerDuty token
+    previous_umask = os.umask(0o177)
+    try:
+        server = Server(socket_path, Handler)
+    finally:
+        os.umask(previous_umask)
+    server.timeout = idle_timeout
+    # Clean up on SIGTERM (kill, systemd, launchd) as on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"PagerDuty CLI daemon listening on {socket_path} (pid {os.getpid()})", flush=True)
+    try:
+        while not server.stopping:
+            server.handle_request()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        for client in clients.values():
+            client.close()
+    print("PagerDuty CLI daemon stopped")
+    return 0
 
 
 def main():
@@ -207,73 +513,60 @@ def main():
     parser = argparse.ArgumentParser(
         description='Generate PagerDuty incident notifications',
         formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+        epilog=f"""
 Examples:
   %(prog)s INC123456                    # Basic notification
   %(prog)s INC123456 2                  # Update #2
   %(prog)s INC123456 2 --resolve        # Resolved update
   %(prog)s INC123456 1 --users          # Show responders
-  
+  %(prog)s --daemon &                   # Keep a warm daemon answering later runs
+
 Environment Variables:
   PAGER_DUTY_TOKEN    Required PagerDuty API token
+  PAGER_DUTY_TIMEZONE Time zone of dates (default: {DEFAULT_TIMEZONE})
+  PD_CLI_SOCKET       Daemon socket (default: $XDG_RUNTIME_DIR/pd-cli-<uid>.sock)
         """
     )
     
-    parser.add_argument('ticket_number', help='PagerDuty incident/ticket number')
-    parser.add_argument('update_number', type=int, nargs='?', default=1, 
+    parser.add_argument('ticket_number', nargs='?', help='PagerDuty incident/ticket number')
+    parser.add_argument('update_number', type=int, nargs='?', default=1,
                        help='Update number (default: 1)')
-    parser.add_argument('-r', '--resolve', action='store_true', 
+    parser.add_argument('-r', '--resolve', action='store_true',
                        help='Add "Resolved |" prefix to update line')
-    parser.add_argument('-d', '--downgrade', action='store_true', 
+    parser.add_argument('-d', '--downgrade', action='store_true',
                        help='Add "Downgraded |" prefix to update line')
-    parser.add_argument('-u', '--users', action='store_true', 
+    parser.add_argument('-u', '--users', action='store_true',
                        help='Print incident responders')
     parser.add_argument('--token', help='PagerDuty API token (overrides env var)')
+    parser.add_argument('--timezone',
+                       help=f'Time zone of dates, e.g. UTC or Europe/London (default: {DEFAULT_TIMEZONE})')
+    parser.add_argument('--daemon', action='store_true',
+                       help='Run the warm daemon in the foreground instead of fetching an incident')
+    parser.add_argument('--stop-daemon', action='store_true', help='Stop a running daemon')
+    parser.add_argument('--no-daemon', action='store_true', help='Do not use a running daemon')
+    parser.add_argument('--idle-timeout', type=float, default=DAEMON_IDLE_TIMEOUT,
+                       help=f'Seconds without requests before the daemon exits (default: {DAEMON_IDLE_TIMEOUT})')
     
     args = parser.parse_args()
+    socket_path = default_socket_path()
     
-    # Get API token
-    token = args.token or os.getenv("PAGER_DUTY_TOKEN")
-    if not token:
-        print("Error: PagerDuty API token required!")
-        print("Set PAGER_DUTY_TOKEN environment variable or use --token")
-        print("\nTo get a token:")
-        print("1. Log into PagerDuty web interface")
-        print("2. Go to Profile → User Settings")
-        print("3. Create API User Token")
-        sys.exit(1)
+    if args.daemon:
+        sys.exit(serve(socket_path, args.idle_timeout))
+    if args.stop_daemon:
+        answer = call_daemon({"protocol": DAEMON_PROTOCOL, "command": "stop"}, socket_path)
+        print("Daemon stopped" if answer is not None else "No daemon is running")
+        sys.exit(0)
+    if not args.ticket_number:
+        parser.error("the following arguments are required: ticket_number")
     
-    try:
-        # Initialize CLI client
-        cli = PagerDutyCLI(token)
-        
-        # Get incident data
-        print(f"Fetching incident {args.ticket_number}...")
-        incident_data = cli.get_incident_data(args.ticket_number)
-        
-        # Generate and print notification
-        notification = cli.generate_notification_message(
-            incident_data, 
-            args.ticket_number, 
-            args.update_number, 
-            args.resolve, 
-            args.downgrade
-        )
-        
-        print("\n" + "="*60)
-        print("NOTIFICATION MESSAGE")
-        print("="*60)
-        print(notification)
-        print("="*60)
-        
-        # Print responders if requested
-        if args.users:
-            responders = cli.get_responders_data(incident_data)
-            cli.print_responders_data(responders)
-        
-    except Exception as e:
-        print(f"Error: {e}")
-        sys.exit(1)
+    if not args.no_daemon:
+        exit_code = run_via_daemon(args, socket_path)
+        if exit_code is not None:
+            sys.exit(exit_code)
+    
+    # No daemon: do the work in this process
+    load_environment()
+    sys.exit(run(args, args.token or os.getenv("PAGER_DUTY_TOKEN"), sys.stdout))
 
 
 if __name__ == "__main__":